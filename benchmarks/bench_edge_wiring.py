@@ -0,0 +1,118 @@
+"""
+Edge wiring benchmark for ONNXtoNodeGraph.
+
+Builds synthetic graphs (a chain of Add/Relu nodes with residual
+connections, one graph input/output per 100 nodes), creates the nodes,
+and times only the wiring stage. Time per node should stay flat as the
+graph grows.
+
+usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_edge_wiring.py
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_edge_wiring.py --sizes 1000 10000 --legacy
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import onnx_graphsurgeon as gs
+from PySide2 import QtWidgets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph, connect_onnx_edges
+
+
+def make_graph(num_nodes:int)->gs.Graph:
+    num_io = max(1, num_nodes // 100)
+    inputs = [gs.Variable(f"input_{i}", dtype=np.float32, shape=[1, 8]) for i in range(num_io)]
+    outputs = []
+    nodes = []
+    prev = inputs[0]
+    skip = inputs[0]
+    for i in range(num_nodes):
+        out = gs.Variable(f"t{i}", dtype=np.float32, shape=[1, 8])
+        if i % 3 == 0:
+            # every 100th node also reads one of the graph inputs.
+            rhs = inputs[i // 100] if i % 100 == 0 else gs.Constant(f"c{i}", np.full((1, 8), i, np.float32))
+            nodes.append(gs.Node("Add", f"add_{i}", inputs=[prev, rhs], outputs=[out]))
+        elif i % 3 == 1:
+            nodes.append(gs.Node("Relu", f"relu_{i}", inputs=[prev], outputs=[out]))
+        else:
+            nodes.append(gs.Node("Add", f"res_{i}", inputs=[prev, skip], outputs=[out]))
+            skip = out
+        if i % 100 == 99 or i == num_nodes - 1:
+            outputs.append(out)
+        prev = out
+    return gs.Graph(nodes=nodes, inputs=inputs, outputs=outputs, opset=13)
+
+
+def new_node_graph()->ONNXNodeGraph:
+    return ONNXNodeGraph(name="bench", opset=13, doc_string="", import_domains=None,
+                         producer_name="", producer_version="", ir_version=8, model_version=0)
+
+
+def legacy_wiring(onnx_graph:gs.Graph, node_graph:ONNXNodeGraph, qt_io_nodes, qt_nodes):
+    # list lookups, Port.connect_to per pair and set_locked(connected_ports=True).
+    qt_edge = {}
+    for onnx_node in onnx_graph.nodes:
+        for input in onnx_node.inputs:
+            qt_edge.setdefault(input.name, {"inputs": [], "outputs": []})["inputs"].append(onnx_node.name)
+        for output in onnx_node.outputs:
+            qt_edge.setdefault(output.name, {"inputs": [], "outputs": []})["outputs"].append(onnx_node.name)
+    input_names = [inp.name for inp in onnx_graph.inputs]
+    output_names = [out.name for out in onnx_graph.outputs]
+    for key, val in qt_edge.items():
+        if key in input_names:
+            for inp in val["inputs"]:
+                qt_io_nodes[key].output(0).connect_to(qt_nodes[inp].input(0), push_undo=False)
+        if key in output_names:
+            for out in val["outputs"]:
+                qt_nodes[out].output(0).connect_to(qt_io_nodes[key].input(0), push_undo=False)
+        for inp in val["inputs"]:
+            for out in val["outputs"]:
+                qt_nodes[out].output(0).connect_to(qt_nodes[inp].input(0), push_undo=False)
+    for n in node_graph.all_nodes():
+        for ip in n.input_ports():
+            ip.set_locked(state=True, connected_ports=True, push_undo=False)
+        for op in n.output_ports():
+            op.set_locked(state=True, connected_ports=True, push_undo=False)
+
+
+def run(num_nodes:int, legacy:bool):
+    onnx_graph = make_graph(num_nodes)
+    node_graph = new_node_graph()
+    t0 = time.perf_counter()
+    qt_io_nodes, qt_nodes = node_graph.create_qtnodes(onnx_graph)
+    t1 = time.perf_counter()
+    if legacy:
+        legacy_wiring(onnx_graph, node_graph, qt_io_nodes, qt_nodes)
+    else:
+        connect_onnx_edges(onnx_graph, node_graph, qt_io_nodes, qt_nodes, push_undo=False)
+    t2 = time.perf_counter()
+    pipes = len(node_graph.viewer().all_pipes())
+    return t1 - t0, t2 - t1, pipes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy", action="store_true",
+                        help="also time the per-connection Port.connect_to wiring.")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+
+    modes = [("bulk", False)]
+    if args.legacy:
+        modes.append(("legacy", True))
+    print(f"{'mode':>8} {'nodes':>8} {'pipes':>8} {'create[s]':>10} {'wire[s]':>10} {'wire/node[us]':>14}")
+    for name, legacy in modes:
+        for num_nodes in args.sizes:
+            create_time, wire_time, pipes = run(num_nodes, legacy)
+            print(f"{name:>8} {num_nodes:>8} {pipes:>8} {create_time:>10.3f} {wire_time:>10.3f} "
+                  f"{wire_time / num_nodes * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Panning frame rate of the node graph at several zoom levels, with and
+without level-of-detail rendering.
+
+Places a synthetic graph (see bench_edge_wiring.make_graph) on a square
+grid, so zooming out brings thousands of nodes into view, then for each
+zoom level scrolls the view and repaints the viewport synchronously
+for a number of frames. "full" draws every node and pipe at full detail
+(LOD thresholds set to 0), "lod" uses the default thresholds.
+
+usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_lod_fps.py
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_lod_fps.py --nodes 10000 --zooms 0.1 0.3 1.0
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+from PySide2 import QtCore, QtWidgets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from onnxgraphqt.utils.widgets import LOD_THRESHOLDS, LOD_LOW, LOD_MEDIUM, set_lod_thresholds
+from bench_edge_wiring import make_graph, new_node_graph
+
+
+def measure_fps(viewer, zoom:float, frames:int, center:QtCore.QPointF=None)->float:
+    # zoom and pan the way mouse wheel and middle-button drags do.
+    factor = zoom / viewer.transform().m11()
+    viewer.scale(factor, factor)
+    if center is None:
+        center = viewer.scene().itemsBoundingRect().center()
+    offset = center - viewer.sceneRect().center()
+    viewer._set_viewer_pan(offset.x(), offset.y())
+    step = viewer.sceneRect().width() / 20
+    viewport = viewer.viewport()
+    QtWidgets.QApplication.processEvents()
+    t0 = time.perf_counter()
+    for i in range(frames):
+        # back and forth so every frame exposes new items.
+        dx = step if (i // 10) % 2 == 0 else -step
+        viewer._set_viewer_pan(dx, 0)
+        viewport.repaint()
+    return frames / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--zooms", type=float, nargs="+", default=[0.1, 0.3, 0.6, 1.0])
+    parser.add_argument("--frames", type=int, default=40)
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1000], help="viewport width height")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+
+    graph = new_node_graph()
+    graph.load_onnx_graph(make_graph(args.nodes))
+    nodes = graph.all_nodes()
+    columns = int(math.ceil(math.sqrt(len(nodes))))
+    graph.set_node_positions(nodes, [[(i % columns) * 210.0, (i // columns) * 120.0] for i in range(len(nodes))])
+    graph.update_pipe_paint()
+    viewer = graph.viewer()
+    viewer.resize(*args.size)
+    viewer.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    viewer.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    viewer.show()
+
+    defaults = dict(LOD_THRESHOLDS)
+    print(f"{graph.node_count()} nodes, viewport {args.size[0]}x{args.size[1]}, "
+          f"thresholds low<{defaults[LOD_LOW]} medium<{defaults[LOD_MEDIUM]}")
+    print(f"{'zoom':>6} {'full[fps]':>10} {'lod[fps]':>10} {'speedup':>8}")
+    center = graph.culler.bounds().center()
+    for zoom in args.zooms:
+        set_lod_thresholds(0.0, 0.0)
+        full = measure_fps(viewer, zoom, args.frames, center)
+        set_lod_thresholds(defaults[LOD_LOW], defaults[LOD_MEDIUM])
+        lod = measure_fps(viewer, zoom, args.frames, center)
+        print(f"{zoom:>6.2f} {full:>10.1f} {lod:>10.1f} {lod / full:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Startup time of the application.
+
+Every measurement runs in a fresh interpreter. "lazy" imports
+onnxgraphqt.main_window as the application does, "eager" also imports
+every processing tool, onnxruntime and networkx up front, the way
+main_window.py used to. The -X importtime output of the lazy run is
+summed per top level package, so the slowest dependencies are listed
+first. "window" is the time until MainWindow is shown on the offscreen
+platform, and the last table is the cost of the first get_tool() call
+of each tool, which the background warm-up takes off the first click.
+
+usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --top 20 --no-window
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from onnxgraphqt.utils.tool_service import TOOLS
+
+EAGER_MODULES = sorted(set([v.split(":")[0] for v in TOOLS.values()])) + [
+    "onnxruntime",
+    "networkx",
+    "sam4onnx.onnx_attr_const_modify",
+]
+
+TIMER = "import time as _t; _t0 = _t.perf_counter()\n"
+REPORT = "print(f'elapsed {_t.perf_counter() - _t0}')\n"
+
+WINDOW = """
+from PySide2 import QtWidgets
+from onnxgraphqt.main_window import MainWindow
+app = QtWidgets.QApplication([])
+w = MainWindow()
+w.show()
+app.processEvents()
+"""
+
+
+def run(code:str, importtime=False)->Tuple[float, str]:
+    """
+    Runs code in a new interpreter. Returns (seconds reported by the code, stderr).
+    """
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = dict(os.environ, PYTHONPATH=ROOT, QT_QPA_PLATFORM="offscreen")
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    line = [l for l in proc.stdout.splitlines() if l.startswith("elapsed ")][-1]
+    return float(line.split()[1]), proc.stderr
+
+
+def median_time(code:str, repeat:int)->float:
+    return statistics.median([run(code)[0] for _ in range(repeat)])
+
+
+def import_breakdown(stderr:str)->Dict[str, float]:
+    """
+    Self time in seconds per top level package from -X importtime output.
+    """
+    totals: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = [v.strip() for v in line[len("import time:"):].split("|")]
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1e6
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the median is shown")
+    parser.add_argument("--top", type=int, default=15, help="packages listed in the breakdown")
+    parser.add_argument("--no-window", action="store_true", help="skip the MainWindow measurement")
+    parser.add_argument("--no-tools", action="store_true", help="skip the per tool measurement")
+    args = parser.parse_args()
+
+    lazy = TIMER + "import onnxgraphqt.main_window\n" + REPORT
+    eager = TIMER + "import onnxgraphqt.main_window\n" + \
+        "".join([f"import {m}\n" for m in EAGER_MODULES]) + REPORT
+    t_lazy = median_time(lazy, args.repeat)
+    t_eager = median_time(eager, args.repeat)
+    print(f"{'import':>12} {'[ms]':>9}")
+    print(f"{'eager':>12} {t_eager * 1000:>9.1f}")
+    print(f"{'lazy':>12} {t_lazy * 1000:>9.1f}")
+    if not args.no_window:
+        t_window = median_time(TIMER + WINDOW + REPORT, args.repeat)
+        print(f"{'window':>12} {t_window * 1000:>9.1f}")
+
+    _, stderr = run(lazy, importtime=True)
+    totals = import_breakdown(stderr)
+    print()
+    print("-X importtime, self time per package of the lazy import")
+    print(f"{'package':>32} {'[ms]':>9}")
+    for package, seconds in sorted(totals.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{package:>32} {seconds * 1000:>9.1f}")
+
+    if not args.no_tools:
+        print()
+        print("first get_tool() after the lazy import")
+        print(f"{'tool':>32} {'[ms]':>9}")
+        for tool in TOOLS.keys():
+            code = "import onnxgraphqt.main_window\n" + TIMER + \
+                "from onnxgraphqt.utils.tool_service import get_tool\n" + \
+                f"get_tool({tool!r})\n" + REPORT
+            try:
+                t_tool = median_time(code, args.repeat)
+            except subprocess.CalledProcessError:
+                print(f"{tool:>32} {'not installed':>9}")
+                continue
+            print(f"{tool:>32} {t_tool * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
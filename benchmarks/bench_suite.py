@@ -0,0 +1,428 @@
+"""
+Headless benchmark suite with machine-readable results.
+
+Every case is a synthetic model (see synthetic.py) or a model file, the
+bundled mobilenetv2-12-int8.onnx by default. Each case is timed through
+the stages a user goes through, on the offscreen Qt platform:
+
+    load            import_onnx_lazy + ONNXNodeGraph.load_onnx_graph
+    pipe_paint      update_pipe_paint
+    layout          auto_layout without the layout cache
+    layout_cached   auto_layout with a warm layout cache
+    to_onnx         ONNXNodeGraph.to_onnx
+    export_json     onnx2json of the exported model
+    import_json     json2onnx of that json
+    export_png      export_to_png
+    tool:<name>     round trip of an onnx tool: to_onnx, the tool in this
+                    process, then patching the scene with its output.
+                    tool:rename also checks, untimed, that the renamed
+                    node is listed and deleted under its new name
+
+Each stage runs --repeat times on a freshly loaded graph; the JSON
+report holds every run, the median and the profiler spans of the last
+run. With --compare, the medians are checked against an earlier report
+and the exit status is 1 if any stage got slower than --threshold times.
+
+usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py -o results.json
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py --preset small --stages load layout \\
+        --compare baseline.json --threshold 1.2
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py --synthetic --depth 2000 --width 4 --fan-out 2
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import onnx
+import onnx_graphsurgeon as gs
+from PySide2 import QtWidgets
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from onnxgraphqt.graph.autolayout.layout_cache import LayoutCache
+from onnxgraphqt.graph.onnx_lazy_loader import import_onnx_lazy
+from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph
+from onnxgraphqt.utils.profiler import profiler
+from onnxgraphqt.utils.tool_service import TOOLS, call_tool, get_tool
+from synthetic import SyntheticSpec, add_arguments, count_nodes, make_model, spec_from_args
+
+SCHEMA_VERSION = 1
+MOBILENET = os.path.join(ROOT, "onnxgraphqt", "data", "mobilenetv2-12-int8.onnx")
+
+# synthetic cases by preset, from a small model to a large one with control flow.
+PRESETS: Dict[str, List[SyntheticSpec]] = {
+    "small": [
+        SyntheticSpec(depth=100),
+        SyntheticSpec(depth=50, width=4, fan_out=2),
+    ],
+    "default": [
+        SyntheticSpec(depth=1000),
+        SyntheticSpec(depth=250, width=4, fan_out=2),
+        SyntheticSpec(depth=1000, const_size=65536),
+        SyntheticSpec(depth=400, nesting=2),
+    ],
+    "large": [
+        SyntheticSpec(depth=10000),
+        SyntheticSpec(depth=2500, width=8, fan_out=3),
+        SyntheticSpec(depth=4000, nesting=3),
+    ],
+}
+
+STAGES = ["load", "pipe_paint", "layout", "layout_cached", "to_onnx",
+          "export_json", "import_json", "export_png"]
+TOOL_STAGES = [f"tool:{tool}" for tool in TOOLS.keys() if tool not in ("onnx2json", "json2onnx")]
+
+
+def new_node_graph(onnx_model:onnx.ModelProto, onnx_graph:gs.Graph)->ONNXNodeGraph:
+    graph = ONNXNodeGraph(name=onnx_graph.name,
+                          opset=onnx_graph.opset,
+                          doc_string=onnx_graph.doc_string,
+                          import_domains=onnx_graph.import_domains,
+                          producer_name=onnx_model.producer_name,
+                          producer_version=onnx_model.producer_version,
+                          ir_version=onnx_model.ir_version,
+                          model_version=onnx_model.model_version)
+    graph.layout_cache = None
+    return graph
+
+
+def load_graph(model_path:str)->ONNXNodeGraph:
+    onnx_model, onnx_graph = import_onnx_lazy(model_path)
+    graph = new_node_graph(onnx_model, onnx_graph)
+    graph.load_onnx_graph(onnx_graph)
+    return graph
+
+
+def dispose(graph:Optional[ONNXNodeGraph]):
+    if graph is None:
+        return
+    graph.close()
+    graph.deleteLater()
+    QtWidgets.QApplication.processEvents()
+
+
+def first_node(model:onnx.ModelProto, pred:Callable[[onnx.NodeProto], bool])->Optional[onnx.NodeProto]:
+    return next((n for n in model.graph.node if pred(n)), None)
+
+
+def tool_kwargs(model:onnx.ModelProto)->Dict[str, Dict[str, Any]]:
+    """
+    Arguments of each tool for a round trip on model. Tools that need
+    something the model does not have are left out.
+    """
+    graph = model.graph
+    opset = next((o.version for o in model.opset_import if o.domain in ("", "ai.onnx")), 13)
+    inp = graph.input[0]
+    out = graph.output[0]
+    in_shape = [d.dim_value if d.HasField("dim_value") else d.dim_param for d in inp.type.tensor_type.shape.dim]
+    out_shape = [d.dim_value if d.HasField("dim_value") else d.dim_param for d in out.type.tensor_type.shape.dim]
+    initializers = {t.name: t for t in graph.initializer}
+    ops = [n for n in graph.node if n.op_type not in ("Constant", "If", "Loop", "Scan")]
+    middle = ops[len(ops) // 2] if ops else None
+
+    ret: Dict[str, Dict[str, Any]] = {
+        "shrinking": {"mode": "shrink", "forced_extraction_op_names": [],
+                      "forced_extraction_constant_names": [], "disable_auto_downcast": False},
+        "op_change": {"opset": min(opset + 1, onnx.defs.onnx_opset_version())},
+        "batchsize_initialize": {"initialization_character_string": "N"},
+        "io_change": {"input_names": [inp.name], "input_shapes": [["N"] + in_shape[1:]],
+                      "output_names": [out.name], "output_shapes": [["N"] + out_shape[1:]]},
+        "structure_check": {},
+        "generate": {"op_type": "Add", "opset": opset, "op_name": "bench_add",
+                     "input_variables": {"a": ["float32", [1, 8]], "b": ["float32", [1, 8]]},
+                     "output_variables": {"c": ["float32", [1, 8]]}, "attributes": None},
+    }
+    if middle is not None:
+        ret["rename"] = {"old_new": [middle.name, middle.name + "_renamed"]}
+        ret["extraction"] = {"input_op_names": [inp.name], "output_op_names": [middle.output[0]]}
+    single = first_node(model, lambda n: len(n.input) == 1 and len(n.output) == 1
+                        and n.op_type not in ("Constant", "If", "Loop", "Scan"))
+    if single is not None:
+        ret["deletion"] = {"remove_node_names": [single.name]}
+    with_const = first_node(model, lambda n: any([i in initializers for i in n.input]))
+    if with_const is not None:
+        name = next((i for i in with_const.input if i in initializers))
+        ret["modify"] = {"op_name": with_const.name, "attributes": None, "delete_attributes": None,
+                         "input_constants": {name: onnx.numpy_helper.to_array(initializers[name])}}
+    if len(in_shape) == 4:
+        ret["order_conversion"] = {"input_op_names_and_order_dims": {inp.name: [0, 2, 3, 1]},
+                                   "channel_change_inputs": {}}
+    value_info = None
+    if middle is not None:
+        inferred = onnx.shape_inference.infer_shapes(model).graph.value_info
+        value_info = next((v for v in inferred if v.name == middle.output[0]), None)
+    if value_info is not None and value_info.type.tensor_type.elem_type == onnx.TensorProto.FLOAT:
+        shape = [d.dim_value if d.HasField("dim_value") else d.dim_param
+                 for d in value_info.type.tensor_type.shape.dim]
+        consumer = first_node(model, lambda n: middle.output[0] in n.input)
+        if consumer is not None:
+            ret["add"] = {
+                "connection_src_op_output_names": [[middle.name, middle.output[0], "bench_identity", "bench_x"]],
+                "connection_dest_op_input_names": [["bench_identity", "bench_y", consumer.name, middle.output[0]]],
+                "add_op_type": "Identity", "add_op_name": "bench_identity",
+                "add_op_input_variables": {"bench_x": ["float32", shape]},
+                "add_op_output_variables": {"bench_y": ["float32", shape]},
+                "add_op_attributes": None,
+            }
+    if in_shape == out_shape:
+        # the model after itself.
+        ret["combine"] = {"onnx_graphs": [model], "srcop_destop": [[out.name, inp.name]],
+                          "op_prefixes_after_merging": ["a", "b"]}
+    return ret
+
+
+class Case:
+    def __init__(self, name:str, model_path:str, params:Dict[str, Any]):
+        self.name = name
+        self.model_path = model_path
+        self.params = params
+        model = onnx.load(model_path, load_external_data=False)
+        self.nodes, self.nodes_with_subgraphs = count_nodes(model)
+        self.tool_kwargs = tool_kwargs(model)
+
+
+def time_stage(case:Case, stage:str, repeat:int, work_dir:str)->Dict[str, Any]:
+    """
+    Runs stage repeat times and returns its record for the report.
+    Setup (loading the graph the stage starts from) is not timed.
+    """
+    runs: List[float] = []
+    extra: Dict[str, Any] = {}
+    for _ in range(repeat):
+        graph = None
+        try:
+            if stage != "load":
+                graph = load_graph(case.model_path)
+            if stage in ("layout", "layout_cached", "export_png"):
+                graph.update_pipe_paint()
+            if stage == "layout_cached":
+                graph.layout_cache = LayoutCache(directory=os.path.join(work_dir, "layout_cache"))
+                graph.auto_layout(push_undo=False)
+            if stage == "export_png":
+                graph.auto_layout(push_undo=False)
+            if stage in ("export_json", "import_json") or stage.startswith("tool:"):
+                onnx_model = graph.to_onnx()
+            json_path = os.path.join(work_dir, f"{case.name}.json")
+            if stage == "import_json":
+                get_tool("onnx2json")(onnx_graph=onnx_model, output_json_path=json_path, json_indent=None)
+
+            profiler.clear()
+            t0 = time.perf_counter()
+            if stage == "load":
+                graph = load_graph(case.model_path)
+            elif stage == "pipe_paint":
+                graph.update_pipe_paint()
+            elif stage in ("layout", "layout_cached"):
+                graph.auto_layout(push_undo=False)
+            elif stage == "to_onnx":
+                graph.to_onnx()
+            elif stage == "export_json":
+                get_tool("onnx2json")(onnx_graph=onnx_model, output_json_path=json_path, json_indent=None)
+            elif stage == "import_json":
+                get_tool("json2onnx")(input_json_path=json_path)
+            elif stage == "export_png":
+                graph.export_to_png(os.path.join(work_dir, f"{case.name}.png"))
+            elif stage.startswith("tool:"):
+                extra = tool_round_trip(graph, stage[len("tool:"):], case.tool_kwargs)
+            runs.append(time.perf_counter() - t0)
+            if stage == "tool:rename":
+                # not timed.
+                check_rename(graph, *case.tool_kwargs["rename"]["old_new"])
+        finally:
+            dispose(graph)
+    return {
+        "case": case.name,
+        "stage": stage,
+        "median": statistics.median(runs),
+        "min": min(runs),
+        "runs": runs,
+        "spans": profiler.summary(),
+        **extra,
+    }
+
+
+def tool_round_trip(graph:ONNXNodeGraph, tool:str, kwargs:Dict[str, Dict[str, Any]])->Dict[str, Any]:
+    """
+    to_onnx, the tool and the scene update, as after a click on the tool button.
+    """
+    t0 = time.perf_counter()
+    onnx_model = graph.to_onnx(non_verbose=True)
+    t1 = time.perf_counter()
+    args = dict(kwargs[tool])
+    if tool != "generate":
+        args["onnx_graph"] = onnx_model
+    if tool != "structure_check":
+        args["non_verbose"] = True
+    result = call_tool(tool, **args)
+    t2 = time.perf_counter()
+    if result.error:
+        raise RuntimeError(f"{tool}: {result.error}")
+    if result.model is not None:
+        onnx_graph = gs.import_onnx(result.model)
+        if not graph.patch_onnx_graph(onnx_graph, push_undo=True):
+            graph.remove_all_nodes(push_undo=False)
+            graph.load_onnx_graph(onnx_graph)
+    t3 = time.perf_counter()
+    return {"to_onnx": t1 - t0, "tool": t2 - t1, "reload": t3 - t2}
+
+
+def check_rename(graph:ONNXNodeGraph, old_name:str, new_name:str):
+    """
+    The tool widgets must find a renamed node under its new name, and a
+    tool called with that name must find it in the exported model.
+    """
+    nodes = graph.to_data().nodes
+    if new_name not in nodes or old_name in nodes:
+        raise RuntimeError(f"rename: {old_name} is not listed as {new_name} after patching.")
+    count = len(graph.to_onnx().graph.node)
+    result = call_tool("deletion", onnx_graph=graph.to_onnx(), remove_node_names=[new_name], non_verbose=True)
+    if not result.ok:
+        raise RuntimeError(f"rename: deleting {new_name} failed. {result.error or ''}")
+    if len(result.model.graph.node) != count - 1:
+        raise RuntimeError(f"rename: deleting {new_name} did not remove it.")
+
+
+def metadata()->Dict[str, Any]:
+    def version(module:str)->Optional[str]:
+        try:
+            return __import__(module).__version__
+        except (ImportError, AttributeError):
+            return None
+
+    def git(*args)->Optional[str]:
+        try:
+            return subprocess.check_output(["git", *args], cwd=ROOT, stderr=subprocess.DEVNULL,
+                                           universal_newlines=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "versions": {m: version(m) for m in ["onnx", "onnx_graphsurgeon", "numpy", "PySide2", "NodeGraphQt"]},
+        "argv": sys.argv[1:],
+    }
+
+
+def compare(results:List[Dict[str, Any]], baseline_path:str, threshold:float)->List[Tuple[str, str, float]]:
+    """
+    (case, stage, ratio) of the stages whose median grew by more than threshold times.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r["case"], r["stage"]): r["median"] for r in baseline["results"] if "median" in r}
+    print()
+    print(f"compared to {baseline_path} ({baseline['meta'].get('commit')})")
+    print(f"{'case':>40} {'stage':>24} {'ratio':>7}")
+    regressions = []
+    for r in results:
+        old = base.get((r["case"], r["stage"]))
+        if old is None or "median" not in r or old <= 0:
+            continue
+        ratio = r["median"] / old
+        mark = " <" if ratio > threshold else ""
+        print(f"{r['case']:>40} {r['stage']:>24} {ratio:>7.2f}{mark}")
+        if ratio > threshold:
+            regressions.append((r["case"], r["stage"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", default=None, help="write the report to this json file")
+    parser.add_argument("--preset", choices=sorted(PRESETS.keys()), default="default",
+                        help="synthetic models to run")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="run only the synthetic model given by the model options below")
+    parser.add_argument("--models", nargs="*", default=[MOBILENET],
+                        help="model files to run besides the synthetic ones")
+    parser.add_argument("--stages", nargs="+", default=None, metavar="STAGE",
+                        help=f"stages to run, of {' '.join(STAGES)} tool:<name> or 'tools'. all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the median is reported")
+    parser.add_argument("--compare", default=None, help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio counted as a regression by --compare")
+    model_options = parser.add_argument_group("synthetic model", "used with --synthetic")
+    add_arguments(model_options)
+    args = parser.parse_args()
+
+    stages = args.stages or STAGES + ["tools"]
+    if "tools" in stages:
+        i = stages.index("tools")
+        stages = stages[:i] + TOOL_STAGES + stages[i + 1:]
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="onnxgraphqt_bench_") as work_dir:
+        specs = [spec_from_args(args)] if args.synthetic else PRESETS[args.preset]
+        cases = []
+        for spec in specs:
+            name = spec.name()
+            path = os.path.join(work_dir, f"{name}.onnx")
+            onnx.save(make_model(spec), path)
+            cases.append(Case(name, path, {"synthetic": spec.to_dict()}))
+        if not args.synthetic:
+            for path in args.models:
+                name = os.path.splitext(os.path.basename(path))[0]
+                cases.append(Case(name, path, {"file": os.path.abspath(path)}))
+
+        print(f"{'case':>40} {'nodes':>7} {'stage':>24} {'median [ms]':>12} {'min [ms]':>10}")
+        for case in cases:
+            for stage in stages:
+                if stage.startswith("tool:") and stage[len("tool:"):] not in case.tool_kwargs:
+                    continue
+                try:
+                    record = time_stage(case, stage, args.repeat, work_dir)
+                except ImportError as e:
+                    record = {"case": case.name, "stage": stage, "skipped": f"not installed: {e.name}"}
+                except Exception as e:
+                    record = {"case": case.name, "stage": stage, "error": f"{type(e).__name__}: {e}"}
+                record.update(nodes=case.nodes, nodes_with_subgraphs=case.nodes_with_subgraphs,
+                              params=case.params)
+                results.append(record)
+                if "median" in record:
+                    print(f"{case.name[:40]:>40} {case.nodes:>7} {stage:>24} "
+                          f"{record['median'] * 1000:>12.1f} {record['min'] * 1000:>10.1f}")
+                else:
+                    print(f"{case.name[:40]:>40} {case.nodes:>7} {stage:>24} "
+                          f"{record.get('skipped') or record.get('error')}")
+
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1, default=_json_default)
+        print(f"written: {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stages slower than {args.threshold}x")
+            sys.exit(1)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"not serializable: {type(value).__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Panning frame rate and fit_to_selection time of the node graph with and
+without viewport culling, for growing graphs.
+
+Places a synthetic graph (see bench_edge_wiring.make_graph) on a square
+grid and pans at each zoom level (see bench_lod_fps.measure_fps). "all"
+keeps every node and pipe item in the scene, "culled" keeps only the
+items near the viewport and draws the overview below
+CULLING_OVERVIEW_SCALE. "items" is the number of items in the scene
+after panning.
+
+usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_viewport_culling.py
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_viewport_culling.py --nodes 1000 100000 --zooms 0.05 1.0
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+from PySide2 import QtCore, QtWidgets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_edge_wiring import make_graph, new_node_graph
+from bench_lod_fps import measure_fps
+
+
+def grid_graph(num_nodes:int, size):
+    graph = new_node_graph()
+    graph.load_onnx_graph(make_graph(num_nodes))
+    nodes = graph.all_nodes()
+    columns = int(math.ceil(math.sqrt(len(nodes))))
+    graph.set_node_positions(nodes, [[(i % columns) * 210.0, (i // columns) * 120.0] for i in range(len(nodes))])
+    graph.update_pipe_paint()
+    viewer = graph.viewer()
+    viewer.resize(*size)
+    viewer.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    viewer.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    viewer.show()
+    QtWidgets.QApplication.processEvents()
+    return graph
+
+
+def set_culling(graph, enabled:bool):
+    graph.culler.enabled = enabled
+    graph.culler.invalidate()
+    graph.culler.update()
+
+
+def measure_fit(graph)->float:
+    t0 = time.perf_counter()
+    graph.fit_to_selection()
+    QtWidgets.QApplication.processEvents()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 40000])
+    parser.add_argument("--zooms", type=float, nargs="+", default=[0.05, 0.3, 1.0])
+    parser.add_argument("--frames", type=int, default=40)
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1000], help="viewport width height")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+
+    print(f"viewport {args.size[0]}x{args.size[1]}")
+    print(f"{'nodes':>8} {'zoom':>6} {'all[fps]':>9} {'culled[fps]':>12} {'speedup':>8} {'items all/culled':>18}")
+    for num_nodes in args.nodes:
+        graph = grid_graph(num_nodes, args.size)
+        scene = graph.viewer().scene()
+        center = graph.culler.bounds().center()
+        fit = {}
+        for culling in [False, True]:
+            set_culling(graph, culling)
+            fit[culling] = measure_fit(graph)
+        for zoom in args.zooms:
+            fps = {}
+            items = {}
+            for culling in [False, True]:
+                set_culling(graph, culling)
+                fps[culling] = measure_fps(graph.viewer(), zoom, args.frames, center)
+                items[culling] = len(scene.items())
+            print(f"{graph.node_count():>8} {zoom:>6.2f} {fps[False]:>9.1f} {fps[True]:>12.1f} "
+                  f"{fps[True] / fps[False]:>8.2f} {f'{items[False]}/{items[True]}':>18}")
+        print(f"{graph.node_count():>8} fit_to_selection all {fit[False] * 1000:.1f} ms, culled {fit[True] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Synthetic ONNX models for the benchmarks.
+
+make_model() builds a layered float32 network: depth layers of width
+parallel nodes on [1, C, S, S] tensors. Each tensor is read by fan_out
+nodes of the next layer (Sum of fan_out inputs and a constant), or with
+fan_out 1 by an Add, Mul or Relu. Constants hold about const_size values.
+With nesting > 0 the middle layer of the first branch is an If whose
+branches hold a chain of their own, nested nesting levels deep.
+
+The same parameters always give the same model, byte for byte.
+
+usage:
+    python benchmarks/synthetic.py -o model.onnx --depth 200 --width 4 --fan-out 2 --nesting 2
+"""
+import argparse
+import math
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper, TensorProto
+
+INPUT_NAME = "input"
+OUTPUT_NAME = "output"
+
+
+@dataclass
+class SyntheticSpec:
+    depth: int = 100
+    width: int = 1
+    fan_out: int = 1
+    # values per constant tensor, rounded to a [1, C, S, S] shape.
+    const_size: int = 128
+    channels: int = 8
+    # levels of If nodes nested in each other.
+    nesting: int = 0
+    opset: int = 13
+
+    def spatial(self)->int:
+        return max(1, int(round(math.sqrt(self.const_size / self.channels))))
+
+    def shape(self)->List[int]:
+        s = self.spatial()
+        return [1, self.channels, s, s]
+
+    def name(self)->str:
+        return (f"synthetic_d{self.depth}_w{self.width}_f{self.fan_out}"
+                f"_c{self.const_size}_n{self.nesting}")
+
+    def to_dict(self)->Dict[str, Any]:
+        return asdict(self)
+
+
+class _Builder:
+    def __init__(self, spec:SyntheticSpec):
+        self.spec = spec
+        self.shape = spec.shape()
+        self.rng = np.random.default_rng(0)
+
+    def constant(self, name:str)->TensorProto:
+        values = self.rng.standard_normal(self.shape).astype(np.float32)
+        return numpy_helper.from_array(values, name)
+
+    def chain(self, prefix:str, inputs:List[str], depth:int, width:int, nesting:int,
+              nodes:List[onnx.NodeProto], initializers:List[TensorProto])->List[str]:
+        """
+        Appends depth layers of width nodes reading inputs (one tensor per branch)
+        and returns the output tensor of each branch.
+        """
+        fan_out = min(self.spec.fan_out, width)
+        prev = list(inputs)
+        for layer in range(depth):
+            current = []
+            for b in range(width):
+                name = f"{prefix}n{layer}_{b}"
+                out = f"{prefix}t{layer}_{b}"
+                if nesting > 0 and b == 0 and layer == depth // 2:
+                    self.if_node(name, prev[b], out, nesting, nodes)
+                elif fan_out > 1:
+                    const = f"{prefix}c{layer}_{b}"
+                    initializers.append(self.constant(const))
+                    srcs = [prev[(b - k) % width] for k in range(fan_out)]
+                    nodes.append(helper.make_node("Sum", srcs + [const], [out], name=name))
+                elif layer % 3 == 2:
+                    nodes.append(helper.make_node("Relu", [prev[b]], [out], name=name))
+                else:
+                    const = f"{prefix}c{layer}_{b}"
+                    initializers.append(self.constant(const))
+                    op = "Add" if layer % 3 == 0 else "Mul"
+                    nodes.append(helper.make_node(op, [prev[b], const], [out], name=name))
+                current.append(out)
+            prev = current
+        return prev
+
+    def if_node(self, name:str, src:str, out:str, nesting:int, nodes:List[onnx.NodeProto]):
+        """
+        Appends an If on a constant condition whose branches read src and write out.
+        """
+        cond = f"{name}_cond"
+        cond_node = helper.make_node("Constant", [], [cond], name=f"{name}_cond_const",
+                                     value=numpy_helper.from_array(np.array(True), cond))
+        branches = []
+        for key in ["then", "else"]:
+            prefix = f"{name}_{key}_"
+            body_nodes: List[onnx.NodeProto] = []
+            initializers: List[TensorProto] = []
+            # the body reads src from the outer scope.
+            outputs = self.chain(prefix, [src], max(1, self.spec.depth // 4), 1, nesting - 1, body_nodes, initializers)
+            body_nodes.append(helper.make_node("Identity", outputs, [f"{prefix}out"], name=f"{prefix}identity"))
+            branches.append(helper.make_graph(
+                body_nodes, f"{prefix}body", [],
+                [helper.make_tensor_value_info(f"{prefix}out", TensorProto.FLOAT, self.shape)],
+                initializer=initializers))
+        nodes.append(cond_node)
+        nodes.append(helper.make_node("If", [cond], [out], name=name,
+                                      then_branch=branches[0], else_branch=branches[1]))
+
+
+def make_model(spec:SyntheticSpec=None, **kwargs)->onnx.ModelProto:
+    """
+    Builds a model from spec, or from SyntheticSpec(**kwargs).
+    """
+    spec = spec or SyntheticSpec(**kwargs)
+    builder = _Builder(spec)
+    nodes: List[onnx.NodeProto] = []
+    initializers: List[TensorProto] = []
+    outputs = builder.chain("", [INPUT_NAME] * spec.width, spec.depth, spec.width, spec.nesting,
+                            nodes, initializers)
+    op = "Sum" if len(outputs) > 1 else "Identity"
+    nodes.append(helper.make_node(op, outputs, [OUTPUT_NAME], name="output_" + op.lower()))
+    graph = helper.make_graph(
+        nodes, "synthetic",
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.FLOAT, builder.shape)],
+        [helper.make_tensor_value_info(OUTPUT_NAME, TensorProto.FLOAT, builder.shape)],
+        initializer=initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", spec.opset)],
+                              producer_name="onnxgraphqt-benchmarks")
+    model.ir_version = 8
+    return model
+
+
+def count_nodes(model:onnx.ModelProto)->Tuple[int, int]:
+    """
+    (nodes of the main graph, nodes including If/Loop/Scan bodies)
+    """
+    def count(graph:onnx.GraphProto)->int:
+        n = len(graph.node)
+        for node in graph.node:
+            for attr in node.attribute:
+                if attr.type == onnx.AttributeProto.GRAPH:
+                    n += count(attr.g)
+                elif attr.type == onnx.AttributeProto.GRAPHS:
+                    n += sum([count(g) for g in attr.graphs])
+        return n
+    return len(model.graph.node), count(model.graph)
+
+
+def add_arguments(parser:argparse.ArgumentParser):
+    defaults = SyntheticSpec()
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="layers")
+    parser.add_argument("--width", type=int, default=defaults.width, help="parallel nodes per layer")
+    parser.add_argument("--fan-out", type=int, default=defaults.fan_out, help="readers of each tensor")
+    parser.add_argument("--const-size", type=int, default=defaults.const_size, help="values per constant")
+    parser.add_argument("--channels", type=int, default=defaults.channels, help="channels of the tensors")
+    parser.add_argument("--nesting", type=int, default=defaults.nesting, help="levels of nested If nodes")
+    parser.add_argument("--opset", type=int, default=defaults.opset)
+
+
+def spec_from_args(args:argparse.Namespace)->SyntheticSpec:
+    return SyntheticSpec(depth=args.depth, width=args.width, fan_out=args.fan_out,
+                         const_size=args.const_size, channels=args.channels,
+                         nesting=args.nesting, opset=args.opset)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", required=True, help="onnx file to write")
+    parser.add_argument("--check", action="store_true", help="run onnx.checker on the model")
+    add_arguments(parser)
+    args = parser.parse_args()
+    model = make_model(spec_from_args(args))
+    if args.check:
+        onnx.checker.check_model(model)
+    onnx.save(model, args.output)
+    main_nodes, all_nodes = count_nodes(model)
+    print(f"{args.output}: {main_nodes} nodes, {all_nodes} with subgraphs")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import os, sys
+# startup timing is measured from here.
+from .utils.timing import startup_timer
 import PySide2
 
 plugin_path = os.path.join(os.path.dirname(PySide2.__file__),
@@ -0,0 +1,322 @@
+"""
+Headless batch mode.
+
+    onnxgraphqt batch model_a.onnx model_b.onnx -o out/ \
+        --rename Relu Relu6 --opset 13 --export onnx png svg --jobs 8
+
+Each model is loaded, edited with the same tools as the side menu buttons
+in the order the options are given, loaded into an ONNXNodeGraph, laid out
+and exported to out/<model name>.<format>. Models are processed in a pool
+of worker processes on the offscreen Qt platform, no window is shown.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from ast import literal_eval
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+EXPORT_FORMATS = ("onnx", "json", "png", "svg", "pdf")
+# formats drawn from the node positions, the others do not need a layout.
+IMAGE_FORMATS = ("png", "svg", "pdf")
+
+_app = None
+
+
+def _init_qt():
+    """
+    Starts the offscreen Qt platform once per process.
+    NodeGraphQt keeps its scene on a QGraphicsView, which needs a QApplication,
+    but the view is never shown.
+    """
+    global _app
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PySide2 import QtWidgets
+    _app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class _OpAction(argparse.Action):
+    """
+    Appends (tool, kwargs) to args.ops, so the edits run in command line order.
+    """
+    def __init__(self, option_strings, dest, tool:str, build, **kwargs):
+        self.tool = tool
+        self.build = build
+        super().__init__(option_strings, dest="ops", **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        ops = list(getattr(namespace, "ops", None) or [])
+        try:
+            ops.append((self.tool, self.build(values)))
+        except (ValueError, SyntaxError) as e:
+            parser.error(f"{option_string}: {e}")
+        namespace.ops = ops
+
+
+class _IOChangeAction(_OpAction):
+    """
+    --input-shape and --output-shape go into one io_change edit, at the
+    place of the first of them. sio4onnx needs both inputs and outputs.
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        ops = list(getattr(namespace, "ops", None) or [])
+        try:
+            kwargs = self.build(values)
+        except (ValueError, SyntaxError) as e:
+            parser.error(f"{option_string}: {e}")
+        for i, (tool, op_kwargs) in enumerate(ops):
+            if tool == self.tool:
+                merged = dict(op_kwargs)
+                for key, value in kwargs.items():
+                    merged[key] = merged.get(key, []) + value
+                ops[i] = (tool, merged)
+                break
+        else:
+            ops.append((self.tool, kwargs))
+        namespace.ops = ops
+
+
+def _shape(value:str)->List[Any]:
+    shape = literal_eval(value)
+    if not isinstance(shape, (list, tuple)):
+        raise ValueError(f"not a shape: {value}")
+    return list(shape)
+
+
+def _io_change(values:List[str], kind:str)->Dict[str, Any]:
+    # NAME SHAPE [NAME SHAPE ...]
+    if len(values) % 2 != 0:
+        raise ValueError("expected NAME SHAPE pairs")
+    return {
+        f"{kind}_names": values[0::2],
+        f"{kind}_shapes": [_shape(v) for v in values[1::2]],
+    }
+
+
+def build_parser()->argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="onnxgraphqt batch",
+        description="Edit, lay out and export ONNX models without the GUI.")
+    parser.add_argument("models", nargs="+", help="onnx or json model files.")
+    parser.add_argument("-o", "--output-dir", required=True,
+                        help="directory for the exported files, named <model name>.<format>.")
+    parser.add_argument("-e", "--export", nargs="+", choices=EXPORT_FORMATS, default=["onnx"],
+                        help="formats to export. default: onnx")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="models processed in parallel. default: number of cores")
+    parser.add_argument("--png-scale", type=float, default=1.0,
+                        help="scale of the png export. default: 1.0")
+    parser.add_argument("--no-groups", action="store_true",
+                        help="do not collapse the name scopes of large models.")
+    parser.add_argument("--report", default=None,
+                        help="write the result of every model to this json file.")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print every tool log record, not only warnings and errors.")
+    parser.set_defaults(ops=[])
+
+    edits = parser.add_argument_group("edits", "run in the order they are given.")
+    edits.add_argument("--rename", nargs=2, metavar=("OLD", "NEW"),
+                       action=_OpAction, tool="rename",
+                       build=lambda v: {"old_new": list(v)},
+                       help="rename ops and tensors named OLD to NEW.")
+    edits.add_argument("--extract", nargs=2, metavar=("INPUTS", "OUTPUTS"),
+                       action=_OpAction, tool="extraction",
+                       build=lambda v: {"input_op_names": v[0].split(","),
+                                        "output_op_names": v[1].split(",")},
+                       help="extract the network between comma separated input and output tensor names.")
+    edits.add_argument("--shrink", choices=["shrink", "npy"], metavar="MODE",
+                       action=_OpAction, tool="shrinking",
+                       build=lambda v: {"mode": v},
+                       help="shrink duplicated constants, MODE is shrink or npy.")
+    edits.add_argument("--opset", type=int,
+                       action=_OpAction, tool="op_change",
+                       build=lambda v: {"opset": v},
+                       help="change the opset.")
+    edits.add_argument("--batchsize", metavar="BATCHSIZE",
+                       action=_OpAction, tool="batchsize_initialize",
+                       build=lambda v: {"initialization_character_string": v},
+                       help="set the batch size of the inputs, e.g. 1 or N.")
+    edits.add_argument("--input-shape", nargs="+", metavar="NAME SHAPE",
+                       action=_IOChangeAction, tool="io_change",
+                       build=lambda v: _io_change(v, "input"),
+                       help="change input shapes, e.g. --input-shape input \"[1,3,224,224]\".")
+    edits.add_argument("--output-shape", nargs="+", metavar="NAME SHAPE",
+                       action=_IOChangeAction, tool="io_change",
+                       build=lambda v: _io_change(v, "output"),
+                       help="change output shapes, e.g. --output-shape output \"[1,1000]\".")
+    return parser
+
+
+def _load_model(model_path:str):
+    import onnx
+    ext = os.path.splitext(model_path)[-1]
+    if ext == ".json":
+        from onnxgraphqt.utils.tool_service import get_tool
+        return get_tool("json2onnx")(input_json_path=model_path)
+    return onnx.load(model_path)
+
+
+def _fill_io_change(onnx_model, kwargs:Dict[str, Any])->Dict[str, Any]:
+    """
+    Adds the current shape of every graph input and output that kwargs does
+    not change, as the io change dialog does.
+    """
+    graph = onnx_model.graph
+    initializers = set([t.name for t in graph.initializer])
+    kwargs = dict(kwargs)
+    for kind, values in [("input", [v for v in graph.input if v.name not in initializers]),
+                         ("output", list(graph.output))]:
+        names = list(kwargs.get(f"{kind}_names", []))
+        shapes = list(kwargs.get(f"{kind}_shapes", []))
+        for v in values:
+            if v.name not in names:
+                names.append(v.name)
+                shapes.append([d.dim_value if d.HasField("dim_value") else d.dim_param
+                               for d in v.type.tensor_type.shape.dim])
+        kwargs[f"{kind}_names"] = names
+        kwargs[f"{kind}_shapes"] = shapes
+    return kwargs
+
+
+def _missing_tensors(onnx_model, names:List[str])->List[str]:
+    graph = onnx_model.graph
+    tensors = set([v.name for v in graph.input] + [v.name for v in graph.output])
+    for node in graph.node:
+        tensors.update(node.output)
+    return [name for name in names if name not in tensors]
+
+
+def process_model(model_path:str, output_dir:str, ops:List[Tuple[str, Dict[str, Any]]],
+                  export:List[str], png_scale:float=1.0, group:bool=True)->Dict[str, Any]:
+    """
+    Runs the edits on one model and writes the exports.
+
+    Returns:
+        Dict[str, Any]: model, outputs, logs (tool log records as strings),
+            error (None on success) and seconds.
+    """
+    t0 = time.time()
+    ret = {"model": model_path, "outputs": [], "logs": [], "error": None, "seconds": 0.0}
+    try:
+        _init_qt()
+        import onnx_graphsurgeon as gs
+        from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph
+        from onnxgraphqt.graph.onnx_lazy_loader import import_onnx_lazy
+        from onnxgraphqt.utils.tool_service import call_tool, get_tool
+
+        if ops or os.path.splitext(model_path)[-1] == ".json":
+            onnx_model = _load_model(model_path)
+            for tool, kwargs in ops:
+                if tool == "extraction":
+                    # sne4onnx returns an empty model for unknown names.
+                    missing = _missing_tensors(onnx_model, kwargs["input_op_names"] + kwargs["output_op_names"])
+                    if missing:
+                        ret["error"] = f"{tool}: not found {', '.join(missing)}"
+                        return ret
+                elif tool == "io_change":
+                    kwargs = _fill_io_change(onnx_model, kwargs)
+                result = call_tool(tool, onnx_graph=onnx_model, non_verbose=False, **kwargs)
+                ret["logs"] += [f"{tool}: {r}" for r in result.logs]
+                if not result.ok:
+                    ret["error"] = f"{tool}: {result.error or 'no output model.'}"
+                    return ret
+                onnx_model = result.model
+            onnx_graph = gs.import_onnx(onnx_model)
+        else:
+            # large initializers stay on disk (memory-mapped).
+            onnx_model, onnx_graph = import_onnx_lazy(model_path)
+
+        graph = ONNXNodeGraph(name=onnx_graph.name,
+                              opset=onnx_graph.opset,
+                              doc_string=onnx_graph.doc_string,
+                              import_domains=onnx_graph.import_domains,
+                              producer_name=onnx_model.producer_name,
+                              producer_version=onnx_model.producer_version,
+                              ir_version=onnx_model.ir_version,
+                              model_version=onnx_model.model_version)
+        if not group:
+            graph.group_min_nodes = 0
+        graph.load_onnx_graph(onnx_graph)
+        if any([fmt in IMAGE_FORMATS for fmt in export]):
+            graph.update_pipe_paint()
+            graph.auto_layout(push_undo=False)
+
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        for fmt in export:
+            file_path = os.path.join(output_dir, f"{name}.{fmt}")
+            if fmt == "onnx":
+                graph.export(file_path)
+            elif fmt == "json":
+                get_tool("onnx2json")(onnx_graph=graph.to_onnx(),
+                                      output_json_path=file_path,
+                                      json_indent=2)
+            elif fmt == "png":
+                graph.export_to_png(file_path, scale=png_scale)
+            elif fmt == "svg":
+                graph.export_to_svg(file_path)
+            elif fmt == "pdf":
+                graph.export_to_pdf(file_path)
+            ret["outputs"].append(file_path)
+    except Exception as e:
+        ret["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        ret["seconds"] = time.time() - t0
+    return ret
+
+
+def _print_result(ret:Dict[str, Any], verbose=False):
+    for log in ret["logs"]:
+        if verbose or not log.split(": ", 1)[-1].startswith(("DEBUG", "INFO")):
+            print(f"  {log}")
+    if ret["error"] is None:
+        print(f"[ok] {ret['model']} ({ret['seconds']:.2f}s): {', '.join(ret['outputs'])}")
+    else:
+        print(f"[error] {ret['model']} ({ret['seconds']:.2f}s): {ret['error']}")
+
+
+def main(argv:Optional[List[str]]=None)->int:
+    args = build_parser().parse_args(argv)
+    missing = [m for m in args.models if not os.path.exists(m)]
+    if missing:
+        print(f"not found: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    t0 = time.time()
+    results = []
+    jobs = max(1, min(args.jobs, len(args.models)))
+    task_args = (args.output_dir, args.ops, args.export, args.png_scale, not args.no_groups)
+    if jobs == 1:
+        for model_path in args.models:
+            ret = process_model(model_path, *task_args)
+            _print_result(ret, args.verbose)
+            results.append(ret)
+    else:
+        # Qt does not survive fork, every worker starts its own QApplication.
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(start_method),
+                                 initializer=_init_qt) as executor:
+            futures = [executor.submit(process_model, m, *task_args) for m in args.models]
+            for model_path, future in zip(args.models, futures):
+                try:
+                    ret = future.result()
+                except BaseException as e:
+                    # e.g. the worker died in native code.
+                    ret = {"model": model_path, "outputs": [], "logs": [],
+                           "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                _print_result(ret, args.verbose)
+                results.append(ret)
+
+    failed = [r for r in results if r["error"] is not None]
+    print(f"{len(results) - len(failed)}/{len(results)} models done in {time.time() - t0:.2f}s.")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
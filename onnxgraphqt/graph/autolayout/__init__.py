@@ -1 +1,2 @@
-from .sugiyama_layout import sugiyama_layout
\ No newline at end of file
+from .dag_layout import dag_layout, incremental_dag_layout
+from .layout_cache import LayoutCache, topology_hash
\ No newline at end of file
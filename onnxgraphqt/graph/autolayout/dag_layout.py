@@ -0,0 +1,456 @@
+import bisect
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = ["dag_layout", "incremental_dag_layout"]
+
+
+# horizontal distance between the centers of two neighbouring nodes in a layer.
+NODE_SPACING = 210.0
+# vertical distance between two layers.
+LAYER_SPACING = 120.0
+# width of the virtual nodes that route long edges, relative to NODE_SPACING.
+DUMMY_WIDTH_RATIO = 0.25
+# longer edges are not routed through virtual nodes, which would
+# otherwise grow with edges x layers (e.g. a mask used by every block).
+MAX_SPLIT_SPAN = 20
+# horizontal gap between two connected components.
+COMPONENT_SPACING = 420.0
+# barycenter sweeps for crossing reduction.
+ORDER_ITERATIONS = 12
+# sweeps pulling nodes over their neighbours.
+COORDINATE_ITERATIONS = 8
+# incremental layout: descendants of the changed nodes re-ranked up to this many edges away.
+INCREMENTAL_RADIUS = 8
+
+
+def dag_layout(num_nodes:int, edges, node_spacing=NODE_SPACING, layer_spacing=LAYER_SPACING)->np.ndarray:
+    """
+    Layered (Sugiyama style) layout of a directed graph.
+
+    1. longest-path layering towards the sinks, so sources sit right above
+       their first consumer. Sinks sit right below their last producer.
+    2. virtual nodes on edges spanning up to MAX_SPLIT_SPAN layers.
+    3. barycenter crossing reduction.
+    4. coordinate assignment pulling nodes over their neighbours.
+    5. connected components placed side by side.
+
+    Steps 3 and 4 update every other layer at once with numpy, so the cost
+    does not grow with the number of layers in Python.
+
+    Args:
+        num_nodes (int): nodes are 0 .. num_nodes-1.
+        edges (array-like): (num_edges, 2) pairs of (src, dst), src is placed above dst.
+            Edges closing a cycle are reversed.
+        node_spacing (float): distance between neighbouring nodes in a layer.
+        layer_spacing (float): distance between layers.
+    Returns:
+        np.ndarray: (num_nodes, 2) x, y of each node, y grows downwards.
+    """
+    if num_nodes == 0:
+        return np.zeros((0, 2))
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    if len(edges) > 0:
+        edges = np.unique(edges, axis=0)
+
+    order, edges = topological_order(num_nodes, edges)
+    component = connected_components(num_nodes, edges)
+    layer = longest_path_layers(num_nodes, edges, order, component)
+
+    # virtual nodes, edges span one layer afterwards except the longest ones.
+    rank = np.empty(num_nodes, dtype=np.float64)
+    rank[order] = np.arange(num_nodes)
+    layer, component, rank, edges, num_all = _split_long_edges(num_nodes, edges, layer, component, rank)
+    widths = np.full(num_all, 1.0)
+    widths[num_nodes:] = DUMMY_WIDTH_RATIO
+
+    # one group per (component, layer)
+    num_layers = np.zeros(component.max() + 1, dtype=np.int64)
+    np.maximum.at(num_layers, component, layer + 1)
+    layer_offset = np.concatenate([[0], np.cumsum(num_layers)[:-1]])
+    group = layer_offset[component] + layer
+
+    sorted_nodes = _reduce_crossings(group, layer, rank, edges)
+    x = _assign_coordinates(sorted_nodes, group, layer, widths, edges) * node_spacing
+    x = _place_components(x, component, node_spacing)
+
+    pos = np.stack([x, layer * layer_spacing], axis=1)
+    return pos[:num_nodes]
+
+
+def topological_order(num_nodes:int, edges:np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+    """
+    Kahn's algorithm. Nodes left over by a cycle are ordered by index, and
+    edges going against the returned order are reversed.
+
+    Returns:
+        (np.ndarray, np.ndarray): node order, edges consistent with it.
+    """
+    children = _adjacency(num_nodes, edges[:, 0], edges[:, 1])
+    indegree = np.bincount(edges[:, 1], minlength=num_nodes).tolist()
+    stack = [v for v in range(num_nodes - 1, -1, -1) if indegree[v] == 0]
+    order = []
+    visited = [False] * num_nodes
+    next_unvisited = 0
+    while len(order) < num_nodes:
+        if not stack:
+            # cycle: continue from the first node not placed yet.
+            while visited[next_unvisited]:
+                next_unvisited += 1
+            stack.append(next_unvisited)
+        v = stack.pop()
+        if visited[v]:
+            continue
+        visited[v] = True
+        order.append(v)
+        for c in children[v]:
+            indegree[c] -= 1
+            if indegree[c] == 0 and not visited[c]:
+                stack.append(c)
+    order = np.array(order, dtype=np.int64)
+    if len(edges) > 0:
+        rank = np.empty(num_nodes, dtype=np.int64)
+        rank[order] = np.arange(num_nodes)
+        back = rank[edges[:, 0]] > rank[edges[:, 1]]
+        if back.any():
+            edges = edges.copy()
+            edges[back] = edges[back][:, ::-1]
+            edges = np.unique(edges, axis=0)
+    return order, edges
+
+
+def connected_components(num_nodes:int, edges:np.ndarray)->np.ndarray:
+    """
+    Component id of each node, numbered in order of their smallest node.
+    """
+    parent = list(range(num_nodes))
+
+    def find(v):
+        root = v
+        while parent[root] != root:
+            root = parent[root]
+        while parent[v] != root:
+            parent[v], v = root, parent[v]
+        return root
+
+    for a, b in edges.tolist():
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            if ra < rb:
+                parent[rb] = ra
+            else:
+                parent[ra] = rb
+    roots = np.array([find(v) for v in range(num_nodes)], dtype=np.int64)
+    _, component = np.unique(roots, return_inverse=True)
+    return component
+
+
+def longest_path_layers(num_nodes:int, edges:np.ndarray, order:np.ndarray, component:np.ndarray)->np.ndarray:
+    """
+    Layer of each node, counted from the top of its component.
+
+    Every node that has successors is one layer above its highest
+    successor (longest path to a sink), and every sink is one layer below
+    its lowest predecessor, so neither sources nor sinks are stretched to
+    the ends of the graph.
+    """
+    children = _adjacency(num_nodes, edges[:, 0], edges[:, 1])
+    height = [0] * num_nodes
+    for v in order[::-1].tolist():
+        cs = children[v]
+        if cs:
+            height[v] = max([height[c] for c in cs]) + 1
+    height = np.array(height, dtype=np.int64)
+    max_height = np.zeros(component.max() + 1, dtype=np.int64)
+    np.maximum.at(max_height, component, height)
+    layer = max_height[component] - height
+
+    is_sink = np.bincount(edges[:, 0], minlength=num_nodes) == 0
+    if len(edges) > 0:
+        parent_layer = np.full(num_nodes, -1, dtype=np.int64)
+        np.maximum.at(parent_layer, edges[:, 1], layer[edges[:, 0]])
+        has_parent = parent_layer >= 0
+        layer = np.where(is_sink & has_parent, parent_layer + 1, layer)
+    return layer
+
+
+def _adjacency(num_nodes:int, src:np.ndarray, dst:np.ndarray)->List[List[int]]:
+    adjacency = [[] for _ in range(num_nodes)]
+    for a, b in zip(src.tolist(), dst.tolist()):
+        adjacency[a].append(b)
+    return adjacency
+
+
+def _split_long_edges(num_nodes, edges, layer, component, rank):
+    """
+    Replaces every edge spanning 1 < k <= MAX_SPLIT_SPAN layers by a chain of k - 1 virtual nodes.
+    """
+    if len(edges) == 0:
+        return layer, component, rank, edges, num_nodes
+    src, dst = edges[:, 0], edges[:, 1]
+    span = layer[dst] - layer[src]
+    long = (span > 1) & (span <= MAX_SPLIT_SPAN)
+    if not long.any():
+        return layer, component, rank, edges, num_nodes
+
+    lsrc, ldst = src[long], dst[long]
+    count = span[long] - 1
+    num_dummies = int(count.sum())
+    first = num_nodes + np.concatenate([[0], np.cumsum(count)[:-1]])
+    last = first + count - 1
+    chain = np.repeat(np.arange(len(lsrc)), count)
+    step = np.arange(num_dummies) - (first - num_nodes)[chain]
+    dummies = np.arange(num_nodes, num_nodes + num_dummies)
+
+    layer = np.concatenate([layer, layer[lsrc][chain] + step + 1])
+    component = np.concatenate([component, component[lsrc][chain]])
+    # keep a long edge next to its source in the initial order.
+    rank = np.concatenate([rank, rank[lsrc][chain] + 0.5])
+
+    is_last = np.zeros(num_dummies, dtype=bool)
+    is_last[last - num_nodes] = True
+    new_edges = np.concatenate([
+        edges[~long],
+        np.stack([lsrc, first], axis=1),
+        np.stack([dummies[~is_last], dummies[~is_last] + 1], axis=1),
+        np.stack([last, ldst], axis=1),
+    ])
+    return layer, component, rank, new_edges, num_nodes + num_dummies
+
+
+def _group_ranks(sorted_nodes:np.ndarray, group:np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+    """
+    Position of each node inside its group, and the size of its group.
+    """
+    g = group[sorted_nodes]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    sizes = np.diff(np.r_[starts, len(g)])
+    index = np.arange(len(g)) - np.repeat(starts, sizes)
+    position = np.empty(len(g), dtype=np.float64)
+    position[sorted_nodes] = index
+    size = np.empty(len(g), dtype=np.float64)
+    size[sorted_nodes] = np.repeat(sizes, sizes)
+    return position, size
+
+
+def _neighbour_mean(values:np.ndarray, edges:np.ndarray, default:np.ndarray)->np.ndarray:
+    """
+    Mean of values over the predecessors and successors of each node, default where there are none.
+    """
+    n = len(values)
+    src, dst = edges[:, 0], edges[:, 1]
+    total = np.bincount(dst, weights=values[src], minlength=n) \
+        + np.bincount(src, weights=values[dst], minlength=n)
+    count = np.bincount(dst, minlength=n) + np.bincount(src, minlength=n)
+    return np.where(count > 0, total / np.maximum(count, 1), default)
+
+
+def _reduce_crossings(group:np.ndarray, layer:np.ndarray, rank:np.ndarray, edges:np.ndarray)->np.ndarray:
+    """
+    Barycenter heuristic. Odd and even layers are reordered in turns, each
+    against the fixed order of the layers around it.
+
+    Returns:
+        np.ndarray: node ids sorted by group and by position in the group.
+    """
+    sorted_nodes = np.lexsort((rank, group))
+    # edges left longer than MAX_SPLIT_SPAN say little about the order of a layer.
+    edges = edges[layer[edges[:, 1]] - layer[edges[:, 0]] == 1]
+    if len(edges) == 0:
+        return sorted_nodes
+    for i in range(ORDER_ITERATIONS):
+        position, size = _group_ranks(sorted_nodes, group)
+        # centered, so layers of different sizes line up.
+        x = position - (size - 1) / 2
+        barycenter = _neighbour_mean(x, edges, x)
+        moving = (layer % 2) == (i % 2)
+        key = np.where(moving, barycenter, x)
+        sorted_nodes = np.lexsort((x, key, group))
+    return sorted_nodes
+
+
+def _segment_cummax(values:np.ndarray, segment:np.ndarray)->np.ndarray:
+    """
+    Running maximum restarting at each segment; segment ids are sorted.
+    """
+    span = values.max() - values.min() + 1.0
+    offset = segment * span
+    return np.maximum.accumulate(values + offset) - offset
+
+
+def _segment_rev_cummin(values:np.ndarray, segment:np.ndarray)->np.ndarray:
+    """
+    Running minimum from the end of each segment; segment ids are sorted.
+    """
+    span = values.max() - values.min() + 1.0
+    offset = segment * span
+    return np.minimum.accumulate((values + offset)[::-1])[::-1] - offset
+
+
+def _assign_coordinates(sorted_nodes:np.ndarray, group:np.ndarray, layer:np.ndarray,
+                        widths:np.ndarray, edges:np.ndarray)->np.ndarray:
+    """
+    x of each node in units of node spacing.
+
+    Nodes are moved towards the mean x of their neighbours, every other
+    layer at a time, then pushed apart again so the nodes of a group keep
+    their order and their minimum distance.
+    """
+    n = len(sorted_nodes)
+    g = group[sorted_nodes]
+    w = widths[sorted_nodes]
+    new_group = np.r_[True, g[1:] != g[:-1]]
+    segment = np.cumsum(new_group) - 1
+    # minimum offset of each node from the first node of its group.
+    gap = np.r_[0.0, (w[1:] + w[:-1]) / 2]
+    gap[new_group] = 0.0
+    offset = np.cumsum(gap)
+    offset -= np.repeat(offset[new_group], np.diff(np.r_[np.flatnonzero(new_group), n]))
+
+    # start centered
+    group_width = np.repeat(offset[np.r_[np.flatnonzero(new_group)[1:] - 1, n - 1]],
+                            np.diff(np.r_[np.flatnonzero(new_group), n]))
+    xs = offset - group_width / 2
+    x = np.empty(n, dtype=np.float64)
+    x[sorted_nodes] = xs
+    if len(edges) == 0:
+        return x
+
+    sorted_layer = layer[sorted_nodes]
+    for i in range(COORDINATE_ITERATIONS):
+        target = _neighbour_mean(x, edges, x)[sorted_nodes]
+        moving = (sorted_layer % 2) == (i % 2)
+        target = np.where(moving, target, xs)
+        free = target - offset
+        xs = (_segment_cummax(free, segment) + _segment_rev_cummin(free, segment)) / 2 + offset
+        x[sorted_nodes] = xs
+    return x
+
+
+def _place_components(x:np.ndarray, component:np.ndarray, node_spacing:float)->np.ndarray:
+    num_components = component.max() + 1
+    left = np.full(num_components, np.inf)
+    right = np.full(num_components, -np.inf)
+    np.minimum.at(left, component, x)
+    np.maximum.at(right, component, x)
+    width = right - left + node_spacing + COMPONENT_SPACING
+    start = np.concatenate([[0.0], np.cumsum(width)[:-1]])
+    return x - left[component] + start[component]
+
+
+def incremental_dag_layout(positions:np.ndarray, seeds:Iterable[int],
+                           predecessors:Callable[[int], List[int]], successors:Callable[[int], List[int]],
+                           new_nodes:Iterable[int]=(), radius=INCREMENTAL_RADIUS,
+                           node_spacing=NODE_SPACING, layer_spacing=LAYER_SPACING)->Optional[Dict[int, Tuple[float, float]]]:
+    """
+    Updates a previous layout around a few changed nodes.
+
+    The layer (y) and order (x) of every node are read from positions.
+    The seeds, and their descendants up to radius edges away whose
+    predecessors moved, are re-ranked one layer below their lowest
+    predecessor; nodes further down only move down when a predecessor
+    now reaches their layer. A node that changes layer keeps its x unless
+    that is taken in the new layer, and a new node goes to the free slot
+    nearest to the mean x of its neighbours. All other nodes keep their
+    coordinates.
+
+    Args:
+        positions (np.ndarray): (num_nodes, 2) current x, y. Rows of new nodes are ignored.
+        seeds (Iterable[int]): nodes whose inputs changed.
+        predecessors, successors (Callable[[int], List[int]]): neighbours of a node.
+        new_nodes (Iterable[int]): nodes without a position yet, also seeds.
+        radius (int): re-rank descendants up to this many edges from a seed.
+    Returns:
+        Dict[int, Tuple[float, float]]: new x, y of the nodes that moved,
+            None when the neighbours contain a cycle and dag_layout should be used.
+    """
+    num_nodes = len(positions)
+    new_nodes = set(new_nodes)
+    seeds = set(seeds) | new_nodes
+    # a node is visited again for each predecessor that moves, more is a cycle.
+    max_visits = 16 * num_nodes + 64
+    x = {}
+    y = {}
+
+    def get_y(v):
+        return y[v] if v in y else float(positions[v, 1])
+
+    # layers: nodes are visited again whenever a predecessor moves.
+    depth = {v: 0 for v in seeds}
+    heap = [(get_y(v) if v not in new_nodes else np.inf, i, v) for i, v in enumerate(seeds)]
+    heapq.heapify(heap)
+    counter = len(heap)
+    while heap:
+        _, _, v = heapq.heappop(heap)
+        old_y = None if v in new_nodes and v not in y else get_y(v)
+        ps = [p for p in predecessors(v) if p not in new_nodes or p in y]
+        if ps:
+            new_y = max([get_y(p) for p in ps]) + layer_spacing
+            if depth[v] > radius and old_y is not None:
+                # outside the radius, only make room below the predecessors.
+                new_y = max(new_y, old_y)
+        elif old_y is None:
+            ss = [c for c in successors(v) if c not in new_nodes]
+            new_y = min([get_y(c) for c in ss]) - layer_spacing if ss else 0.0
+        else:
+            new_y = old_y
+        if new_y == old_y:
+            continue
+        y[v] = new_y
+        if counter > max_visits:
+            return None
+        for c in successors(v):
+            d = depth[v] + 1
+            if c in new_nodes or d <= radius or get_y(c) <= new_y:
+                depth[c] = min(depth.get(c, d), d)
+                key = new_y + layer_spacing if c in new_nodes and c not in y else get_y(c)
+                heapq.heappush(heap, (key, counter, c))
+                counter += 1
+
+    moved = list(y.keys())
+    if not moved:
+        return {}
+    # order: free slot nearest to the neighbours, nodes placed top to bottom.
+    keep = np.ones(num_nodes, dtype=bool)
+    keep[moved] = False
+    fixed_x = positions[keep, 0]
+    fixed_y = positions[keep, 1]
+    rows: Dict[float, List[float]] = {}
+
+    def row(layer_y):
+        if layer_y not in rows:
+            rows[layer_y] = sorted(fixed_x[np.abs(fixed_y - layer_y) < layer_spacing / 2].tolist())
+        return rows[layer_y]
+
+    for v in sorted(moved, key=lambda v: y[v]):
+        if v not in new_nodes:
+            target = float(positions[v, 0])
+        else:
+            neighbours = [p for p in predecessors(v) if p not in new_nodes or p in x]
+            if not neighbours:
+                neighbours = [s for s in successors(v) if s not in new_nodes or s in x]
+            target = float(np.mean([x[n] if n in x else positions[n, 0] for n in neighbours])) if neighbours else 0.0
+        xs = row(y[v])
+        x[v] = _free_slot(xs, target, node_spacing)
+        bisect.insort(xs, x[v])
+    return {v: (x[v], y[v]) for v in moved}
+
+
+def _free_slot(xs:List[float], target:float, spacing:float)->float:
+    """
+    x nearest to target at least spacing away from every x in the sorted list xs.
+    """
+    right = target
+    i = bisect.bisect_right(xs, right - spacing)
+    while i < len(xs) and xs[i] < right + spacing:
+        right = xs[i] + spacing
+        i += 1
+    left = target
+    i = bisect.bisect_left(xs, left + spacing) - 1
+    while i >= 0 and xs[i] > left - spacing:
+        left = xs[i] - spacing
+        i -= 1
+    return left if target - left < right - target else right
@@ -0,0 +1,145 @@
+import hashlib
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+__all__ = ["LayoutCache", "topology_hash"]
+
+
+# bump when the layout algorithm changes, so older entries are not used.
+LAYOUT_CACHE_VERSION = 1
+# total size of the cache directory; the least recently used entries are removed above it.
+LAYOUT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def default_cache_dir()->str:
+    from PySide2.QtCore import QStandardPaths
+    root = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not root:
+        root = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "onnxgraphqt", "layout")
+
+
+def canonical_order(labels:Sequence[str])->np.ndarray:
+    """
+    Node order that does not depend on the order the nodes were created in.
+    Nodes with the same label keep their relative order.
+    """
+    return np.array(sorted(range(len(labels)), key=labels.__getitem__), dtype=np.int64)
+
+
+def topology_hash(labels:Sequence[str], edges:np.ndarray, *params)->str:
+    """
+    Hash of a graph for the layout cache.
+
+    Args:
+        labels (Sequence[str]): label of each node, e.g. node type, name and op.
+        edges (np.ndarray): (num_edges, 2) pairs of node indices.
+        params: layout parameters that change the result.
+    Returns:
+        str: hex digest, the same for the same nodes and edges in any order.
+    """
+    order = canonical_order(labels)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = rank[edges]
+    if len(edges) > 0:
+        edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+    h = hashlib.sha256()
+    h.update(repr((LAYOUT_CACHE_VERSION, len(labels)) + params).encode())
+    for i in order.tolist():
+        h.update(labels[i].encode())
+        h.update(b"\0")
+    h.update(np.ascontiguousarray(edges).tobytes())
+    return h.hexdigest()
+
+
+class LayoutCache:
+    """
+    Node positions on disk by topology_hash.
+
+    Each entry is a .npy file of positions in canonical node order. Reading
+    an entry marks it as used, and put() removes the least recently used
+    entries while the directory is larger than max_bytes.
+    """
+
+    def __init__(self, directory:str=None, max_bytes:int=LAYOUT_CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _path(self, key:str)->str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key:str, labels:Sequence[str])->Optional[np.ndarray]:
+        """
+        Returns:
+            np.ndarray: (num_nodes, 2) positions in the order of labels, None if not cached.
+        """
+        path = self._path(key)
+        try:
+            canonical = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if canonical.shape != (len(labels), 2):
+            return None
+        positions = np.empty_like(canonical)
+        positions[canonical_order(labels)] = canonical
+        return positions
+
+    def put(self, key:str, labels:Sequence[str], positions:np.ndarray):
+        """
+        Stores positions given in the order of labels.
+        Failing to write is not an error, the layout is just computed again next time.
+        """
+        canonical = np.asarray(positions, dtype=np.float64)[canonical_order(labels)]
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, canonical, allow_pickle=False)
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError as e:
+            print(f"layout cache: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum([size for _, size, _ in entries])
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.directory, name))
+
+    def entries(self)->List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [name[:-4] for name in os.listdir(self.directory) if name.endswith(".npy")]
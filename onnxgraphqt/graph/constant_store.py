@@ -0,0 +1,75 @@
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+
+PREVIEW_ITEMS = 8
+
+
+class ConstantStore:
+    """
+    Holds constant tensor values by tensor name.
+
+    Values are kept as the numpy arrays handed over by onnx_graphsurgeon,
+    so nothing is converted to python lists and a tensor shared by several
+    nodes is stored only once.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, np.ndarray] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def add(self, name: str, values) -> np.ndarray:
+        """
+        Register tensor values and return the stored array.
+
+        Args:
+            name (str): tensor name.
+            values (numpy.ndarray): tensor values.
+        Returns:
+            numpy.ndarray: stored array (the one already registered if the name is known).
+        """
+        stored = self._values.get(name)
+        if stored is None:
+            stored = values if isinstance(values, np.ndarray) else np.asarray(values)
+            self._values[name] = stored
+        return stored
+
+    def get(self, name: str) -> Optional[np.ndarray]:
+        return self._values.get(name)
+
+    def remove(self, name: str):
+        self._values.pop(name, None)
+
+    def clear(self):
+        self._values.clear()
+
+    def nbytes(self) -> int:
+        return sum([v.nbytes for v in self._values.values()])
+
+
+def values_preview(values, max_items: int = PREVIEW_ITEMS) -> Optional[str]:
+    """
+    Returns a short text preview of tensor values.
+
+    Only the first ``max_items`` elements are read, so large (or memory-mapped)
+    arrays are not touched as a whole.
+    """
+    if values is None:
+        return None
+    if not isinstance(values, np.ndarray):
+        return str(values)
+    if values.ndim == 0:
+        return str(values.tolist())
+    head = values.flat[:max_items].tolist()
+    if values.size <= max_items:
+        return str(head)
+    return str(head)[:-1] + f", ...] ({values.size} items)"
@@ -0,0 +1,100 @@
+from typing import Dict, List, Set, Tuple
+
+import onnx_graphsurgeon as gs
+
+
+# graphs with fewer op nodes are shown without groups.
+GROUP_MIN_NODES = 1000
+# scopes with fewer op nodes stay as plain nodes.
+GROUP_MIN_SIZE = 8
+
+
+def name_scope(name:str)->Tuple[str, ...]:
+    """
+    Name scope of an exported node name, e.g.
+    "/encoder/layer.3/attention/MatMul" -> ("encoder", "layer.3", "attention").
+    """
+    return tuple([p for p in name.split("/")[:-1] if p])
+
+
+def scope_name(scope:Tuple[str, ...])->str:
+    """
+    ("encoder", "layer.3") -> "/encoder/layer.3/"
+    """
+    return "/" + "/".join(scope) + "/"
+
+
+def group_nodes(nodes:List[gs.Node], depth:int=0, min_size:int=GROUP_MIN_SIZE)->Tuple[List[Tuple[Tuple[str, ...], List[gs.Node]]], List[gs.Node]]:
+    """
+    Splits nodes by name scope one level below depth.
+
+    When all nodes share that scope level, the next one is used, so a model
+    whose names all start with "/model/" is split at its layers.
+
+    Args:
+        nodes (List[gs.Node]): nodes to split, in graph order.
+        depth (int): scope levels the nodes already share, e.g. 1 for the members of "/encoder/".
+        min_size (int): smaller scopes are not grouped.
+    Returns:
+        (List[Tuple[Tuple[str, ...], List[gs.Node]]], List[gs.Node]):
+            (scope, member nodes) per group in order of first appearance, and the ungrouped nodes.
+    """
+    scopes = [name_scope(n.name) for n in nodes]
+    max_depth = max([len(s) for s in scopes], default=0)
+    for d in range(depth + 1, max_depth + 1):
+        members: Dict[Tuple[str, ...], List[gs.Node]] = {}
+        ungrouped = []
+        for n, s in zip(nodes, scopes):
+            if len(s) < d:
+                ungrouped.append(n)
+            else:
+                members.setdefault(s[:d], []).append(n)
+        if len(members) == 1 and not ungrouped:
+            # one shared scope, look one level deeper.
+            continue
+        groups = []
+        for scope, group in members.items():
+            if len(group) >= min_size:
+                groups.append((scope, group))
+            else:
+                ungrouped += group
+        if not groups:
+            break
+        # keep graph order among the ungrouped nodes.
+        order = {id(n): i for i, n in enumerate(nodes)}
+        ungrouped.sort(key=lambda n: order[id(n)])
+        return groups, ungrouped
+    return [], list(nodes)
+
+
+def group_boundary(members:List[gs.Node], output_names:Set[str])->Tuple[List[gs.Tensor], List[gs.Tensor]]:
+    """
+    Returns the tensors that cross the border of a group.
+
+    Args:
+        members (List[gs.Node]): nodes of the group.
+        output_names (Set[str]): names of the graph outputs.
+    Returns:
+        (List[gs.Tensor], List[gs.Tensor]): tensors the members take from outside
+            (initializers excluded) and tensors used outside the members.
+    """
+    member_ids = set([id(n) for n in members])
+    produced = set()
+    inputs = []
+    outputs = []
+    seen = set()
+    for n in members:
+        for out in n.outputs:
+            produced.add(out.name)
+            if out.name in seen:
+                continue
+            if out.name in output_names or any([id(c) not in member_ids for c in out.outputs]):
+                seen.add(out.name)
+                outputs.append(out)
+    for n in members:
+        for inp in n.inputs:
+            if not inp.name or inp.name in produced or inp.name in seen or isinstance(inp, gs.Constant):
+                continue
+            seen.add(inp.name)
+            inputs.append(inp)
+    return inputs, outputs
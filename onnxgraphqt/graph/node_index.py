@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional, Tuple
+
+from NodeGraphQt.base.node import NodeObject
+
+
+# node properties the index keys depend on.
+INDEXED_PROPERTIES = ("node_name", "op", "inputs_", "outputs_", "input_names", "output_names")
+
+
+class NodeIndex:
+    """
+    Lookup tables for the nodes of an ONNXNodeGraph.
+
+    Maps ONNX node name -> nodes, op type -> nodes and tensor name ->
+    producer/consumer nodes. Each table holds {node id: node} so adding or
+    removing a node is O(number of its keys), and the keys a node was indexed
+    under are remembered so a rename or a re-wired node can be moved exactly.
+    """
+
+    def __init__(self):
+        self._by_name: Dict[str, Dict[str, NodeObject]] = {}
+        self._by_op: Dict[str, Dict[str, NodeObject]] = {}
+        self._producers: Dict[str, Dict[str, NodeObject]] = {}
+        self._consumers: Dict[str, Dict[str, NodeObject]] = {}
+        self._keys: Dict[str, Tuple[str, str, List[str], List[str]]] = {}
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def node_keys(node: NodeObject) -> Tuple[str, str, List[str], List[str]]:
+        """
+        Returns (node name, op, produced tensor names, consumed tensor names) of node.
+        Graph input nodes produce the tensor they are named after, graph output nodes consume it.
+        """
+        name = node.get_property("node_name") if node.has_property("node_name") else None
+        op = getattr(node, "op", None)
+        if hasattr(node, "onnx_inputs"):
+            produces = [out.name for out in node.onnx_outputs]
+            consumes = [inp.name for inp in node.onnx_inputs]
+        elif node.has_property("output_names"):
+            produces = [name]
+            consumes = []
+        elif node.has_property("input_names"):
+            produces = []
+            consumes = [name]
+        else:
+            produces = []
+            consumes = []
+        return name, op, produces, consumes
+
+    def add(self, node: NodeObject):
+        if node.id in self._keys:
+            self.remove(node.id)
+        keys = self.node_keys(node)
+        name, op, produces, consumes = keys
+        self._keys[node.id] = keys
+        if name is not None:
+            self._by_name.setdefault(name, {})[node.id] = node
+        if op:
+            self._by_op.setdefault(op, {})[node.id] = node
+        for tensor_name in produces:
+            self._producers.setdefault(tensor_name, {})[node.id] = node
+        for tensor_name in consumes:
+            self._consumers.setdefault(tensor_name, {})[node.id] = node
+
+    def remove(self, node_id: str):
+        keys = self._keys.pop(node_id, None)
+        if keys is None:
+            return
+        name, op, produces, consumes = keys
+        _discard(self._by_name, name, node_id)
+        _discard(self._by_op, op, node_id)
+        for tensor_name in produces:
+            _discard(self._producers, tensor_name, node_id)
+        for tensor_name in consumes:
+            _discard(self._consumers, tensor_name, node_id)
+
+    def update(self, node: NodeObject):
+        """
+        Re-indexes node after one of its INDEXED_PROPERTIES changed.
+        """
+        if node.id in self._keys:
+            self.add(node)
+
+    def clear(self):
+        self._by_name.clear()
+        self._by_op.clear()
+        self._producers.clear()
+        self._consumers.clear()
+        self._keys.clear()
+
+    def keys(self, node_id: str) -> Optional[Tuple[str, str, List[str], List[str]]]:
+        """
+        Returns the node_keys node_id is indexed under, None if it is not indexed.
+        """
+        return self._keys.get(node_id)
+
+    def nodes_by_name(self, name: str) -> List[NodeObject]:
+        return list(self._by_name.get(name, {}).values())
+
+    def nodes_by_op(self, op: str) -> List[NodeObject]:
+        return list(self._by_op.get(op, {}).values())
+
+    def producers(self, tensor_name: str) -> List[NodeObject]:
+        return list(self._producers.get(tensor_name, {}).values())
+
+    def consumers(self, tensor_name: str) -> List[NodeObject]:
+        return list(self._consumers.get(tensor_name, {}).values())
+
+
+class IndexedNodeDict(dict):
+    """
+    NodeGraphModel.nodes replacement that keeps a NodeIndex in step.
+
+    NodeGraphQt adds and removes nodes (including undo/redo of NodeAddedCmd
+    and NodeRemovedCmd) only through item assignment and pop, without any
+    signal, so the index is updated here. version counts those changes.
+    """
+
+    def __init__(self, index: NodeIndex, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+        self.version = 0
+        for node in self.values():
+            self.index.add(node)
+
+    def __setitem__(self, node_id, node):
+        super().__setitem__(node_id, node)
+        self.index.add(node)
+        self.version += 1
+
+    def __delitem__(self, node_id):
+        super().__delitem__(node_id)
+        self.index.remove(node_id)
+        self.version += 1
+
+    def pop(self, node_id, *args):
+        ret = super().pop(node_id, *args)
+        self.index.remove(node_id)
+        self.version += 1
+        return ret
+
+    def clear(self):
+        super().clear()
+        self.index.clear()
+        self.version += 1
+
+    def reorder(self, node_ids: List[str]):
+        """
+        Puts the nodes of node_ids in that order, in the places they hold
+        together now. Other nodes keep their places and the index is unchanged.
+        """
+        ids = [node_id for node_id in dict.fromkeys(node_ids) if node_id in self]
+        wanted = set(ids)
+        it = iter(ids)
+        keys = [next(it) if node_id in wanted else node_id for node_id in self.keys()]
+        items = [(node_id, dict.__getitem__(self, node_id)) for node_id in keys]
+        super().clear()
+        super().update(items)
+
+
+def _discard(table: Dict[str, Dict[str, NodeObject]], key, node_id: str):
+    nodes = table.get(key)
+    if nodes is None:
+        return
+    nodes.pop(node_id, None)
+    if not nodes:
+        del table[key]
@@ -0,0 +1,248 @@
+import heapq
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper
+import onnx_graphsurgeon as gs
+from onnx_graphsurgeon.exporters.onnx_exporter import OnnxExporter
+
+from .onnx_node import ONNXNode, ONNXGroup, OnnxNodeIO, gs_node_to_io
+
+
+CONSTANT_OPS = ['Constant', 'ConstantOfShape']
+# size from which a model can not be serialized as one protobuf.
+MAXIMUM_PROTOBUF = onnx.checker.MAXIMUM_PROTOBUF
+
+
+def exceeds_protobuf_limit(model:onnx.ModelProto)->bool:
+    """
+    True when model is too large to be serialized in one piece, e.g. a
+    lazily loaded model over 2GB whose weights were written to raw_data.
+    """
+    return model.ByteSize() >= MAXIMUM_PROTOBUF
+
+
+def elem_type(dtype)->int:
+    """
+    TensorProto data type of a numpy dtype, numpy type, dtype name or TensorProto type.
+    UNDEFINED for None.
+    """
+    if dtype is None or dtype == "None":
+        return onnx.TensorProto.UNDEFINED
+    if isinstance(dtype, int):
+        return dtype
+    if hasattr(helper, "np_dtype_to_tensor_dtype"):
+        return helper.np_dtype_to_tensor_dtype(np.dtype(dtype))
+    # onnx < 1.13
+    return onnx.mapping.NP_TYPE_TO_TENSOR_TYPE[np.dtype(dtype)]
+
+
+def tensor_proto(name:str, values, dtype=None, shape=None)->onnx.TensorProto:
+    """
+    TensorProto of values, with raw_data taken from the numpy buffer.
+    Lists and scalars are converted with dtype and reshaped to shape first.
+    """
+    if not isinstance(values, np.ndarray):
+        values = np.array(values, dtype=None if dtype in (None, "None") else dtype)
+        if shape is not None and all([isinstance(d, int) for d in shape]):
+            values = values.reshape(shape)
+    return numpy_helper.from_array(values, name=name)
+
+
+def value_info(name:str, dtype, shape)->onnx.ValueInfoProto:
+    if shape is not None and not isinstance(shape, (list, tuple)):
+        # e.g. an edited property that is not a shape.
+        shape = None
+    return helper.make_tensor_value_info(name, elem_type(dtype), shape)
+
+
+def make_attribute(key:str, value:Any)->onnx.AttributeProto:
+    """
+    AttributeProto of an attribute value as held by gs.Node.attrs.
+    """
+    if isinstance(value, gs.Graph):
+        # bodies of If/Loop/Scan are kept as the graphs that were imported.
+        return helper.make_attribute(key, OnnxExporter.export_graph(value, do_type_check=False))
+    if isinstance(value, gs.Constant):
+        return helper.make_attribute(key, tensor_proto(value.name, value.values))
+    if isinstance(value, np.ndarray):
+        return helper.make_attribute(key, tensor_proto("", value))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (list, tuple)) and len(value) == 0:
+        # the type of an empty list is unknown, written as ints.
+        return onnx.AttributeProto(name=key, type=onnx.AttributeProto.INTS)
+    return helper.make_attribute(key, value)
+
+
+def _outer_names(graph:onnx.GraphProto)->Set[str]:
+    """
+    Tensor names a subgraph reads from the scope around it.
+    """
+    defined = set([v.name for v in graph.input] + [t.name for t in graph.initializer])
+    used: Set[str] = set()
+    for node in graph.node:
+        used.update([i for i in node.input if i and i not in defined])
+        for attr in node.attribute:
+            for g in [attr.g] if attr.type == onnx.AttributeProto.GRAPH else list(attr.graphs):
+                used.update([i for i in _outer_names(g) if i not in defined])
+        defined.update(node.output)
+    return used
+
+
+def toposort(nodes:List[onnx.NodeProto])->List[onnx.NodeProto]:
+    """
+    Orders nodes so that every tensor is produced before it is read, keeping
+    the given order where it already is. Tensors read by subgraphs count as
+    inputs of the node holding them. Nodes in a cycle are appended as they are.
+    """
+    producer: Dict[str, int] = {}
+    for i, node in enumerate(nodes):
+        for name in node.output:
+            producer[name] = i
+    consumers: List[List[int]] = [[] for _ in nodes]
+    pending = [0] * len(nodes)
+    for i, node in enumerate(nodes):
+        names = set(node.input)
+        for attr in node.attribute:
+            for g in [attr.g] if attr.type == onnx.AttributeProto.GRAPH else list(attr.graphs):
+                names.update(_outer_names(g))
+        for name in names:
+            j = producer.get(name)
+            if j is not None and j != i:
+                consumers[j].append(i)
+                pending[i] += 1
+    # kahn's algorithm, lowest index first.
+    ready = [i for i in range(len(nodes)) if pending[i] == 0]
+    heapq.heapify(ready)
+    order: List[int] = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j in consumers[i]:
+            pending[j] -= 1
+            if pending[j] == 0:
+                heapq.heappush(ready, j)
+    if len(order) < len(nodes):
+        done = set(order)
+        order += [i for i in range(len(nodes)) if i not in done]
+    return [nodes[i] for i in order]
+
+
+class _ModelWriter:
+    """
+    Collects the protos of one graph. Tensors shared by several nodes are written once.
+    """
+
+    def __init__(self):
+        self.nodes: List[onnx.NodeProto] = []
+        self.initializers: List[onnx.TensorProto] = []
+        self.value_infos: List[onnx.ValueInfoProto] = []
+        # tensor names written as graph input/output or value_info, and as initializer.
+        self.written: Set[str] = set()
+        self.initializer_names: Set[str] = set()
+
+    def add_value_info(self, io:OnnxNodeIO):
+        if io.name in self.written or io.dtype is None:
+            return
+        self.written.add(io.name)
+        self.value_infos.append(value_info(io.name, io.dtype, io.shape))
+
+    def add_tensor(self, io:OnnxNodeIO):
+        val = io.values
+        if val is None or (not isinstance(val, np.ndarray) and val == -1):
+            self.add_value_info(io)
+        elif io.name not in self.initializer_names:
+            self.initializer_names.add(io.name)
+            self.initializers.append(tensor_proto(io.name, val, io.dtype, io.shape))
+
+    def add_node(self, op:str, name:str, attrs:Dict[str, Any],
+                 onnx_inputs:List[OnnxNodeIO], onnx_outputs:List[OnnxNodeIO]):
+        if op in CONSTANT_OPS:
+            values = attrs["values"]
+            if not isinstance(values, np.ndarray):
+                values = np.asarray(values, dtype=attrs.get("dtype"))
+            out = onnx_outputs[0].name
+            self.nodes.append(helper.make_node(op, [], [out], name=name,
+                                               value=numpy_helper.from_array(values, name="value")))
+            if out not in self.written:
+                self.written.add(out)
+                self.value_infos.append(helper.make_tensor_value_info(
+                    out, elem_type(values.dtype), list(values.shape)))
+            return
+        for io in onnx_inputs:
+            if io.name:
+                self.add_tensor(io)
+        for io in onnx_outputs:
+            if io.name:
+                self.add_value_info(io)
+        node = helper.make_node(op, [io.name for io in onnx_inputs], [io.name for io in onnx_outputs], name=name)
+        node.attribute.extend([make_attribute(key, val) for key, val in attrs.items() if val is not None])
+        self.nodes.append(node)
+
+
+def opset_imports(opset:int, import_domains:Optional[Iterable[onnx.OperatorSetIdProto]])->List[onnx.OperatorSetIdProto]:
+    ret = [helper.make_opsetid("", opset)]
+    for domain in import_domains or []:
+        if domain.domain not in ("", "ai.onnx"):
+            ret.append(domain)
+    return ret
+
+
+def export_model(graph, progress:Callable[[int, int, str], None]=None)->onnx.ModelProto:
+    """
+    Writes the ModelProto of an ONNXNodeGraph in one pass over its nodes.
+
+    NodeProto, TensorProto and ValueInfoProto are built directly; constant
+    values go into raw_data straight from their numpy buffers. Members of
+    collapsed groups are written as loaded. The nodes are always sorted
+    topologically, as group members come last and undo/redo can append
+    nodes out of order; an already sorted graph keeps its order.
+
+    Args:
+        graph (ONNXNodeGraph): graph to export.
+        progress (Callable): called with the number of op nodes written.
+    """
+    writer = _ModelWriter()
+    inputs = []
+    outputs = []
+    for n in graph.get_nodes_by_type("nodes.node.ONNXInput"):
+        inputs.append(value_info(n.name(), n.get_dtype(), n.get_shape()))
+        writer.written.add(n.name())
+    for n in graph.get_nodes_by_type("nodes.node.ONNXOutput"):
+        outputs.append(value_info(n.name(), n.get_dtype(), n.get_shape()))
+        writer.written.add(n.name())
+
+    op_nodes: List[ONNXNode] = graph.get_nodes_by_type("nodes.node.ONNXNode")
+    groups: List[ONNXGroup] = graph.get_nodes_by_type("nodes.node.ONNXGroup")
+    for i, n in enumerate(op_nodes):
+        if progress is not None:
+            progress(i, len(op_nodes), "converting nodes...")
+        if n.op in CONSTANT_OPS:
+            writer.add_node(n.op, n.node_name, n.attrs, n.onnx_inputs, n.onnx_outputs)
+        else:
+            writer.add_node(n.op, n.get_node_name(), n.get_attrs(), n.onnx_inputs, n.onnx_outputs)
+
+    # members of collapsed groups, as loaded.
+    for n in groups:
+        for m in n.members:
+            onnx_inputs, onnx_outputs, attrs = gs_node_to_io(m)
+            writer.add_node(m.op, m.name, attrs, onnx_inputs, onnx_outputs)
+
+    nodes = toposort(writer.nodes)
+    graph_proto = helper.make_graph(
+        nodes,
+        graph.name,
+        inputs,
+        outputs,
+        initializer=writer.initializers,
+        doc_string=graph.doc_string,
+        value_info=writer.value_infos,
+    )
+    model = helper.make_model(graph_proto, opset_imports=opset_imports(graph.opset, graph.import_domains))
+    model.producer_name = graph.producer_name or ""
+    model.producer_version = str(graph.producer_version or "")
+    model.ir_version = graph.ir_version
+    model.model_version = graph.model_version or 0
+    return model
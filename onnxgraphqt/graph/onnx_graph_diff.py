@@ -0,0 +1,274 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import onnx_graphsurgeon as gs
+
+from NodeGraphQt.base.node import NodeObject
+
+from .onnx_node import (
+    ONNXInput,
+    ONNXOutput,
+    ONNXNode,
+    ONNXGroup,
+    OnnxNodeIO,
+    gs_node_to_io,
+)
+from .node_groups import group_nodes
+
+
+UNCHANGED = "unchanged"
+UPDATED = "updated"
+CHANGED = "changed"
+
+
+@dataclass
+class GraphDiff:
+    """
+    Difference between the nodes of an ONNXNodeGraph and a gs.Graph.
+
+    Graph inputs/outputs are matched by tensor name, op nodes by node name
+    and then, for a renamed node, by op and output tensor names. Collapsed
+    groups are matched by the names of their members: a group without a
+    changed or new member is kept, any other is expanded into the nodes
+    and groups of the new graph, down to the scopes that changed.
+    """
+    # (node type, gs.Tensor or gs.Node) to create, or
+    # ("nodes.node.ONNXGroup", (scope, members)) for a group.
+    added: List[Tuple[str, Any]] = field(default_factory=list)
+    # nodes to delete.
+    removed: List[NodeObject] = field(default_factory=list)
+    # (node, gs.Node) whose op, inputs, outputs or attributes changed; replaced at the same position.
+    changed: List[Tuple[NodeObject, Any]] = field(default_factory=list)
+    # (node, gs.Tensor or gs.Node) updated in place: node name and dtype/shape changes.
+    updated: List[Tuple[NodeObject, Any]] = field(default_factory=list)
+    # (node, gs.Tensor or gs.Node) left as they are.
+    unchanged: List[Tuple[NodeObject, Any]] = field(default_factory=list)
+    # (group, members in the new graph) of groups with no changed or new member.
+    groups: List[Tuple[ONNXGroup, List[gs.Node]]] = field(default_factory=list)
+
+    def num_rebuilt(self)->int:
+        """
+        Number of nodes that are created or deleted to apply the diff.
+        """
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+
+def values_equal(a, b)->bool:
+    """
+    Equality for property and attribute values that may hold numpy arrays or gs.Constant.
+    Subgraphs never compare equal, so nodes holding one are always replaced.
+    """
+    if a is b:
+        return True
+    if isinstance(a, gs.Graph) or isinstance(b, gs.Graph):
+        return False
+    if isinstance(a, gs.Constant) or isinstance(b, gs.Constant):
+        if not (isinstance(a, gs.Constant) and isinstance(b, gs.Constant)):
+            return False
+        return a.name == b.name and values_equal(a.values, b.values)
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a = np.asarray(a)
+        b = np.asarray(b)
+        return a.dtype == b.dtype and a.shape == b.shape and bool(np.array_equal(a, b))
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all([values_equal(x, y) for x, y in zip(a, b)])
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a.keys()) == list(b.keys()) and all([values_equal(a[k], b[k]) for k in a.keys()])
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+
+def io_equal(a:List[OnnxNodeIO], b:List[OnnxNodeIO], check_type=True)->bool:
+    """
+    Compares node inputs/outputs by name and values, and by dtype and shape if check_type is set.
+    """
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x.name != y.name or not values_equal(x.values, y.values):
+            return False
+        if check_type and (x.dtype != y.dtype or not values_equal(x.shape, y.shape)):
+            return False
+    return True
+
+
+def compare_node(node:ONNXNode, onnx_node:gs.Node)->str:
+    """
+    Compares node with the ONNXNode that would be created from onnx_node.
+
+    Returns:
+        str: "unchanged",
+            "updated" when only the node name or the dtype/shape of inputs/outputs differ
+            (e.g. after shape inference), or "changed".
+    """
+    if node.op != onnx_node.op:
+        return CHANGED
+    onnx_inputs, onnx_outputs, attrs = gs_node_to_io(onnx_node)
+    if node.op in ['Constant', 'ConstantOfShape']:
+        if not values_equal(dict(node.attrs), dict(attrs)):
+            return CHANGED
+    elif not values_equal(dict(node.get_attrs()), dict(attrs)):
+        return CHANGED
+    if not io_equal(node.onnx_inputs, onnx_inputs, check_type=False) \
+            or not io_equal(node.onnx_outputs, onnx_outputs, check_type=False):
+        return CHANGED
+    if node.get_node_name() != onnx_node.name \
+            or not io_equal(node.onnx_inputs, onnx_inputs) \
+            or not io_equal(node.onnx_outputs, onnx_outputs):
+        return UPDATED
+    return UNCHANGED
+
+
+def member_equal(a:gs.Node, b:gs.Node)->bool:
+    """
+    Compares two gs.Nodes like compare_node, ignoring dtype/shape changes.
+    """
+    if a.op != b.op or a.name != b.name:
+        return False
+    a_inputs, a_outputs, a_attrs = gs_node_to_io(a)
+    b_inputs, b_outputs, b_attrs = gs_node_to_io(b)
+    return values_equal(dict(a_attrs), dict(b_attrs)) \
+        and io_equal(a_inputs, b_inputs, check_type=False) \
+        and io_equal(a_outputs, b_outputs, check_type=False)
+
+
+def split_group(members:List[gs.Node], depth:int, touched:set)->Tuple[List[Tuple[Tuple[str, ...], List[gs.Node]]], List[gs.Node]]:
+    """
+    Splits the members of an expanded group like group_nodes, and splits
+    the sub-scopes holding a node named in touched again, so that only
+    unchanged scopes stay collapsed.
+
+    Returns:
+        (List[Tuple[Tuple[str, ...], List[gs.Node]]], List[gs.Node]): (scope, members) per group, and the ungrouped nodes.
+    """
+    groups, ungrouped = group_nodes(members, depth)
+    ret = []
+    for scope, group in groups:
+        if any([m.name in touched for m in group]):
+            sub_groups, sub_ungrouped = split_group(group, len(scope), touched)
+            ret += sub_groups
+            ungrouped += sub_ungrouped
+        else:
+            ret.append((scope, group))
+    return ret, ungrouped
+
+
+def input_equal(node:ONNXInput, tensor:gs.Tensor)->bool:
+    return node.get_dtype() == str(tensor.dtype) \
+        and values_equal(node.get_shape(), tensor.shape) \
+        and node.get_output_names() == [o.name for o in tensor.outputs]
+
+
+def output_equal(node:ONNXOutput, tensor:gs.Tensor)->bool:
+    return node.get_dtype() == str(tensor.dtype) \
+        and values_equal(node.get_shape(), tensor.shape) \
+        and node.get_input_names() == [i.name for i in tensor.inputs]
+
+
+def diff_onnx_graph(nodes:List[NodeObject], onnx_graph:gs.Graph)->GraphDiff:
+    """
+    Compares the nodes of an ONNXNodeGraph with onnx_graph.
+
+    Args:
+        nodes (List[NodeObject]): nodes of the current graph.
+        onnx_graph (gs.Graph): graph to patch the nodes to.
+    Returns:
+        GraphDiff: nodes to add, remove, replace and update.
+    """
+    diff = GraphDiff()
+    inputs: Dict[str, List[ONNXInput]] = {}
+    outputs: Dict[str, List[ONNXOutput]] = {}
+    op_nodes: Dict[str, List[ONNXNode]] = {}
+    groups: List[ONNXGroup] = []
+    # member name -> index of its group
+    member_groups: Dict[str, int] = {}
+    for n in nodes:
+        if isinstance(n, ONNXInput):
+            inputs.setdefault(n.get_node_name(), []).append(n)
+        elif isinstance(n, ONNXOutput):
+            outputs.setdefault(n.get_node_name(), []).append(n)
+        elif isinstance(n, ONNXNode):
+            op_nodes.setdefault(n.get_node_name(), []).append(n)
+        elif isinstance(n, ONNXGroup):
+            for m in n.members:
+                member_groups[m.name] = len(groups)
+            groups.append(n)
+        else:
+            diff.removed.append(n)
+
+    for node_type, tensors, qt_nodes, equal in [
+        ("nodes.node.ONNXInput", onnx_graph.inputs, inputs, input_equal),
+        ("nodes.node.ONNXOutput", onnx_graph.outputs, outputs, output_equal),
+    ]:
+        for tensor in tensors:
+            matched = qt_nodes.get(tensor.name)
+            if not matched:
+                diff.added.append((node_type, tensor))
+                continue
+            n = matched.pop(0)
+            if equal(n, tensor):
+                diff.unchanged.append((n, tensor))
+            else:
+                diff.updated.append((n, tensor))
+        for matched in qt_nodes.values():
+            diff.removed += matched
+
+    # match by node name first, then renamed nodes by op and output tensors.
+    # nodes named like a member of a group go to that group.
+    unmatched = []
+    new_members: List[List[gs.Node]] = [[] for _ in groups]
+    for onnx_node in onnx_graph.nodes:
+        i = member_groups.get(onnx_node.name)
+        if i is not None:
+            new_members[i].append(onnx_node)
+            continue
+        matched = op_nodes.get(onnx_node.name)
+        if not matched:
+            unmatched.append(onnx_node)
+            continue
+        n = matched.pop(0)
+        result = compare_node(n, onnx_node)
+        if result == UNCHANGED:
+            diff.unchanged.append((n, onnx_node))
+        elif result == UPDATED:
+            diff.updated.append((n, onnx_node))
+        else:
+            diff.changed.append((n, onnx_node))
+
+    renamed: Dict[Tuple, List[ONNXNode]] = {}
+    for matched in op_nodes.values():
+        for n in matched:
+            key = (n.op, tuple([out.name for out in n.onnx_outputs]))
+            renamed.setdefault(key, []).append(n)
+    for onnx_node in unmatched:
+        key = (onnx_node.op, tuple([out.name for out in onnx_node.outputs]))
+        matched = renamed.get(key)
+        if not matched:
+            diff.added.append(("nodes.node.ONNXNode", onnx_node))
+            continue
+        n = matched.pop(0)
+        if compare_node(n, onnx_node) == CHANGED:
+            diff.changed.append((n, onnx_node))
+        else:
+            diff.updated.append((n, onnx_node))
+    for matched in renamed.values():
+        diff.removed += matched
+
+    for group, members in zip(groups, new_members):
+        old_members = {m.name: m for m in group.members}
+        touched = set([m.name for m in members if not member_equal(old_members[m.name], m)])
+        if not members:
+            diff.removed.append(group)
+            continue
+        if not touched:
+            # also when members were deleted, the group is updated in place.
+            diff.groups.append((group, members))
+            continue
+        diff.removed.append(group)
+        sub_groups, ungrouped = split_group(members, group.depth, touched)
+        diff.added += [("nodes.node.ONNXGroup", g) for g in sub_groups]
+        diff.added += [("nodes.node.ONNXNode", m) for m in ungrouped]
+    return diff
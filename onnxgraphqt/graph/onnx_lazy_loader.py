@@ -0,0 +1,259 @@
+import os
+import mmap
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import onnx
+import onnx_graphsurgeon as gs
+
+from onnxgraphqt.utils.profiler import profiler
+
+
+# raw_data tensors at least this large are left in the file and memory-mapped.
+LAZY_RAW_DATA_THRESHOLD = 1 << 20
+
+# ONNX types whose raw_data is the plain little-endian numpy layout.
+RAW_DATA_NUMPY_TYPES = {
+    onnx.TensorProto.FLOAT: np.dtype('<f4'),
+    onnx.TensorProto.UINT8: np.dtype('u1'),
+    onnx.TensorProto.INT8: np.dtype('i1'),
+    onnx.TensorProto.UINT16: np.dtype('<u2'),
+    onnx.TensorProto.INT16: np.dtype('<i2'),
+    onnx.TensorProto.INT32: np.dtype('<i4'),
+    onnx.TensorProto.INT64: np.dtype('<i8'),
+    onnx.TensorProto.BOOL: np.dtype('?'),
+    onnx.TensorProto.FLOAT16: np.dtype('<f2'),
+    onnx.TensorProto.DOUBLE: np.dtype('<f8'),
+    onnx.TensorProto.UINT32: np.dtype('<u4'),
+    onnx.TensorProto.UINT64: np.dtype('<u8'),
+    onnx.TensorProto.COMPLEX64: np.dtype('<c8'),
+    onnx.TensorProto.COMPLEX128: np.dtype('<c16'),
+}
+
+# protobuf field numbers (onnx.proto).
+_MODEL_GRAPH = 7
+_GRAPH_INITIALIZER = 5
+_TENSOR_DIMS = 1
+_TENSOR_DATA_TYPE = 2
+_TENSOR_NAME = 8
+_TENSOR_RAW_DATA = 9
+_TENSOR_EXTERNAL_DATA = 13
+_TENSOR_DATA_LOCATION = 14
+_ENTRY_KEY = 1
+_ENTRY_VALUE = 2
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LEN = 2
+_WIRE_FIXED32 = 5
+
+
+@dataclass
+class LazyTensor:
+    name: str
+    data_type: int
+    dims: List[int]
+    path: str
+    offset: int
+    length: int
+
+    def load(self) -> np.ndarray:
+        """
+        Returns the tensor as a read-only memory-mapped array.
+        Nothing is read from disk until the values are accessed.
+        """
+        dtype = RAW_DATA_NUMPY_TYPES[self.data_type]
+        count = self.length // dtype.itemsize
+        if count == 0:
+            return np.zeros(self.dims, dtype=dtype)
+        values = np.memmap(self.path, dtype=dtype, mode='r', offset=self.offset, shape=(count,))
+        return values.reshape(self.dims)
+
+
+def _read_varint(buf, pos:int)->Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_varint(value:int)->bytes:
+    ret = bytearray()
+    while True:
+        b = value & 0x7f
+        value >>= 7
+        if value:
+            ret.append(b | 0x80)
+        else:
+            ret.append(b)
+            return bytes(ret)
+
+
+def _iter_fields(buf, start:int, end:int):
+    """
+    Yields (field_number, wire_type, field_start, value, field_end) for every field in buf[start:end].
+    value is the integer for varint fields and the (begin, end) payload range for length-delimited ones.
+    """
+    pos = start
+    while pos < end:
+        field_start = pos
+        key, pos = _read_varint(buf, pos)
+        field_number, wire_type = key >> 3, key & 0x7
+        if wire_type == _WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == _WIRE_LEN:
+            length, pos = _read_varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == _WIRE_FIXED64:
+            value = None
+            pos += 8
+        elif wire_type == _WIRE_FIXED32:
+            value = None
+            pos += 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        yield field_number, wire_type, field_start, value, pos
+
+
+def _len_field(field_number:int, payload:bytes)->bytes:
+    return _encode_varint((field_number << 3) | _WIRE_LEN) + _encode_varint(len(payload)) + payload
+
+
+def _read_packed_or_varint(buf, wire_type, value)->List[int]:
+    if wire_type == _WIRE_VARINT:
+        return [value]
+    ret = []
+    pos, end = value
+    while pos < end:
+        v, pos = _read_varint(buf, pos)
+        ret.append(v)
+    return ret
+
+
+def _strip_tensor(buf, start:int, end:int, model_path:str, base_dir:str, threshold:int):
+    """
+    Returns (stripped TensorProto bytes, LazyTensor) or None when the tensor stays in memory.
+    """
+    name = ""
+    data_type = 0
+    dims = []
+    raw_data = None
+    external_data = {}
+    data_location = onnx.TensorProto.DEFAULT
+    kept = []
+    for field_number, wire_type, field_start, value, field_end in _iter_fields(buf, start, end):
+        if field_number == _TENSOR_RAW_DATA:
+            raw_data = value
+            continue
+        if field_number == _TENSOR_EXTERNAL_DATA:
+            key = val = ""
+            for f, _, _, v, _ in _iter_fields(buf, value[0], value[1]):
+                if f == _ENTRY_KEY:
+                    key = bytes(buf[v[0]:v[1]]).decode()
+                elif f == _ENTRY_VALUE:
+                    val = bytes(buf[v[0]:v[1]]).decode()
+            external_data[key] = val
+            continue
+        if field_number == _TENSOR_DATA_LOCATION:
+            data_location = value
+            continue
+        if field_number == _TENSOR_NAME:
+            name = bytes(buf[value[0]:value[1]]).decode()
+        elif field_number == _TENSOR_DATA_TYPE:
+            data_type = value
+        elif field_number == _TENSOR_DIMS:
+            dims += _read_packed_or_varint(buf, wire_type, value)
+        kept.append(bytes(buf[field_start:field_end]))
+
+    dtype = RAW_DATA_NUMPY_TYPES.get(data_type)
+    if dtype is None:
+        return None
+    nbytes = int(np.prod(dims, dtype=np.int64)) * dtype.itemsize
+
+    if data_location == onnx.TensorProto.EXTERNAL:
+        if "location" not in external_data:
+            return None
+        path = os.path.join(base_dir, external_data["location"])
+        offset = int(external_data.get("offset", 0))
+        length = int(external_data.get("length", nbytes))
+    elif raw_data is not None and raw_data[1] - raw_data[0] >= threshold:
+        path = model_path
+        offset = raw_data[0]
+        length = raw_data[1] - raw_data[0]
+    else:
+        return None
+    if length != nbytes:
+        return None
+
+    lazy_tensor = LazyTensor(name=name, data_type=data_type, dims=dims,
+                             path=path, offset=offset, length=length)
+    return b"".join(kept), lazy_tensor
+
+
+def load_onnx_topology(onnx_model_path:str, threshold:int=LAZY_RAW_DATA_THRESHOLD)->Tuple[onnx.ModelProto, Dict[str, LazyTensor]]:
+    """
+    Reads only the graph topology of an ONNX file.
+
+    Initializers stored as external data, or with raw_data of at least ``threshold`` bytes,
+    are dropped from the returned ModelProto (name, dims and data_type are kept) and returned
+    as LazyTensor records pointing at their bytes on disk. The protobuf parser never sees the
+    weights, so models over the 2GB protobuf limit can be opened as well.
+
+    Args:
+        onnx_model_path (str): path to the .onnx file.
+        threshold (int): minimum raw_data size in bytes to leave on disk.
+    Returns:
+        (onnx.ModelProto, Dict[str, LazyTensor]): topology-only model and lazy tensors by name.
+    """
+    onnx_model_path = os.path.abspath(onnx_model_path)
+    base_dir = os.path.dirname(onnx_model_path)
+    lazy_tensors: Dict[str, LazyTensor] = {}
+    with open(onnx_model_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return onnx.ModelProto(), lazy_tensors
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        model_chunks = []
+        for field_number, wire_type, field_start, value, field_end in _iter_fields(buf, 0, len(buf)):
+            if field_number != _MODEL_GRAPH or wire_type != _WIRE_LEN:
+                model_chunks.append(buf[field_start:field_end])
+                continue
+            graph_chunks = []
+            for g_field_number, g_wire_type, g_start, g_value, g_end in _iter_fields(buf, value[0], value[1]):
+                if g_field_number == _GRAPH_INITIALIZER and g_wire_type == _WIRE_LEN:
+                    ret = _strip_tensor(buf, g_value[0], g_value[1], onnx_model_path, base_dir, threshold)
+                    if ret is not None:
+                        tensor_bytes, lazy_tensor = ret
+                        lazy_tensors[lazy_tensor.name] = lazy_tensor
+                        graph_chunks.append(_len_field(_GRAPH_INITIALIZER, tensor_bytes))
+                        continue
+                graph_chunks.append(buf[g_start:g_end])
+            model_chunks.append(_len_field(_MODEL_GRAPH, b"".join(graph_chunks)))
+        model_bytes = b"".join(model_chunks)
+    finally:
+        buf.close()
+    return onnx.load_from_string(model_bytes), lazy_tensors
+
+
+def import_onnx_lazy(onnx_model_path:str, threshold:int=LAZY_RAW_DATA_THRESHOLD)->Tuple[onnx.ModelProto, gs.Graph]:
+    """
+    gs.import_onnx for a model file whose large initializers are memory-mapped instead of loaded.
+    """
+    with profiler.span("onnx.load", path=os.path.basename(onnx_model_path), lazy=True):
+        onnx_model, lazy_tensors = load_onnx_topology(onnx_model_path, threshold)
+    with profiler.span("gs.import_onnx"):
+        onnx_graph = gs.import_onnx(onnx_model)
+    if lazy_tensors:
+        for tensor in onnx_graph.tensors().values():
+            lazy_tensor = lazy_tensors.get(tensor.name)
+            if lazy_tensor is not None and isinstance(tensor, gs.Constant):
+                tensor.values = lazy_tensor.load()
+                tensor.data_location = None
+    return onnx_model, onnx_graph
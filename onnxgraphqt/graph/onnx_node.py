@@ -4,6 +4,9 @@ from typing import (
 )
 from collections import OrderedDict
 
+import numpy as np
+import onnx_graphsurgeon as gs
+
 from NodeGraphQt import BaseNode
 from NodeGraphQt.constants import NodeEnum, LayoutDirectionEnum, NodePropWidgetEnum
 
@@ -13,11 +16,13 @@ from onnxgraphqt.utils.color import (
     COLOR_GRID,
     INPUT_NODE_COLOR,
     OUTPUT_NODE_COLOR,
+    GROUP_NODE_COLOR,
     NODE_BORDER_COLOR,
     get_node_color,
 )
 from onnxgraphqt.utils.widgets import set_font, GRAPH_FONT_SIZE
 from onnxgraphqt.widgets.custom_node_item import CustomNodeItem
+from .constant_store import ConstantStore, values_preview
 
 
 @dataclass
@@ -25,7 +30,95 @@ class OnnxNodeIO:
     name: str
     dtype: str
     shape: List[int]
-    values: List
+    values: Any # numpy.ndarray for constants, otherwise None
+
+
+def custom_property(node:BaseNode, name:str):
+    """
+    node.get_property(name) for a custom property.
+    NodeObject.get_property copies the whole model __dict__ on every call,
+    which adds up when it runs for every node of a large graph.
+    """
+    return node.model.custom_properties.get(name)
+
+
+def gs_node_to_io(onnx_node:gs.Node, constants:ConstantStore=None):
+    """
+    Returns (onnx_inputs, onnx_outputs, attrs) of an ONNXNode built from onnx_node.
+
+    Args:
+        onnx_node (gs.Node): onnx_graphsurgeon node.
+        constants (ConstantStore): registers constant values when given.
+    Returns:
+        (List[OnnxNodeIO], List[OnnxNodeIO], OrderedDict): node inputs, outputs and attributes.
+            The attributes of a non-constant node are onnx_node.attrs itself, not a copy.
+    """
+    def add_constant(name, values):
+        if constants is None:
+            return values if isinstance(values, np.ndarray) else np.asarray(values)
+        return constants.add(name, values)
+
+    onnx_inputs:List[OnnxNodeIO] = []
+    onnx_outputs:List[OnnxNodeIO] = []
+    if onnx_node.op in ['Constant', 'ConstantOfShape']:
+        name = onnx_node.outputs[0].name
+        if hasattr(onnx_node.attrs["value"], "values"):
+            dtype = str(onnx_node.attrs["value"].values.dtype)
+            shape = onnx_node.attrs["value"].shape
+            values = add_constant(name, onnx_node.attrs["value"].values)
+        else:
+            dtype = onnx_node.outputs[0].dtype
+            shape = onnx_node.outputs[0].shape
+            values = np.asarray(onnx_node.attrs["value"], dtype=dtype)
+            dtype = str(dtype)
+        onnx_outputs = [OnnxNodeIO(name, dtype, shape, values)]
+        attrs = OrderedDict([("dtype", dtype), ("values", values)])
+        return onnx_inputs, onnx_outputs, attrs
+
+    for inp in onnx_node.inputs:
+        t = type(inp)
+        if t is gs.Tensor:
+            onnx_inputs += [OnnxNodeIO(inp.name, str(inp.dtype), inp.shape, None)]
+        elif t is gs.Constant:
+            values = add_constant(inp.name, inp.values)
+            onnx_inputs += [OnnxNodeIO(inp.name, str(values.dtype), inp.shape, values)]
+        elif t is gs.Variable:
+            if inp.dtype is None:
+                onnx_inputs += [OnnxNodeIO(inp.name, None, None, None)]
+            else:
+                onnx_inputs += [OnnxNodeIO(inp.name, str(inp.dtype), inp.shape, None)]
+        else:
+            onnx_inputs += [OnnxNodeIO(inp.name, None, None, None)]
+    for out in onnx_node.outputs:
+        t = type(out)
+        if t is gs.Tensor:
+            onnx_outputs += [OnnxNodeIO(out.name, str(out._values.dtype), out.shape, None)]
+        elif t is gs.Constant:
+            values = add_constant(out.name, out.values)
+            onnx_outputs += [OnnxNodeIO(out.name, str(values.dtype), out.shape, values)]
+        elif t is gs.Variable:
+            if out.dtype is None:
+                onnx_outputs += [OnnxNodeIO(out.name, None, None, None)]
+            else:
+                onnx_outputs += [OnnxNodeIO(out.name, str(out.dtype), out.shape, None)]
+        else:
+            onnx_outputs += [OnnxNodeIO(out.name, None, None, None)]
+    return onnx_inputs, onnx_outputs, onnx_node.attrs
+
+
+def subgraph_preview(graph:gs.Graph)->str:
+    """
+    Text shown for a subgraph attribute (If/Loop/Scan body) instead of the whole graph.
+    """
+    return f"<subgraph {graph.name}: {len(graph.nodes)} nodes>"
+
+
+def tensor_to_io(tensor:gs.Tensor)->OnnxNodeIO:
+    """
+    OnnxNodeIO of a tensor without its values.
+    """
+    dtype = None if tensor.dtype is None else str(tensor.dtype)
+    return OnnxNodeIO(tensor.name, dtype, tensor.shape, None)
 
 
 class ONNXNode(BaseNode):
@@ -52,6 +145,11 @@ class ONNXNode(BaseNode):
     def set_attrs(self, attrs:OrderedDict, push_undo=False):
         self.attrs = attrs
         for key, val in self.attrs.items():
+            if isinstance(val, np.ndarray):
+                # keep only a preview on the node, the array stays in attrs.
+                val = values_preview(val)
+            elif isinstance(val, gs.Graph):
+                val = subgraph_preview(val)
             if self.has_property(key + "_"):
                 self.set_property(key + "_", val, push_undo=push_undo)
             else:
@@ -61,9 +159,21 @@ class ONNXNode(BaseNode):
                     self.create_property(key + "_", val, widget_type=NodePropWidgetEnum.QLINE_EDIT)
 
     def get_attrs(self)->OrderedDict:
-        d = [(key, self.get_property(key + "_")) for key in self.attrs.keys()]
+        d = []
+        for key, val in self.attrs.items():
+            prop = custom_property(self, key + "_")
+            if isinstance(val, gs.Graph) and prop == subgraph_preview(val):
+                # the property only shows a preview of the body.
+                prop = val
+            d.append((key, prop))
         return OrderedDict(d)
 
+    def subgraph_keys(self)->List[str]:
+        """
+        Names of the attributes that hold a subgraph, e.g. ["then_branch", "else_branch"] of If.
+        """
+        return [key for key, val in self.attrs.items() if isinstance(val, gs.Graph)]
+
     def set_node_name(self, node_name:str, push_undo=False):
         self.node_name = node_name
         if not self.has_property("node_name"):
@@ -72,7 +182,7 @@ class ONNXNode(BaseNode):
             self.set_property("node_name", self.node_name, push_undo=push_undo)
 
     def get_node_name(self):
-        self.node_name = self.get_property("node_name")
+        self.node_name = custom_property(self, "node_name")
         return self.node_name
 
     def set_op(self, op:str, push_undo=False):
@@ -85,7 +195,7 @@ class ONNXNode(BaseNode):
 
     def set_onnx_inputs(self, onnx_inputs:List[OnnxNodeIO], push_undo=False):
         self.onnx_inputs = onnx_inputs
-        value = [[inp.name, inp.dtype, inp.shape, inp.values] for inp in self.onnx_inputs]
+        value = [[inp.name, inp.dtype, inp.shape, values_preview(inp.values)] for inp in self.onnx_inputs]
         if not self.has_property("inputs_"):
             self.create_property("inputs_", value, widget_type=NodePropWidgetEnum.QLINE_EDIT)
         else:
@@ -93,12 +203,30 @@ class ONNXNode(BaseNode):
 
     def set_onnx_outputs(self, onnx_outputs:List[OnnxNodeIO], push_undo=False):
         self.onnx_outputs = onnx_outputs
-        value = [[out.name, out.dtype, out.shape, out.values] for out in self.onnx_outputs]
+        value = [[out.name, out.dtype, out.shape, values_preview(out.values)] for out in self.onnx_outputs]
         if not self.has_property("outputs_"):
             self.create_property("outputs_",  value, widget_type=NodePropWidgetEnum.QLINE_EDIT)
         else:
             self.set_property("outputs_", value, push_undo=push_undo)
 
+    def sync_onnx_io(self):
+        """
+        Rebuilds onnx_inputs/onnx_outputs from the inputs_/outputs_ properties when they
+        disagree, e.g. after undo of set_onnx_inputs(). Values are kept by tensor name.
+        """
+        for prop, attr in [("inputs_", "onnx_inputs"), ("outputs_", "onnx_outputs")]:
+            if not self.has_property(prop):
+                continue
+            value = self.get_property(prop)
+            if not isinstance(value, list) or not all([isinstance(v, (list, tuple)) and len(v) == 4 for v in value]):
+                # edited as text in the properties bin.
+                continue
+            current = getattr(self, attr)
+            if [[io.name, io.dtype, io.shape] for io in current] == [v[:3] for v in value]:
+                continue
+            values = {io.name: io.values for io in current}
+            setattr(self, attr, [OnnxNodeIO(name, dtype, shape, values.get(name)) for name, dtype, shape, _ in value])
+
     def set_color(self, push_undo=False):
         self.view.text_color = COLOR_FONT + [255]
         color = get_node_color(self.op)
@@ -132,7 +260,7 @@ class ONNXInput(BaseNode):
         self._view.name = "input"
 
     def get_node_name(self):
-        self.node_name = self.get_property("node_name")
+        self.node_name = custom_property(self, "node_name")
         return self.node_name
 
     def set_node_name(self, node_name:str, push_undo=False):
@@ -195,7 +323,7 @@ class ONNXOutput(BaseNode):
         self._view.name = "output"
 
     def get_node_name(self):
-        self.node_name = self.get_property("node_name")
+        self.node_name = custom_property(self, "node_name")
         return self.node_name
 
     def set_node_name(self, node_name:str, push_undo=False):
@@ -233,3 +361,67 @@ class ONNXOutput(BaseNode):
 
     def set_font(self, font_size=GRAPH_FONT_SIZE, bold=False):
         set_font(self.view.text_item, font_size=font_size, bold=bold)
+
+
+class ONNXGroup(BaseNode):
+    """
+    Collapsed name scope of op nodes, e.g. "/encoder/layer.3/".
+
+    The member gs.Nodes are kept as they are and only turned into
+    ONNXNodes when the group is expanded. onnx_inputs/onnx_outputs are
+    the tensors that cross the border of the group, so the group is
+    wired and indexed like an op node.
+    """
+    # unique node identifier.
+    __identifier__ = 'nodes.node'
+    # initial default node name.
+    NODE_NAME = 'group'
+    def __init__(self):
+        super(ONNXGroup, self).__init__(qgraphics_item=CustomNodeItem)
+        self.set_layout_direction(LayoutDirectionEnum.VERTICAL.value)
+        self.node_name = ""
+        # scope levels of node_name.
+        self.depth = 0
+        self.members:List[gs.Node] = []
+        self.onnx_inputs:List[OnnxNodeIO] = []
+        self.onnx_outputs:List[OnnxNodeIO] = []
+        self.create_property("node_name", self.node_name, widget_type=NodePropWidgetEnum.QLABEL)
+        self.create_property("members", 0, widget_type=NodePropWidgetEnum.QLABEL)
+        self.create_property("inputs_", [], widget_type=NodePropWidgetEnum.QLABEL)
+        self.create_property("outputs_", [], widget_type=NodePropWidgetEnum.QLABEL)
+        # create node inputs.
+        self.input_port = self.add_input('multi in', multi_input=True, display_name=False)
+        # create node outputs.
+        self.output_port = self.add_output('multi out', multi_output=True, display_name=False)
+        self.set_color()
+        self.set_font()
+
+    def get_node_name(self):
+        self.node_name = custom_property(self, "node_name")
+        return self.node_name
+
+    def set_group(self, node_name:str, depth:int, members:List[gs.Node],
+                  onnx_inputs:List[OnnxNodeIO], onnx_outputs:List[OnnxNodeIO]):
+        self.node_name = node_name
+        self.depth = depth
+        self.members = members
+        self.onnx_inputs = onnx_inputs
+        self.onnx_outputs = onnx_outputs
+        self.set_property("node_name", node_name, push_undo=False)
+        self.set_property("members", len(members), push_undo=False)
+        self.set_property("inputs_", [[io.name, io.dtype, io.shape] for io in onnx_inputs], push_undo=False)
+        self.set_property("outputs_", [[io.name, io.dtype, io.shape] for io in onnx_outputs], push_undo=False)
+        self._view.name = self.display_name()
+
+    def display_name(self)->str:
+        # "/encoder/layer.3/" -> "layer.3 (120)"
+        scope = [p for p in self.node_name.split("/") if p]
+        return f"{scope[-1] if scope else self.node_name} ({len(self.members)})"
+
+    def set_color(self, push_undo=False):
+        self.view.text_color = COLOR_FONT + [255]
+        self.set_property('border_color', NODE_BORDER_COLOR + [255], push_undo)
+        self.set_property('color', GROUP_NODE_COLOR + [255], push_undo)
+
+    def set_font(self, font_size=GRAPH_FONT_SIZE, bold=True):
+        set_font(self.view.text_item, font_size=font_size, bold=bold)
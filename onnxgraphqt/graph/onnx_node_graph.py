@@ -1,16 +1,18 @@
 from dataclasses import dataclass
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Tuple
 import copy
-import tempfile
+import math
+from collections import OrderedDict
+import re
 import shutil
+import tempfile
 
 import numpy as np
 from PIL import Image
 import onnx
 import onnx_graphsurgeon as gs
-import networkx as nx
 
-from PySide2 import QtCore, QtWidgets
+from PySide2 import QtCore, QtGui, QtWidgets
 from NodeGraphQt.constants import (
     ViewerEnum,
 )
@@ -42,25 +44,41 @@ from onnxgraphqt.utils.color import (
 )
 from onnxgraphqt.utils.dtype import (
     DTYPES_TO_NUMPY_TYPES,
-    DTYPES_TO_ONNX_DTYPES,
 )
 from onnxgraphqt.utils.style import set_context_menu_style
-from onnxgraphqt.utils.widgets import pipe_paint
+from onnxgraphqt.utils.widgets import PipePainter
+from onnxgraphqt.utils.image_writer import PNGStreamWriter
+from onnxgraphqt.utils.profiler import profiler
+from onnxgraphqt.widgets.custom_node_viewer import CustomNodeViewer
 from .onnx_node import (
     ONNXInput,
     ONNXOutput,
     ONNXNode,
-    OnnxNodeIO
+    ONNXGroup,
+    OnnxNodeIO,
+    gs_node_to_io,
+    tensor_to_io,
 )
-from .autolayout.sugiyama_layout import sugiyama_layout
+from .node_groups import GROUP_MIN_NODES, group_nodes, group_boundary, scope_name
+from .constant_store import ConstantStore
+from .node_index import NodeIndex, IndexedNodeDict, INDEXED_PROPERTIES
+from .onnx_graph_diff import GraphDiff, diff_onnx_graph
+from .spatial_index import ViewportCuller
+from .vector_export import export_svg, export_pdf
+from .onnx_exporter import export_model, exceeds_protobuf_limit
+from .autolayout.dag_layout import dag_layout, incremental_dag_layout, NODE_SPACING, LAYER_SPACING
+from .autolayout.layout_cache import LayoutCache, topology_hash
+
 
+# patch_onnx_graph falls back to a full reload above this ratio of changed nodes.
+PATCH_MAX_CHANGE_RATIO = 0.5
 
-NUMPY_TYPES_TO_ONNX_DTYPES = {
-    np.dtype('float32'): onnx.TensorProto.FLOAT,
-    np.dtype('float64'): onnx.TensorProto.DOUBLE,
-    np.dtype('int32'): onnx.TensorProto.INT32,
-    np.dtype('int64'): onnx.TensorProto.INT64,
-}
+# rows drawn per pass of export_to_png, and the most memory one pass may use.
+EXPORT_BAND_HEIGHT = 1024
+EXPORT_BAND_BYTES = 64 * 1024 * 1024
+
+# progress(done, total, text), total is 0 when unknown.
+ProgressCallback = Callable[[int, int, str], None]
 
 NAME = str
 @dataclass
@@ -70,7 +88,36 @@ class OnnxGraph:
     nodes: Dict[NAME, ONNXNode]
     node_inputs: Dict[NAME, OnnxNodeIO]
 
+
+class NodePositionsCmd(QtWidgets.QUndoCommand):
+    """
+    Moves many nodes as one undo step.
+
+    Args:
+        graph (ONNXNodeGraph): graph holding the nodes.
+        nodes (List[NodeObject]): nodes to move.
+        positions (List[List[float]]): new x, y of each node.
+    """
+
+    def __init__(self, graph, nodes, positions):
+        QtWidgets.QUndoCommand.__init__(self)
+        self.setText('move nodes')
+        self.graph = graph
+        self.nodes = nodes
+        self.positions = positions
+        self.prev_positions = [list(n.model.pos) for n in nodes]
+
+    def undo(self):
+        self.graph.set_node_positions_batch(self.nodes, self.prev_positions)
+
+    def redo(self):
+        self.graph.set_node_positions_batch(self.nodes, self.positions)
+
+
 class ONNXNodeGraph(NodeGraph):
+    # (node, attribute name) of a subgraph the user asked to open.
+    subgraph_requested = QtCore.Signal(object, str)
+
     # def __super__init__(self, parent=None, **kwargs):
     #     """
     #     Args:
@@ -113,7 +160,12 @@ class ONNXNodeGraph(NodeGraph):
                  producer_name: str, producer_version: str, ir_version: int, model_version: int,
                  parent=None, **kwargs):
         # self.__super__init__(parent, **kwargs)
-        super().__init__(parent, layout_direction=1, **kwargs)
+        undo_stack = kwargs.pop("undo_stack", None) or QtWidgets.QUndoStack()
+        if "viewer" not in kwargs:
+            kwargs["viewer"] = CustomNodeViewer(undo_stack=undo_stack)
+        super().__init__(parent, layout_direction=1, undo_stack=undo_stack, **kwargs)
+        if undo_stack.parent() is None:
+            undo_stack.setParent(self)
         self.name = name
         self.opset = opset
         self.doc_string = doc_string
@@ -122,10 +174,30 @@ class ONNXNodeGraph(NodeGraph):
         self.producer_version = producer_version
         self.ir_version = ir_version
         self.model_version = model_version
+        self.constants = ConstantStore()
+        self.node_index = NodeIndex()
+        # positions of models laid out before, None to always compute the layout.
+        self.layout_cache = LayoutCache()
+        # models with at least this many op nodes load with their name scopes collapsed, 0 to never group.
+        self.group_min_nodes = GROUP_MIN_NODES
+        # graphs of opened If/Loop/Scan bodies by (node id, attribute name).
+        self._subgraphs: Dict[Tuple[str, str], "ONNXNodeGraph"] = {}
+        self._model.nodes = IndexedNodeDict(self.node_index, self._model.nodes)
+        self.property_changed.connect(self._on_node_property_changed)
+        # only the items near the viewport are kept in the scene.
+        self.culler = ViewportCuller(self)
+        if isinstance(self._viewer, CustomNodeViewer):
+            self._viewer.visible_rect_changed.connect(self.culler.update)
+            self._viewer.set_foreground_painter(self.culler.paint_overview)
+        self._undo_stack.indexChanged.connect(self._on_undo_index_changed)
+        self.port_connected.connect(self._on_connection_changed)
+        self.port_disconnected.connect(self._on_connection_changed)
+        self.node_double_clicked.connect(self._on_node_double_clicked)
         self.register_nodes([
             ONNXNode,
             ONNXInput,
             ONNXOutput,
+            ONNXGroup,
         ])
         self.set_background_color(*COLOR_BG)
         self.set_grid_mode(ViewerEnum.GRID_DISPLAY_LINES.value)
@@ -135,68 +207,82 @@ class ONNXNodeGraph(NodeGraph):
         # # Disable right click menu
         # self.disable_context_menu(True)
 
-    def export_to_png(self, export_filename="screenshot.png"):
+    def export_to_png(self, export_filename="screenshot.png", scale:float=1.0, progress:ProgressCallback=None):
+        """
+        Renders the whole graph into an image file.
+
+        The scene is drawn with QGraphicsScene.render in horizontal bands
+        of at most EXPORT_BAND_BYTES, and each band goes to a PNGStreamWriter
+        as soon as it is drawn, so memory stays bounded by one band however
+        large the graph is. Other formats are converted from the PNG with PIL.
+
+        Args:
+            export_filename (str): image path, ".png" is added without an extension.
+            scale (float): pixels per scene unit.
+            progress (ProgressCallback): called with the number of rows drawn.
+        """
         exp = os.path.splitext(export_filename)[1]
         if exp == "":
             exp = ".png"
             export_filename = export_filename + exp
 
-        current_screen_rect = self._viewer.scene_rect()
-        pos = np.array([node.get_property("pos") for node in self.all_nodes()])
-        view_x0 = np.min(pos[:, 0])
-        view_y0 = np.min(pos[:, 1])
-        view_x1 = np.max(pos[:, 0])
-        view_y1 = np.max(pos[:, 1])
-        view_width = view_x1 - view_x0
-        view_height = view_y1 - view_y0
-
+        rect = QtCore.QRectF()
+        for node in self.all_nodes():
+            # the node names are drawn beside the node items.
+            item = node.view
+            rect = rect.united(item.mapRectToScene(item.boundingRect().united(item.childrenBoundingRect())))
+        if rect.isEmpty():
+            return
         offset = 50
-        view_x0 = int(view_x0 - 0.5 - offset)
-        view_y0 = int(view_y0 - 0.5 - offset)
-        view_width = int(view_width + 0.5 + offset)
-        view_height = int(view_height + 0.5 + offset)
-
-        res_x = 1200
-        res_y = 1200
-        total_x = len(list(range(view_x0, view_width, res_x)))
-        total_y = len(list(range(view_y0, view_height, res_y)))
-        total = total_x * total_y
-        count_x = 0
-        tmpname = tempfile.NamedTemporaryFile().name
-        base_fn = f"{tmpname}_screenshot{exp}"
-        print(f"temp file: {base_fn}")
-        for x0 in range(view_x0, view_width, res_x):
-            count_y = 0
-            fn_x = f"{tmpname}_screenshot_{count_x}.png"
-            for y0 in range(view_y0, view_height, res_y):
-                self._viewer.set_scene_rect([x0, y0, res_x, res_y])
-                pixmap = self._viewer.grab()
-                qimg = pixmap.toImage()
-                img = np.array(qimg.constBits()).reshape(qimg.height(), qimg.width(), -1)
-                if os.path.exists(fn_x):
-                    imgs_y = []
-                    imgs_y.append(np.array(Image.open(fn_x)))
-                    imgs_y.append(img[1:-5, 1:-23])
-                    Image.fromarray(np.vstack(imgs_y)).save(fn_x)
-                else:
-                    Image.fromarray(img[1:-5, 1:-23]).save(fn_x)
-                count_y += 1
-                print("\r" + f"screenshot {count_x * total_y + count_y} / {total}", end="")
-            img_x = np.array(Image.open(fn_x))
-            if os.path.exists(base_fn):
-                imgs_x = []
-                imgs_x.append(np.array(Image.open(base_fn)))
-                imgs_x.append(img_x)
-                Image.fromarray(np.hstack(imgs_x)).save(base_fn)
-            else:
-                Image.fromarray(img_x).save(base_fn)
-            os.remove(fn_x)
-            count_x += 1
-        shutil.move(base_fn, export_filename)
-        print()
+        rect = rect.adjusted(-offset, -offset, offset, offset)
+        width = int(math.ceil(rect.width() * scale))
+        height = int(math.ceil(rect.height() * scale))
+        band = max(1, min(EXPORT_BAND_HEIGHT, EXPORT_BAND_BYTES // (width * 4)))
+
+        png_filename = export_filename
+        if exp.lower() != ".png":
+            png_filename = tempfile.NamedTemporaryFile().name + ".png"
+        scene = self._viewer.scene()
+        image = QtGui.QImage(width, band, QtGui.QImage.Format_RGBA8888)
+        try:
+            with PNGStreamWriter(png_filename, width, height) as writer:
+                for y in range(0, height, band):
+                    rows = min(band, height - y)
+                    source = QtCore.QRectF(rect.left(), rect.top() + y / scale, width / scale, rows / scale)
+                    # only the items near the viewport are in the scene.
+                    self.culler.realize_rect(source)
+                    image.fill(QtGui.QColor(*COLOR_BG))
+                    painter = QtGui.QPainter(image)
+                    painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+                    scene.render(painter, QtCore.QRectF(0, 0, width, rows), source, QtCore.Qt.IgnoreAspectRatio)
+                    painter.end()
+                    pixels = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(band, width, 4)
+                    writer.write_rows(pixels[:rows, :, :3])
+                    if progress is not None:
+                        progress(y + rows, height, "rendering image...")
+        finally:
+            self.culler.invalidate()
+            self.culler.update()
+        if png_filename != export_filename:
+            try:
+                Image.open(png_filename).convert("RGB").save(export_filename)
+            finally:
+                os.remove(png_filename)
         print(f"save as '{export_filename}'")
 
-        self._viewer.set_scene_rect(current_screen_rect)
+    def export_to_svg(self, export_filename="graph.svg", group_layers=True, progress:ProgressCallback=None):
+        """
+        Writes the whole graph as SVG, see vector_export.export_svg.
+        """
+        export_svg(self, export_filename, group_layers=group_layers, progress=progress)
+        print(f"save as '{export_filename}'")
+
+    def export_to_pdf(self, export_filename="graph.pdf", progress:ProgressCallback=None):
+        """
+        Writes the whole graph as a one page PDF, see vector_export.export_pdf.
+        """
+        export_pdf(self, export_filename, progress=progress)
+        print(f"save as '{export_filename}'")
 
     def reset_selection(self):
         for node in self.all_nodes():
@@ -207,10 +293,56 @@ class ONNXNodeGraph(NodeGraph):
         self.reset_selection()
         # node.set_selected(True)
         node.set_property("selected", True, push_undo=False)
-        self.fit_to_selection()
+        self._fit_to_nodes([node])
+
+    def fit_to_selection(self):
+        """
+        NodeGraph.fit_to_selection, framing all nodes by the bounds of the
+        spatial index instead of grouping every item.
+        """
+        self._fit_to_nodes(self.selected_nodes() or None)
+
+    def _fit_to_nodes(self, nodes:List[NodeObject]=None):
+        rect = self.culler.bounds(nodes)
+        if rect is None:
+            return
+        if isinstance(self._viewer, CustomNodeViewer):
+            self._viewer.zoom_to_rect(rect)
+        else:
+            self._viewer.zoom_to_nodes([n.view for n in nodes or self.all_nodes()])
+
+    def selected_nodes(self)->List[NodeObject]:
+        # the scene only knows about the selected items it holds.
+        nodes = super().selected_nodes()
+        nodes += [n for n in self.culler.virtual_nodes() if n.view.isSelected()]
+        return nodes
 
     def get_selected_node_names(self)->List[str]:
-        return [node.name() for node in self.all_nodes() if node.selected()]
+        # node_name follows renames patched in place, name() keeps the name the node was created with.
+        return [node.get_node_name() for node in self.all_nodes() if node.selected()]
+
+    def _on_undo_index_changed(self, index):
+        # undo and redo can move, add or re-wire any node.
+        self.culler.invalidate()
+        QtCore.QTimer.singleShot(0, self.culler.update)
+
+    def _on_connection_changed(self, *args):
+        self.culler.invalidate()
+
+    def _on_node_double_clicked(self, node):
+        if isinstance(node, ONNXGroup):
+            # the item is still handling the double click.
+            QtCore.QTimer.singleShot(0, lambda: self.expand_group(node, push_undo=True))
+        elif isinstance(node, ONNXNode):
+            for key in node.subgraph_keys():
+                self.subgraph_requested.emit(node, key)
+
+    def _on_node_property_changed(self, node, name, value):
+        if name in ("inputs_", "outputs_") and isinstance(node, ONNXNode):
+            # undo/redo only restores the property.
+            node.sync_onnx_io()
+        if name in INDEXED_PROPERTIES:
+            self.node_index.update(node)
 
     def get_any_node_by_name(self, name)->List:
         """
@@ -221,11 +353,7 @@ class ONNXNodeGraph(NodeGraph):
         Returns:
             NodeGraphQt.NodeObject: node object.
         """
-        ret = []
-        for node_id, node in self._model.nodes.items():
-            if node.node_name == name:
-                ret.append(node)
-        return ret
+        return self.node_index.nodes_by_name(name)
 
     def get_input_node_by_name(self, name)->List[ONNXInput]:
         """
@@ -236,12 +364,7 @@ class ONNXNodeGraph(NodeGraph):
         Returns:
             NodeGraphQt.NodeObject: node object.
         """
-        ret = []
-        for node_id, node in self._model.nodes.items():
-            if isinstance(node, ONNXInput):
-                if node.node_name == name:
-                    ret.append(node)
-        return ret
+        return [node for node in self.node_index.nodes_by_name(name) if isinstance(node, ONNXInput)]
 
     def get_node_by_name(self, name)->List[ONNXNode]:
         """
@@ -252,12 +375,7 @@ class ONNXNodeGraph(NodeGraph):
         Returns:
             NodeGraphQt.NodeObject: node object.
         """
-        ret = []
-        for node_id, node in self._model.nodes.items():
-            if isinstance(node, ONNXNode):
-                if node.node_name == name:
-                    ret.append(node)
-        return ret
+        return [node for node in self.node_index.nodes_by_name(name) if isinstance(node, ONNXNode)]
 
     def get_output_node_by_name(self, name)->List[ONNXOutput]:
         """
@@ -268,12 +386,40 @@ class ONNXNodeGraph(NodeGraph):
         Returns:
             NodeGraphQt.NodeObject: node object.
         """
-        ret = []
-        for node_id, node in self._model.nodes.items():
-            if isinstance(node, ONNXOutput):
-                if node.node_name == name:
-                    ret.append(node)
-        return ret
+        return [node for node in self.node_index.nodes_by_name(name) if isinstance(node, ONNXOutput)]
+
+    def get_nodes_by_op(self, op:str)->List[ONNXNode]:
+        """
+        Returns nodes of the op type.
+
+        Args:
+            op (str): op type. e.g. "Conv"
+        Returns:
+            List[ONNXNode]: node objects.
+        """
+        return self.node_index.nodes_by_op(op)
+
+    def get_tensor_producers(self, tensor_name:str)->List[NodeObject]:
+        """
+        Returns the nodes that output the tensor (the graph input node for graph inputs).
+
+        Args:
+            tensor_name (str): name of the tensor.
+        Returns:
+            List[NodeObject]: node objects.
+        """
+        return self.node_index.producers(tensor_name)
+
+    def get_tensor_consumers(self, tensor_name:str)->List[NodeObject]:
+        """
+        Returns the nodes that take the tensor as input (the graph output node for graph outputs).
+
+        Args:
+            tensor_name (str): name of the tensor.
+        Returns:
+            List[NodeObject]: node objects.
+        """
+        return self.node_index.consumers(tensor_name)
 
     def remove_all_nodes(self, push_undo=False):
         for node in self.all_nodes():
@@ -288,6 +434,8 @@ class ONNXNodeGraph(NodeGraph):
                 p.clear_connections(push_undo=push_undo)
 
             self.remove_node(node, push_undo=push_undo)
+        self.constants.clear()
+        self._subgraphs.clear()
 
     def _serialize(self, nodes)->Dict[str, Any]:
         ret = super()._serialize(nodes)
@@ -307,8 +455,278 @@ class ONNXNodeGraph(NodeGraph):
         return len(self.all_nodes())
 
     def create_qtinput(self, input: gs.Tensor, push_undo=False)->ONNXInput:
+        n = self.create_node("nodes.node.ONNXInput", input.name, push_undo=push_undo)
+        self._init_qtinput(n, input)
+        # create_property() on a node in the graph emits no signal.
+        self.node_index.update(n)
+        return n
+
+    def create_qtoutput(self, output: gs.Tensor, push_undo=False)->ONNXOutput:
+        n = self.create_node("nodes.node.ONNXOutput", output.name, push_undo=push_undo)
+        self._init_qtoutput(n, output)
+        self.node_index.update(n)
+        return n
+
+    def create_qtnode(self, onnx_node: gs.Node, push_undo=False)->NodeObject:
+        n = self.create_node("nodes.node.ONNXNode", name=onnx_node.name, push_undo=push_undo)
+        self._init_qtnode(n, onnx_node)
+        self.node_index.update(n)
+        self._delete_constant_input(n)
+        return n
+
+    def create_qtgroup(self, scope:Tuple[str, ...], members:List[gs.Node], output_names:set, push_undo=False)->ONNXGroup:
+        n = self.create_node("nodes.node.ONNXGroup", name=scope_name(scope), push_undo=push_undo)
+        self._init_qtgroup(n, scope, members, output_names)
+        self.node_index.update(n)
+        return n
+
+    def create_qtnodes(self, onnx_graph: gs.Graph, progress:ProgressCallback=None,
+                       groups:List[Tuple[Tuple[str, ...], List[gs.Node]]]=[])->Tuple[Dict[str, NodeObject], Dict[str, NodeObject]]:
+        """
+        Creates the input, output and op nodes of onnx_graph in one batch.
+
+        Node objects are built and configured before they belong to the graph,
+        so properties are written straight to the models without undo commands
+        or signals. The node items are then added to the scene in one pass with
+        viewport updates, scene indexing and graph signals suspended.
+
+        Warnings:
+            Undo is NOT supported for this function.
+
+        Args:
+            onnx_graph (gs.Graph): graph to import.
+            progress (ProgressCallback): called with the number of nodes created so far.
+            groups (List[Tuple[Tuple[str, ...], List[gs.Node]]]): (scope, members) from group_nodes,
+                each created as one ONNXGroup instead of its members.
+        Returns:
+            (Dict[str, NodeObject], Dict[str, NodeObject]): input/output nodes and op nodes by name.
+                Grouped op nodes map to their ONNXGroup.
+        """
+        qt_io_nodes = {}
+        new_nodes = []
+        for inp in onnx_graph.inputs:
+            n = self._init_qtinput(self._node_factory.create_node_instance("nodes.node.ONNXInput"), inp)
+            qt_io_nodes[inp.name] = n
+            new_nodes.append((n, inp.name))
+        for out in onnx_graph.outputs:
+            n = self._init_qtoutput(self._node_factory.create_node_instance("nodes.node.ONNXOutput"), out)
+            qt_io_nodes[out.name] = n
+            new_nodes.append((n, out.name))
+        grouped = set([id(m) for _, members in groups for m in members])
+        op_nodes = [n for n in onnx_graph.nodes if id(n) not in grouped]
+        output_names = set([out.name for out in onnx_graph.outputs])
+        qt_nodes = self._create_op_nodes_batch(op_nodes, groups, output_names, new_nodes, progress)
+        return qt_io_nodes, qt_nodes
+
+    def _create_op_nodes_batch(self, op_nodes:List[gs.Node], groups:List[Tuple[Tuple[str, ...], List[gs.Node]]],
+                               output_names:set, new_nodes:List[Tuple[NodeObject, str]]=None,
+                               progress:ProgressCallback=None, pos:List[float]=None)->Dict[str, NodeObject]:
+        """
+        Creates op and group nodes, and new_nodes that are already built, in one batch.
+        Returns the nodes by op node name, grouped op nodes map to their ONNXGroup.
+        """
+        qt_nodes = {}
+        new_nodes = list(new_nodes or [])
+        total = len(new_nodes) + len(op_nodes) + len(groups)
+        op_qt_nodes = []
+        for onnx_node in op_nodes:
+            n = self._init_qtnode(self._node_factory.create_node_instance("nodes.node.ONNXNode"), onnx_node)
+            qt_nodes[onnx_node.name] = n
+            op_qt_nodes.append(n)
+            new_nodes.append((n, onnx_node.name))
+            if progress is not None:
+                progress(len(new_nodes), total, "creating nodes...")
+        for scope, members in groups:
+            n = self._init_qtgroup(self._node_factory.create_node_instance("nodes.node.ONNXGroup"), scope, members, output_names)
+            for m in members:
+                qt_nodes[m.name] = n
+            new_nodes.append((n, n.node_name))
+        if pos is not None:
+            for n, _ in new_nodes:
+                n.model.pos = list(pos)
+        if progress is not None:
+            progress(0, 0, "adding nodes to the scene...")
+        self._add_nodes_batch(new_nodes)
+        for n in op_qt_nodes:
+            self._delete_constant_input(n)
+        return qt_nodes
+
+    def _add_nodes_batch(self, new_nodes:List[Tuple[NodeObject, str]]):
+        """
+        Same bookkeeping as NodeGraph.create_node for many detached nodes,
+        with unique names resolved against a set instead of all_nodes().
+        """
+        used_names = set([n.name() for n in self.all_nodes()])
+        next_index = {}
+        layout_direction = self.layout_direction()
+        scene = self._viewer.scene()
+        index_method = scene.itemIndexMethod()
+        scene.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        self._viewer.setUpdatesEnabled(False)
+        signals_blocked = self.blockSignals(True)
+        try:
+            for node, name in new_nodes:
+                node._graph = self
+                node.model._graph_model = self.model
+
+                wid_types = node.model.__dict__.pop('_TEMP_property_widget_types')
+                prop_attrs = node.model.__dict__.pop('_TEMP_property_attrs')
+                node_attrs = {node.type_: {
+                    n: {'widget_type': wt} for n, wt in wid_types.items()
+                }}
+                for pname, pattrs in prop_attrs.items():
+                    node_attrs[node.type_][pname].update(pattrs)
+                self.model.set_node_common_properties(node_attrs)
+
+                node.NODE_NAME = unique_node_name(name or node.NODE_NAME, used_names, next_index)
+                used_names.add(node.NODE_NAME)
+                node.model.name = node.NODE_NAME
+                node.model.selected = False
+                node.model.layout_direction = layout_direction
+                node.update()
+                if isinstance(node, ONNXNode):
+                    # update() shows the node name, op nodes display the op.
+                    node.view.name = node.op
+                elif isinstance(node, ONNXGroup):
+                    node.view.name = node.display_name()
+
+                self.model.nodes[node.id] = node
+                self._viewer.add_node(node.view, node.model.pos)
+                node.model.width = node.view.width
+                node.model.height = node.view.height
+        finally:
+            self.blockSignals(signals_blocked)
+            scene.setItemIndexMethod(index_method)
+            self._viewer.setUpdatesEnabled(True)
+
+    def connect_ports_batch(self, connections:List[Tuple[Port, Port]]):
+        """
+        Connects many (output port, input port) pairs at once.
+
+        Same result as Port.connect_to for each pair, but the port models are
+        updated directly and the pipes are added to the scene with viewport
+        updates, scene indexing and graph signals suspended. Duplicate pairs
+        are skipped with a set instead of scanning connected_ports(), and no
+        acyclic check is done, so the connections must form a DAG.
+
+        Warnings:
+            Undo is NOT supported for this function.
+
+        Args:
+            connections (List[Tuple[Port, Port]]): (source output port, target input port) pairs.
+        """
+        scene = self._viewer.scene()
+        index_method = scene.itemIndexMethod()
+        scene.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        self._viewer.setUpdatesEnabled(False)
+        signals_blocked = self.blockSignals(True)
+        connected = set()
+        try:
+            for src_port, trg_port in connections:
+                src_node = src_port.node()
+                trg_node = trg_port.node()
+                key = (src_node.id, src_port.name(), trg_node.id, trg_port.name())
+                if key in connected:
+                    continue
+                connected.add(key)
+                src_port.model.connected_ports[trg_node.id].append(trg_port.name())
+                trg_port.model.connected_ports[src_node.id].append(src_port.name())
+                self._viewer.establish_connection(src_port.view, trg_port.view)
+                trg_node.on_input_connected(trg_port, src_port)
+        finally:
+            self.blockSignals(signals_blocked)
+            scene.setItemIndexMethod(index_method)
+            self._viewer.setUpdatesEnabled(True)
+            self.culler.invalidate()
+
+    def connect_ports(self, connections:List[Tuple[Port, Port]], push_undo=False):
+        """
+        Connects (output port, input port) pairs, with undo through Port.connect_to
+        or in one batch through connect_ports_batch.
+        """
+        self.culler.realize([p.node() for pair in connections for p in pair])
+        if push_undo:
+            # the graphs are DAGs, skip the cycle search per connection.
+            acyclic = self.acyclic()
+            self.set_acyclic(False)
+            try:
+                for src_port, trg_port in connections:
+                    src_port.connect_to(trg_port, push_undo=push_undo)
+            finally:
+                self.set_acyclic(acyclic)
+        else:
+            self.connect_ports_batch(connections)
+
+    def lock_ports(self, nodes:List[NodeObject], state=True, push_undo=False):
+        """
+        Sets the locked state of every port of nodes.
+        """
+        if push_undo:
+            # every port is visited, so there is no need to follow connections.
+            for n in nodes:
+                for p in n.input_ports() + n.output_ports():
+                    if p.locked() != state:
+                        p.set_locked(state=state, connected_ports=False, push_undo=push_undo)
+        else:
+            self.lock_ports_batch(nodes, state=state)
+
+    def set_node_positions(self, nodes:List[NodeObject], positions:List[List[float]], push_undo=False):
+        """
+        Moves nodes to positions, as a single undo command if push_undo is set.
+        """
+        if push_undo:
+            self._undo_stack.push(NodePositionsCmd(self, nodes, positions))
+        else:
+            self.set_node_positions_batch(nodes, positions)
+
+    def set_node_positions_batch(self, nodes:List[NodeObject], positions:List[List[float]]):
+        """
+        Moves nodes with scene indexing and viewport updates suspended.
+
+        Ports ask for scene position changes to redraw their pipes, and Qt
+        looks through every such item in the scene on each move. The flag
+        is turned off while moving and each pipe is redrawn once afterwards.
+
+        Warnings:
+            Undo is NOT supported for this function.
+        """
+        scene = self._viewer.scene()
+        index_method = scene.itemIndexMethod()
+        scene.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        self._viewer.setUpdatesEnabled(False)
+        flag = QtWidgets.QGraphicsItem.ItemSendsScenePositionChanges
+        port_items = [p.view for n in nodes for p in n.input_ports() + n.output_ports()]
+        try:
+            for item in port_items:
+                item.setFlag(flag, False)
+            for node, (x, y) in zip(nodes, positions):
+                node.model.pos = [x, y]
+                node.view.setPos(x, y)
+        finally:
+            for item in port_items:
+                item.setFlag(flag, True)
+            pipes = set()
+            for item in port_items:
+                pipes.update(item.connected_pipes)
+            for pipe in pipes:
+                pipe.draw_path(pipe.input_port, pipe.output_port)
+            scene.setItemIndexMethod(index_method)
+            self._viewer.setUpdatesEnabled(True)
+            self.culler.invalidate()
+            self.culler.update()
+
+    def lock_ports_batch(self, nodes:List[NodeObject], state=True):
+        """
+        Sets the locked state of every port of nodes without undo commands.
+        Each port is visited once, unlike Port.set_locked(connected_ports=True).
+        """
+        for node in nodes:
+            for port in node.input_ports() + node.output_ports():
+                port.model.locked = state
+                port.view.locked = state
+
+    def _init_qtinput(self, n:ONNXInput, input: gs.Tensor)->ONNXInput:
         node_name = input.name
-        n = self.create_node("nodes.node.ONNXInput", node_name, push_undo=push_undo)
         n.set_node_name(node_name)
         n.set_shape(copy.deepcopy(input.shape))
         n.set_dtype(input.dtype)
@@ -316,9 +734,8 @@ class ONNXNodeGraph(NodeGraph):
         n.set_color()
         return n
 
-    def create_qtoutput(self, output: gs.Tensor, push_undo=False)->ONNXOutput:
+    def _init_qtoutput(self, n:ONNXOutput, output: gs.Tensor)->ONNXOutput:
         node_name = output.name
-        n = self.create_node("nodes.node.ONNXOutput", node_name, push_undo=push_undo)
         n.set_node_name(node_name)
         n.set_shape(copy.deepcopy(output.shape))
         n.set_dtype(output.dtype)
@@ -326,90 +743,85 @@ class ONNXNodeGraph(NodeGraph):
         n.set_color()
         return n
 
-    def create_qtnode(self, onnx_node: gs.Node, push_undo=False)->NodeObject:
+    def _init_qtnode(self, n:ONNXNode, onnx_node: gs.Node)->ONNXNode:
         node_name = onnx_node.name # str
-        n = self.create_node("nodes.node.ONNXNode", name=node_name, push_undo=push_undo)
         n.set_node_name(node_name)
         n.set_op(onnx_node.op) # str
+        onnx_inputs, onnx_outputs, attrs = gs_node_to_io(onnx_node, self.constants)
         if n.op in ['Constant', 'ConstantOfShape']:
-            name = onnx_node.outputs[0].name
-            if hasattr(onnx_node.attrs["value"], "values"):
-                dtype = str(onnx_node.attrs["value"].values.dtype)
-                shape = onnx_node.attrs["value"].shape
-                values = onnx_node.attrs["value"].values
-            else:
-                dtype = onnx_node.outputs[0].dtype
-                shape = onnx_node.outputs[0].shape
-                values = np.asarray(onnx_node.attrs["value"], dtype=dtype)
-                dtype = str(dtype)
-            onnx_outputs = [OnnxNodeIO(name, dtype, shape, values)]
             n.set_onnx_outputs(onnx_outputs)
-            d = {
-                "dtype": dtype,
-                "values": values
-            }
-            n.set_attrs(d)
+            n.set_attrs(dict(attrs))
         else:
-            onnx_inputs:List[OnnxNodeIO] = []
-            for inp in onnx_node.inputs:
-                t = type(inp)
-                if t is gs.Tensor:
-                    onnx_inputs += [OnnxNodeIO(inp.name, str(inp.dtype), inp.shape, None)]
-                elif t is gs.Constant:
-                    onnx_inputs += [OnnxNodeIO(inp.name, str(inp.values.dtype), inp.shape, inp.values.tolist())]
-                elif t is gs.Variable:
-                    if inp.dtype is None:
-                        onnx_inputs += [OnnxNodeIO(inp.name, None, None, None)]
-                    else:
-                        onnx_inputs += [OnnxNodeIO(inp.name, str(inp.dtype), inp.shape, None)]
-                else:
-                    onnx_inputs += [OnnxNodeIO(inp.name, None, None, None)]
-            onnx_outputs:List[OnnxNodeIO] = []
-            for out in onnx_node.outputs:
-                t = type(out)
-                if t is gs.Tensor:
-                    onnx_outputs += [OnnxNodeIO(out.name, str(out._values.dtype), out.shape, None)]
-                elif t is gs.Constant:
-                    onnx_outputs += [OnnxNodeIO(out.name, str(out.values.dtype), out.shape, out.values.tolist())]
-                elif t is gs.Variable:
-                    if out.dtype is None:
-                        onnx_outputs += [OnnxNodeIO(out.name, None, None, None)]
-                    else:
-                        onnx_outputs += [OnnxNodeIO(out.name, str(out.dtype), out.shape, None)]
-                else:
-                    onnx_outputs += [OnnxNodeIO(out.name, None, None, None)]
             if len(onnx_inputs) > 0:
                 n.set_onnx_inputs(onnx_inputs)
             if len(onnx_outputs) > 0:
                 n.set_onnx_outputs(onnx_outputs)
-            n.set_attrs(copy.deepcopy(onnx_node.attrs)) # OrderedDict
+            # subgraph bodies are kept by reference and built only when opened.
+            n.set_attrs(OrderedDict([(key, val if isinstance(val, gs.Graph) else copy.deepcopy(val))
+                                     for key, val in attrs.items()]))
 
         n.set_color()
+        return n
+
+    def _init_qtgroup(self, n:ONNXGroup, scope:Tuple[str, ...], members:List[gs.Node], output_names:set)->ONNXGroup:
+        inputs, outputs = group_boundary(members, output_names)
+        n.set_group(scope_name(scope), len(scope), members,
+                    [tensor_to_io(t) for t in inputs], [tensor_to_io(t) for t in outputs])
+        return n
+
+    def _delete_constant_input(self, n:ONNXNode):
+        # needs the node item in the scene.
         if n.op in ['Constant']:
             n.set_port_deletion_allowed(True)
             n.delete_input(0)
             n.set_port_deletion_allowed(False)
-        return n
 
-    def load_onnx_graph(self, onnx_graph, push_undo=False):
-        ONNXtoNodeGraph(onnx_graph, self, push_undo=push_undo)
+    def load_onnx_graph(self, onnx_graph, push_undo=False, progress:ProgressCallback=None):
+        ONNXtoNodeGraph(onnx_graph, self, push_undo=push_undo, progress=progress)
 
-    def to_onnx_gs(self) -> gs.Graph:
-        return NodeGraphtoONNX(self)
+    def diff_onnx_graph(self, onnx_graph)->GraphDiff:
+        return diff_onnx_graph(self.all_nodes(), onnx_graph)
+
+    def patch_onnx_graph(self, onnx_graph, push_undo=False, max_change_ratio=PATCH_MAX_CHANGE_RATIO, diff:GraphDiff=None)->bool:
+        """
+        Updates the current nodes to onnx_graph in place, touching only what differs.
 
-    def to_onnx(self, non_verbose=True)->onnx.ModelProto:
-        graph = self.to_onnx_gs()
+        Args:
+            onnx_graph (gs.Graph): edited graph, e.g. the output of a tool.
+            push_undo (bool): register the changes on the undo stack.
+            max_change_ratio (float): give up when more than this ratio of the nodes would be rebuilt.
+            diff (GraphDiff): diff_onnx_graph(onnx_graph) if already computed, e.g. on a worker thread.
+        Returns:
+            bool: False if nothing was patched (empty graph or too many changes),
+                load_onnx_graph should be used then.
+        """
+        nodes = self.all_nodes()
+        if len(nodes) == 0:
+            return False
+        if diff is None:
+            diff = diff_onnx_graph(nodes, onnx_graph)
+        if diff.num_rebuilt() > max_change_ratio * len(nodes):
+            return False
+        patch_node_graph(onnx_graph, self, diff, push_undo=push_undo)
+        return True
+
+    def to_onnx_gs(self, progress:ProgressCallback=None) -> gs.Graph:
+        return NodeGraphtoONNX(self, progress=progress)
+
+    def to_onnx(self, non_verbose=True, progress:ProgressCallback=None)->onnx.ModelProto:
         ret = None
         try:
-            ret = gs.export_onnx(graph, do_type_check=True)
-            ret.producer_name = self.producer_name
-            ret.producer_version = self.producer_version
-            ret.ir_version = self.ir_version
-            ret.model_version = self.model_version
-            onnx.checker.check_model(
-                model=ret,
-                full_check=False
-            )
+            # protos are written directly, without a gs.Graph in between.
+            with profiler.span("export_model", nodes=self.node_count()):
+                ret = export_model(self, progress=progress)
+            # check_model serializes the model, which fails over 2GB.
+            if not exceeds_protobuf_limit(ret):
+                if progress is not None:
+                    progress(0, 0, "checking model...")
+                onnx.checker.check_model(
+                    model=ret,
+                    full_check=False
+                )
         except BaseException as e:
             if not non_verbose:
                 print(e)
@@ -422,21 +834,51 @@ class ONNXNodeGraph(NodeGraph):
         node_inputs = {}
         for n in self.all_nodes():
             if isinstance(n, ONNXNode):
-                nodes[n.name()] = n
+                nodes[n.get_node_name()] = n
                 for inp in n.onnx_inputs:
                     node_inputs[inp.name] = inp
+            elif isinstance(n, ONNXGroup):
+                for m in n.members:
+                    nodes[m.name] = m
+                    for inp in gs_node_to_io(m)[0]:
+                        node_inputs[inp.name] = inp
             elif isinstance(n, ONNXInput):
-                inputs[n.name()] = n
+                inputs[n.get_node_name()] = n
             elif isinstance(n, ONNXOutput):
-                outputs[n.name()] = n
+                outputs[n.get_node_name()] = n
         return OnnxGraph(inputs=inputs, outputs=outputs, nodes=nodes, node_inputs=node_inputs)
 
-    def to_networkx(self, reverse=False)->nx.DiGraph:
+    def to_networkx(self, reverse=False)->"nx.DiGraph":
         return NodeGraphToNetworkX(self, reverse)
 
-    def export(self, file_path:str):
+    def export(self, file_path:str, progress:ProgressCallback=None):
         try:
-            onnx.save(self.to_onnx(), file_path)
+            # write next to the target and swap it in, so a memory-mapped
+            # source file that is being overwritten stays valid.
+            model = self.to_onnx(progress=progress)
+            if progress is not None:
+                progress(0, 0, f"writing {os.path.basename(file_path)}...")
+            if exceeds_protobuf_limit(model):
+                # over 2GB, the weights go to <file>.data next to the model.
+                # onnx appends to an existing data file, so both are written
+                # to an empty directory first.
+                data_name = f"{os.path.basename(file_path)}.data"
+                tmp_dir = tempfile.mkdtemp(prefix=".onnxgraphqt_", dir=os.path.dirname(os.path.abspath(file_path)))
+                try:
+                    onnx.save(model, os.path.join(tmp_dir, os.path.basename(file_path)),
+                              save_as_external_data=True, all_tensors_to_one_file=True, location=data_name)
+                    os.replace(os.path.join(tmp_dir, data_name), f"{file_path}.data")
+                    os.replace(os.path.join(tmp_dir, os.path.basename(file_path)), file_path)
+                finally:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            try:
+                onnx.save(model, tmp_path)
+                os.replace(tmp_path, file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             # from onnx_graphsurgeon.exporters.onnx_exporter import OnnxExporter
             # og = OnnxExporter.export_graph(self.to_onnx_gs(), do_type_check=True)
             # opset_imports = [onnx.helper.make_opsetid("", self.opset)]
@@ -445,283 +887,508 @@ class ONNXNodeGraph(NodeGraph):
             raise e
 
     def auto_layout(self, push_undo=True):
-        auto_layout_nodes(self, push_undo=push_undo)
+        auto_layout_nodes(self, push_undo=push_undo, cache=self.layout_cache)
+
+    def auto_layout_incremental(self, nodes:List[NodeObject], new_nodes:List[NodeObject]=[], push_undo=True):
+        """
+        Lays out nodes (whose inputs changed), new_nodes and their descendants,
+        keeping every other node where it is.
+        """
+        incremental_layout_nodes(self, nodes, new_nodes, push_undo=push_undo)
+
+    def expand_group(self, group:ONNXGroup, push_undo=False)->List[NodeObject]:
+        """
+        Replaces group by its members, grouped again one scope level deeper.
+
+        The new nodes are wired by tensor name to whatever produces or
+        consumes their tensors now, and laid out around the position of the group.
+
+        Returns:
+            List[NodeObject]: the created nodes.
+        """
+        groups, op_nodes = group_nodes(group.members, group.depth)
+        output_names = set([n.get_node_name() for n in self.get_nodes_by_type("nodes.node.ONNXOutput")])
+        pos = group.pos()
+        neighbours = {}
+        for port in group.input_ports() + group.output_ports():
+            for node_id, port_names in port.model.connected_ports.items():
+                if port_names:
+                    neighbours[node_id] = self.get_node_by_id(node_id)
+        if push_undo:
+            self.begin_undo(f"expand {group.get_node_name()}")
+        self.lock_ports([group] + list(neighbours.values()), state=False, push_undo=push_undo)
+        self.remove_node(group, push_undo=push_undo)
+
+        if push_undo:
+            children = [self.create_qtnode(n, push_undo=push_undo) for n in op_nodes]
+            children += [self.create_qtgroup(scope, members, output_names, push_undo=push_undo) for scope, members in groups]
+            for n in children:
+                n.set_property("pos", pos, push_undo=push_undo)
+        else:
+            qt_nodes = self._create_op_nodes_batch(op_nodes, groups, output_names, pos=pos)
+            children = list({n.id: n for n in qt_nodes.values()}.values())
+
+        connections = []
+        connected = set()
+        def connect(src, trg):
+            if src is not trg and (src.id, trg.id) not in connected:
+                connected.add((src.id, trg.id))
+                connections.append((src.output(0), trg.input(0)))
+        for n in children:
+            for io in n.onnx_inputs:
+                for src in self.node_index.producers(io.name):
+                    connect(src, n)
+            for io in n.onnx_outputs:
+                for trg in self.node_index.consumers(io.name):
+                    connect(n, trg)
+        self.connect_ports(connections, push_undo=push_undo)
+        self.lock_ports(children + list(neighbours.values()), push_undo=push_undo)
+        self.update_pipe_paint()
+
+        rewired = [trg_port.node() for _, trg_port in connections if trg_port.node() not in children]
+        self.auto_layout_incremental(rewired, new_nodes=children, push_undo=push_undo)
+        if push_undo:
+            self.end_undo()
+        return children
+
+    def open_subgraph(self, node:ONNXNode, key:str)->"ONNXNodeGraph":
+        """
+        Returns a graph of the body held in attribute key of node, e.g. the
+        "body" of a Loop. The graph is built on the first call and kept, so
+        it opens again with the same layout.
 
+        Warnings:
+            The body is shown as it is; edits to the returned graph are not
+            written back to node.
+        """
+        sub = self._subgraphs.get((node.id, key))
+        if sub is not None:
+            return sub
+        body:gs.Graph = node.attrs[key]
+        sub = ONNXNodeGraph(name=body.name,
+                            opset=self.opset,
+                            doc_string=body.doc_string,
+                            import_domains=self.import_domains,
+                            producer_name=self.producer_name,
+                            producer_version=self.producer_version,
+                            ir_version=self.ir_version,
+                            model_version=self.model_version)
+        # bodies are laid out apart from the models that hold them.
+        sub.layout_cache = None if self.layout_cache is None else \
+            LayoutCache(os.path.join(self.layout_cache.directory, "subgraphs"), self.layout_cache.max_bytes)
+        sub.group_min_nodes = self.group_min_nodes
+        sub.load_onnx_graph(body)
+        sub.update_pipe_paint()
+        sub.auto_layout(push_undo=False)
+        self._subgraphs[(node.id, key)] = sub
+        return sub
+
+    @profiler.profile("update_pipe_paint")
     def update_pipe_paint(self):
+        """
+        Installs a PipePainter on every pipe that does not have one yet.
+        """
         nodes = self.all_nodes()
         for node in nodes:
-            if isinstance(node, ONNXNode):
+            if isinstance(node, (ONNXNode, ONNXInput, ONNXGroup)):
                 pipes = node.output_port.view.connected_pipes
                 for pipe in pipes:
-                    def paint(pipe, text=""):
-                        def func(painter, option, widget):
-                            return pipe_paint(pipe, painter, option, widget, text)
-                        return func
-                    attrs = node.get_attrs()
-                    pipe.paint = paint(pipe)
-            if isinstance(node, ONNXInput):
-                pipes = node.output_port.view.connected_pipes
-                for pipe in pipes:
-                    def paint(pipe, text=""):
-                        def func(painter, option, widget):
-                            return pipe_paint(pipe, painter, option, widget, text)
-                        return func
-                    pipe.paint = paint(pipe)
+                    if not isinstance(pipe.paint, PipePainter):
+                        pipe.paint = PipePainter(pipe)
+        self.culler.invalidate()
+
+def unique_node_name(name:str, used_names:set, next_index:Dict[str, int]=None)->str:
+    """
+    NodeGraph.get_unique_name against a set of used names.
+    next_index remembers the last suffix tried per base name across calls.
+    """
+    name = ' '.join(name.split())
+    if name not in used_names:
+        return name
+    search = re.search(r'\w+ (\d+)$', name)
+    if search:
+        version = search.group(1)
+        name = name[:len(version) * -1].strip()
+    if next_index is None:
+        next_index = {}
+    x = next_index.get(name, 1)
+    while '{} {}'.format(name, x) in used_names:
+        x += 1
+    next_index[name] = x + 1
+    return '{} {}'.format(name, x)
+
 
 def NodeGraphToEdges(graph:ONNXNodeGraph, reverse=True)->List:
     ret = []
     if reverse:
-        node_names = [n.name() for n in graph.all_nodes()[::-1]]
+        node_indices = {n.name(): i for i, n in enumerate(graph.all_nodes()[::-1])}
         for i, n in enumerate(graph.all_nodes()[::-1]):
             for input_nodes in n.connected_input_nodes().values():
                 for inp in input_nodes:
-                    input_index = node_names.index(inp.name())
+                    input_index = node_indices[inp.name()]
                     ret.append([i, input_index])
     else:
-        node_names = [n.name() for n in graph.all_nodes()]
+        node_indices = {n.name(): i for i, n in enumerate(graph.all_nodes())}
         for i, n in enumerate(graph.all_nodes()):
             for input_nodes in n.connected_input_nodes().values():
                 for inp in input_nodes:
-                    input_index = node_names.index(inp.name())
+                    input_index = node_indices[inp.name()]
                     ret.append([input_index, i])
     return ret
 
 
-def NodeGraphtoONNX(graph: ONNXNodeGraph) -> gs.Graph:
-    input_names = []
-    output_names = []
-    input_variables = []
-    output_variables = []
-    gs_variables_all = {}
-
-    for n in graph.get_nodes_by_type("nodes.node.ONNXInput"):
-        v = gs.Variable(name=n.name(), dtype=n.get_dtype(), shape=n.get_shape())
-        input_variables.append(v)
-        input_names.append(n.name())
-        gs_variables_all[n.name()] = v
-
-    for n in graph.get_nodes_by_type("nodes.node.ONNXOutput"):
-        v = gs.Variable(name=n.name(), dtype=n.get_dtype(), shape=n.get_shape())
-        output_variables.append(v)
-        output_names.append(n.name())
-        gs_variables_all[n.name()] = v
-
-    nodes = []
-    for n in graph.get_nodes_by_type("nodes.node.ONNXNode"):
-        input_gs_variables = []
-        output_gs_variables = []
-
-        # 2. Node Generation
-        node = None
-        value_info = None
-        if n.op not in ['Constant', 'ConstantOfShape']:
-            # not constant
-            for inp in n.onnx_inputs:
-                name, dtype, shape, val = inp.name, inp.dtype, inp.shape, inp.values
-                if name in gs_variables_all.keys():
-                    v = gs_variables_all[name]
-                elif dtype is None:
-                    v = gs.Variable(name=name, dtype=None, shape=None)
-                    gs_variables_all[name] = v
-                elif val == -1 or val is None:
-                    v = gs.Variable(name=name, dtype=dtype, shape=shape)
-                    gs_variables_all[name] = v
-                elif isinstance(val, (list, float, int)):
-                    v = gs.Constant(name=name, values=np.array(val, dtype=dtype).reshape(shape))
-                    gs_variables_all[name] = v
-                else:
-                    v = gs.Constant(name=name, values=np.array(val))
-                    gs_variables_all[name] = v
-                input_gs_variables.append(v)
-
-            for out in n.onnx_outputs:
-                name, dtype, shape, val = out.name, out.dtype, out.shape, out.values
-                if name in gs_variables_all.keys():
-                    v = gs_variables_all[name]
-                elif dtype is None:
-                    v = gs.Variable(name=name, dtype=None, shape=None)
-                    gs_variables_all[name] = v
-                elif val == -1 or val is None:
-                    v = gs.Variable(name=name, dtype=dtype, shape=shape)
-                    gs_variables_all[name] = v
-                elif isinstance(val, (list, float, int)):
-                    v = gs.Constant(name=name, values=np.array(val, dtype=dtype).reshape(shape))
-                    gs_variables_all[name] = v
-                else:
-                    v = gs.Constant(name=name, values=np.array(val))
-                    gs_variables_all[name] = v
-                output_gs_variables.append(v)
-
-            # non constant
-            node = gs.Node(
-                op=n.op,
-                name=n.get_node_name(),
-                attrs=n.get_attrs(),
-                inputs=input_gs_variables,
-                outputs=output_gs_variables
-            )
-        else:
-            # constant
-            dtype = n.attrs["dtype"]
-            attr_values = n.attrs["values"]
-            shape = attr_values.shape
-            if isinstance(attr_values, np.ndarray):
-                dtype = NUMPY_TYPES_TO_ONNX_DTYPES[attr_values.dtype]
-            else:
-                dtype = DTYPES_TO_ONNX_DTYPES[type(attr_values)]
-
-            constant_name = [o.name for o in n.onnx_outputs][0]
-            value_info = onnx.helper.make_tensor_value_info(
-                            constant_name,
-                            dtype,
-                            shape
-                        )
-            if len(shape) == 0:
-                value = onnx.helper.make_tensor(
-                            name="value",
-                            data_type=dtype,
-                            dims=shape,
-                            vals=[attr_values.tolist()]
-                        )
-            else:
-                value = onnx.helper.make_tensor(
-                            name="value",
-                            data_type=dtype,
-                            dims=shape,
-                            vals=attr_values.tolist()
-                        )
-            node = onnx.helper.make_node(
-                n.op,
-                inputs=[],
-                outputs=[constant_name],
-                name=n.node_name,
-                value=value
-            )
-
-        # 3. Graph Generation
-        single_op_graph = None
-        if n.op not in ['Constant', 'ConstantOfShape']:
-            g = gs.Graph(
-                nodes=[node],
-                inputs=input_gs_variables,
-                outputs=output_gs_variables,
-                opset=n.op,
-            )
-            node = g.nodes[0]
-        else:
-            graph_def = onnx.helper.make_graph(
-                nodes=[node],
-                name=n.op,
-                inputs=[],
-                outputs=[value_info],
-            )
-            single_op_graph = onnx.helper.make_model(graph_def)
-            gs_graph = gs.import_onnx(single_op_graph)
-            node = gs_graph.nodes[0]
-            for variable in gs_graph.outputs:
-                gs_variables_all[variable.name] = variable
-
-        nodes.append(node)
-
-    onnx_graph = gs.Graph(
-        nodes=nodes,
-        name=graph.name,
-        opset=graph.opset,
-        inputs=input_variables,
-        outputs=output_variables,
-        doc_string=graph.doc_string,
-        import_domains=graph.import_domains,
-    )
-    return onnx_graph
-
-def auto_layout_nodes(graph:ONNXNodeGraph, push_undo=True):
+@profiler.profile("NodeGraphtoONNX")
+def NodeGraphtoONNX(graph: ONNXNodeGraph, progress:ProgressCallback=None) -> gs.Graph:
+    """
+    gs.Graph of graph, imported from the ModelProto written by export_model.
+    """
+    return gs.import_onnx(export_model(graph, progress=progress))
+
+
+def NodeGraphToEdgeArray(nodes:List[NodeObject])->np.ndarray:
+    """
+    (num_edges, 2) array of (producer index, consumer index) into nodes,
+    read from the port models.
+    """
+    node_indices = {n.id: i for i, n in enumerate(nodes)}
+    edges = []
+    for i, n in enumerate(nodes):
+        for port in n.input_ports():
+            for node_id, port_names in port.model.connected_ports.items():
+                # disconnecting leaves an empty list behind.
+                if port_names and node_id in node_indices:
+                    edges.append((node_indices[node_id], i))
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def layout_label(graph:ONNXNodeGraph, node:NodeObject)->str:
+    """
+    Node type, name and op of node for topology_hash.
+    """
+    keys = graph.node_index.keys(node.id) or NodeIndex.node_keys(node)
+    name, op = keys[0], keys[1]
+    return f"{node.type_}\0{name}\0{op}"
+
+
+@profiler.profile("auto_layout_nodes")
+def auto_layout_nodes(graph:ONNXNodeGraph, push_undo=True, cache:LayoutCache=None):
+    """
+    Lays out all nodes with dag_layout. With cache, a graph with the same
+    topology as one laid out before gets the stored positions instead.
+    """
     if push_undo:
         graph.begin_undo('Auto Layout Nodes')
 
-    g = graph.to_networkx(reverse=True)
-    pos = sugiyama_layout(g)
-
-    for node_name, (x, y) in pos.items():
-        nodes = graph.get_any_node_by_name(node_name)
-        if len(nodes) == 0:
-            continue
-        if len(nodes) > 1:
-            print("ERROR!!")
-            continue
-        node = nodes[0]
-        node.set_property('pos', [float(x), -float(y)], push_undo=push_undo)
+    nodes = graph.all_nodes()
+    edges = NodeGraphToEdgeArray(nodes)
+    pos = None
+    if cache is not None:
+        labels = [layout_label(graph, n) for n in nodes]
+        key = topology_hash(labels, edges, NODE_SPACING, LAYER_SPACING)
+        pos = cache.get(key, labels)
+    if pos is None:
+        pos = dag_layout(len(nodes), edges, NODE_SPACING, LAYER_SPACING)
+        if cache is not None:
+            cache.put(key, labels, pos)
+    graph.set_node_positions(nodes, pos.tolist(), push_undo=push_undo)
 
     if push_undo:
         graph.end_undo()
 
 
-def ONNXtoNodeGraph(onnx_graph: gs.Graph, node_graph:ONNXNodeGraph, push_undo=False):
+def incremental_layout_nodes(graph:ONNXNodeGraph, nodes:List[NodeObject], new_nodes:List[NodeObject]=[], push_undo=True):
+    all_nodes = graph.all_nodes()
+    node_indices = {n.id: i for i, n in enumerate(all_nodes)}
+    positions = np.array([n.model.pos for n in all_nodes], dtype=np.float64).reshape(-1, 2)
+
+    def neighbours(ports):
+        def func(i):
+            ret = []
+            for port in ports(all_nodes[i]):
+                for node_id, port_names in port.model.connected_ports.items():
+                    if port_names and node_id in node_indices:
+                        ret.append(node_indices[node_id])
+            return ret
+        return func
+
+    moved = incremental_dag_layout(
+        positions,
+        [node_indices[n.id] for n in nodes if n.id in node_indices],
+        neighbours(lambda n: n.input_ports()),
+        neighbours(lambda n: n.output_ports()),
+        new_nodes=[node_indices[n.id] for n in new_nodes if n.id in node_indices])
+    if moved is None:
+        auto_layout_nodes(graph, push_undo=push_undo)
+    elif moved:
+        graph.set_node_positions([all_nodes[i] for i in moved.keys()],
+                                 [list(p) for p in moved.values()],
+                                 push_undo=push_undo)
+
+
+@profiler.profile("ONNXtoNodeGraph")
+def ONNXtoNodeGraph(onnx_graph: gs.Graph, node_graph:ONNXNodeGraph, push_undo=False, progress:ProgressCallback=None):
     qt_io_nodes = {}
     qt_nodes = {}
-    qt_edge = {}
+    groups = []
+    op_nodes = onnx_graph.nodes
+    if 0 < node_graph.group_min_nodes <= len(onnx_graph.nodes):
+        groups, op_nodes = group_nodes(onnx_graph.nodes)
+
+    with profiler.span("create nodes", nodes=len(op_nodes), groups=len(groups)):
+        if push_undo:
+            # Create Input/Output Node
+            for inp in onnx_graph.inputs:
+                qt_n = node_graph.create_qtinput(inp, push_undo=push_undo)
+                qt_io_nodes[inp.name] = qt_n
+
+            for out in onnx_graph.outputs:
+                qt_n = node_graph.create_qtoutput(out, push_undo=push_undo)
+                qt_io_nodes[out.name] = qt_n
+
+            # Create Node
+            for i, onnx_node in enumerate(op_nodes):
+                qt_n = node_graph.create_qtnode(onnx_node, push_undo=push_undo)
+                qt_nodes[onnx_node.name] = qt_n
+                if progress is not None:
+                    progress(i + 1, len(op_nodes), "creating nodes...")
+
+            # Create Group
+            output_names = set([out.name for out in onnx_graph.outputs])
+            for scope, members in groups:
+                qt_n = node_graph.create_qtgroup(scope, members, output_names, push_undo=push_undo)
+                for m in members:
+                    qt_nodes[m.name] = qt_n
+        else:
+            # no undo needed, create all nodes in one batch.
+            qt_io_nodes, qt_nodes = node_graph.create_qtnodes(onnx_graph, progress=progress, groups=groups)
 
-    # Create Input/Output Node
-    for inp in onnx_graph.inputs:
-        qt_n = node_graph.create_qtinput(inp, push_undo=push_undo)
-        qt_io_nodes[inp.name] = qt_n
+    if progress is not None:
+        progress(0, 0, "connecting nodes...")
+    connect_onnx_edges(onnx_graph, node_graph, qt_io_nodes, qt_nodes, push_undo=push_undo)
 
-    for out in onnx_graph.outputs:
-        qt_n = node_graph.create_qtoutput(out, push_undo=push_undo)
-        qt_io_nodes[out.name] = qt_n
 
-    # Create Node
-    for onnx_node in onnx_graph.nodes:
-        qt_n = node_graph.create_qtnode(onnx_node, push_undo=push_undo)
-        qt_nodes[onnx_node.name] = qt_n
+def onnx_edge_ports(onnx_graph: gs.Graph, qt_io_nodes:Dict[str, NodeObject],
+                    qt_nodes:Dict[str, NodeObject])->List[Tuple[Port, Port]]:
+    """
+    Returns the (output port, input port) pairs that wire up the nodes of onnx_graph.
 
+    Args:
+        onnx_graph (gs.Graph): imported graph.
+        qt_io_nodes (Dict[str, NodeObject]): input/output nodes by tensor name.
+        qt_nodes (Dict[str, NodeObject]): op nodes by node name, or the ONNXGroup holding the op node.
+    """
+    qt_edge = {}
+    # producer/consumer index per tensor name
     for onnx_node in onnx_graph.nodes:
         for input in onnx_node.inputs:
-            if input.name not in qt_edge.keys():
-                qt_edge[input.name] = {
-                    "inputs": [onnx_node.name],
-                    "outputs": [],
-                }
-            else:
-                qt_edge[input.name]["inputs"].append(onnx_node.name)
+            edge = qt_edge.get(input.name)
+            if edge is None:
+                edge = qt_edge[input.name] = {"inputs": [], "outputs": []}
+            edge["inputs"].append(onnx_node.name)
         for output in onnx_node.outputs:
-            if output.name not in qt_edge.keys():
-                qt_edge[output.name] = {
-                    "inputs": [],
-                    "outputs": [onnx_node.name],
-                }
-            else:
-                qt_edge[output.name]["outputs"].append(onnx_node.name)
-
-    input_names = [inp.name for inp in onnx_graph.inputs]
-    output_names = [out.name for out in onnx_graph.outputs]
-    # Connect Node
+            edge = qt_edge.get(output.name)
+            if edge is None:
+                edge = qt_edge[output.name] = {"inputs": [], "outputs": []}
+            edge["outputs"].append(onnx_node.name)
+
+    input_names = set([inp.name for inp in onnx_graph.inputs])
+    output_names = set([out.name for out in onnx_graph.outputs])
+    connections:List[Tuple[Port, Port]] = []
     for key, val in qt_edge.items():
         node_inputs = val["inputs"]
         node_outputs = val["outputs"]
         if key in input_names:
             for inp in node_inputs:
-                # qt_io_nodes[key].set_output(0, qt_nodes[inp].input(0))
-                src_port: Port = qt_io_nodes[key].output(0)
-                src_port.connect_to(qt_nodes[inp].input(0), push_undo=push_undo)
+                connections.append((qt_io_nodes[key].output(0), qt_nodes[inp].input(0)))
         if key in output_names:
             for out in node_outputs:
-                # qt_nodes[out].set_output(0, qt_io_nodes[key].input(0))
-                src_port: Port = qt_nodes[out].output(0)
-                src_port.connect_to(qt_io_nodes[key].input(0), push_undo=push_undo)
+                connections.append((qt_nodes[out].output(0), qt_io_nodes[key].input(0)))
         for inp in node_inputs:
             for out in node_outputs:
-                # qt_nodes[out].set_output(0, qt_nodes[inp].input(0))
-                src_port: Port = qt_nodes[out].output(0)
-                src_port.connect_to(qt_nodes[inp].input(0), push_undo=push_undo)
+                if qt_nodes[out] is not qt_nodes[inp]:
+                    # tensors inside a group connect nothing.
+                    connections.append((qt_nodes[out].output(0), qt_nodes[inp].input(0)))
+    return connections
+
+
+def connect_onnx_edges(onnx_graph: gs.Graph, node_graph:ONNXNodeGraph,
+                       qt_io_nodes:Dict[str, NodeObject], qt_nodes:Dict[str, NodeObject], push_undo=False):
+    """
+    Connects the nodes created by ONNXtoNodeGraph and locks their ports.
+    Runs in time linear in the number of tensors and connections.
+
+    Args:
+        onnx_graph (gs.Graph): imported graph.
+        node_graph (ONNXNodeGraph): graph holding the nodes.
+        qt_io_nodes (Dict[str, NodeObject]): input/output nodes by tensor name.
+        qt_nodes (Dict[str, NodeObject]): op nodes by node name.
+        push_undo (bool): register the connections on the undo stack.
+    """
+    with profiler.span("connect ports"):
+        connections = onnx_edge_ports(onnx_graph, qt_io_nodes, qt_nodes)
+        # Connect Node
+        node_graph.connect_ports(connections, push_undo=push_undo)
+
     # Lock Node and Port
+    with profiler.span("lock ports"):
+        node_graph.lock_ports(node_graph.all_nodes(), push_undo=push_undo)
+
+
+def patch_node_graph(onnx_graph: gs.Graph, node_graph:ONNXNodeGraph, diff:GraphDiff, push_undo=False):
+    """
+    Applies diff to node_graph so that it matches onnx_graph.
+
+    Removed nodes are deleted, changed op nodes are replaced at the same
+    position, renamed op nodes and reshaped inputs/outputs are updated in
+    place, and only the connections that differ are cut or made. Collapsed
+    groups without a changed member are kept and take the members of
+    onnx_graph; the others are replaced by their members, collapsed again
+    where their scope did not change. Added nodes and the nodes below them
+    are laid out incrementally; nothing else moves.
+
+    Args:
+        onnx_graph (gs.Graph): graph after the edit.
+        node_graph (ONNXNodeGraph): graph to patch.
+        diff (GraphDiff): diff_onnx_graph(node_graph.all_nodes(), onnx_graph).
+        push_undo (bool): register the changes on the undo stack.
+    """
+    qt_io_nodes = {}
+    qt_nodes = {}
+    for n, t in diff.unchanged + diff.updated:
+        if isinstance(n, ONNXNode):
+            qt_nodes[t.name] = n
+        else:
+            qt_io_nodes[t.name] = n
+    for n, members in diff.groups:
+        for m in members:
+            qt_nodes[m.name] = n
+    output_names = set([out.name for out in onnx_graph.outputs])
+
+    # Unlock the nodes to remove and their neighbours
+    removed = diff.removed + [n for n, _ in diff.changed]
+    removed_tensors = set()
+    touched = {}
+    for n in removed:
+        touched[n.id] = n
+        for port in n.input_ports() + n.output_ports():
+            for node_id, port_names in port.model.connected_ports.items():
+                # disconnecting leaves an empty list behind.
+                if port_names:
+                    touched[node_id] = node_graph.get_node_by_id(node_id)
+        if isinstance(n, ONNXNode):
+            removed_tensors.update([io.name for io in n.onnx_inputs + n.onnx_outputs if io.values is not None])
+    node_graph.lock_ports(touched.values(), state=False, push_undo=push_undo)
+
+    # Remove Node
+    positions = {}
+    for n, onnx_node in diff.changed:
+        positions[id(onnx_node)] = n.pos()
+    for n in removed:
+        node_graph.remove_node(n, push_undo=push_undo)
+        touched.pop(n.id, None)
+
+    # Create Node
+    added = []
+    replaced = []
+    for node_type, t in diff.added + [("nodes.node.ONNXNode", t) for _, t in diff.changed]:
+        if node_type == "nodes.node.ONNXInput":
+            qt_io_nodes[t.name] = qt_n = node_graph.create_qtinput(t, push_undo=push_undo)
+        elif node_type == "nodes.node.ONNXOutput":
+            qt_io_nodes[t.name] = qt_n = node_graph.create_qtoutput(t, push_undo=push_undo)
+        elif node_type == "nodes.node.ONNXGroup":
+            scope, members = t
+            qt_n = node_graph.create_qtgroup(scope, members, output_names, push_undo=push_undo)
+            for m in members:
+                qt_nodes[m.name] = qt_n
+        else:
+            # constant values may have changed under the same tensor name.
+            for io in t.inputs + t.outputs:
+                node_graph.constants.remove(io.name)
+            qt_nodes[t.name] = qt_n = node_graph.create_qtnode(t, push_undo=push_undo)
+        touched[qt_n.id] = qt_n
+        pos = positions.get(id(t))
+        if pos is None:
+            added.append(qt_n)
+        else:
+            qt_n.set_property("pos", pos, push_undo=push_undo)
+            replaced.append(qt_n)
+    # created nodes come last in the node dict; op nodes are exported in its
+    # order, so put them back in the (topological) order of onnx_graph.
+    node_graph.model.nodes.reorder([qt_nodes[t.name].id for t in onnx_graph.nodes
+                                    if isinstance(qt_nodes.get(t.name), ONNXNode)])
+    for name in removed_tensors:
+        if not node_graph.get_tensor_producers(name) and not node_graph.get_tensor_consumers(name):
+            node_graph.constants.remove(name)
+
+    # Update Group: members of the new graph, the tensors crossing its border may differ.
+    for n, members in diff.groups:
+        inputs, outputs = group_boundary(members, output_names)
+        n.set_group(n.get_node_name(), n.depth, members,
+                    [tensor_to_io(t) for t in inputs], [tensor_to_io(t) for t in outputs])
+        node_graph.node_index.update(n)
+
+    # Update Node
+    for n, t in diff.updated:
+        if isinstance(n, ONNXInput):
+            n.set_shape(copy.deepcopy(t.shape), push_undo=push_undo)
+            n.set_dtype(t.dtype, push_undo=push_undo)
+            n.set_output_names([o.name for o in t.outputs], push_undo=push_undo)
+        elif isinstance(n, ONNXOutput):
+            n.set_shape(copy.deepcopy(t.shape), push_undo=push_undo)
+            n.set_dtype(t.dtype, push_undo=push_undo)
+            n.set_input_names([i.name for i in t.inputs], push_undo=push_undo)
+        else:
+            onnx_inputs, onnx_outputs, _ = gs_node_to_io(t, node_graph.constants)
+            n.set_node_name(t.name, push_undo=push_undo)
+            if n.has_property("inputs_"):
+                n.set_onnx_inputs(onnx_inputs, push_undo=push_undo)
+            if n.has_property("outputs_"):
+                n.set_onnx_outputs(onnx_outputs, push_undo=push_undo)
+
+    # Connect Node: cut the stale connections and make the missing ones
+    connections = onnx_edge_ports(onnx_graph, qt_io_nodes, qt_nodes)
+    wanted = set()
+    for src_port, trg_port in connections:
+        wanted.add((src_port.node().id, src_port.name(), trg_port.node().id, trg_port.name()))
+    current = set()
+    stale = []
     for n in node_graph.all_nodes():
-        for ip in n.input_ports():
-            ip.set_locked(state=True, connected_ports=True, push_undo=push_undo)
-        for op in n.output_ports():
-            op.set_locked(state=True, connected_ports=True, push_undo=push_undo)
+        for port in n.output_ports():
+            for node_id, port_names in port.model.connected_ports.items():
+                for port_name in port_names:
+                    key = (n.id, port.name(), node_id, port_name)
+                    current.add(key)
+                    if key not in wanted:
+                        stale.append((port, node_graph.get_node_by_id(node_id).get_input(port_name)))
+    missing = []
+    for src_port, trg_port in connections:
+        key = (src_port.node().id, src_port.name(), trg_port.node().id, trg_port.name())
+        if key not in current:
+            current.add(key)
+            missing.append((src_port, trg_port))
+    for src_port, trg_port in stale + missing:
+        for port in [src_port, trg_port]:
+            node = port.node()
+            if node.id not in touched:
+                touched[node.id] = node
+                node_graph.lock_ports([node], state=False, push_undo=push_undo)
+    for src_port, trg_port in stale:
+        src_port.disconnect_from(trg_port, push_undo=push_undo)
+    node_graph.connect_ports(missing, push_undo=push_undo)
+
+    # Lock Node and Port
+    node_graph.lock_ports(touched.values(), push_undo=push_undo)
+
+    # Lay out the nodes whose inputs changed and what is below them
+    rewired = {n.id: n for n in replaced}
+    for _, trg_port in stale + missing:
+        rewired[trg_port.node().id] = trg_port.node()
+    node_graph.auto_layout_incremental(list(rewired.values()), new_nodes=added, push_undo=push_undo)
 
 
-def NodeGraphToNetworkX(graph:ONNXNodeGraph, reverse=False)->nx.DiGraph:
+def NodeGraphToNetworkX(graph:ONNXNodeGraph, reverse=False)->"nx.DiGraph":
+    # networkx takes a while to import and is only needed here.
+    import networkx as nx
     nx_g = nx.DiGraph()
     if reverse:
         nodes = graph.all_nodes()[::-1]
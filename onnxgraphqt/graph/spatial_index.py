@@ -0,0 +1,400 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PySide2 import QtCore, QtGui
+from NodeGraphQt.base.node import NodeObject
+from NodeGraphQt.constants import LayoutDirectionEnum
+
+
+# side of a grid cell in scene units, a few nodes wide.
+GRID_CELL_SIZE = 1024.0
+# graphs with fewer nodes keep every item in the scene.
+CULLING_MIN_NODES = 2000
+# realised area around the visible rect, as a ratio of its width and height on each side.
+CULLING_MARGIN = 0.5
+# below this zoom no item is realised, the nodes and pipes are drawn from the index.
+CULLING_OVERVIEW_SCALE = 0.1
+
+Rect = Tuple[float, float, float, float]
+
+
+class NodeSpatialIndex:
+    """
+    Uniform grid over node rectangles.
+
+    Rects are (x0, y0, x1, y1) rows of a numpy array and are binned by the
+    cell of their top-left corner. The rows are kept sorted by cell, so a
+    query looks up one contiguous range per grid row of the query rect
+    and then checks the candidates exactly. Moving rows only marks the
+    grid as stale; it is sorted again on the next query.
+    """
+
+    def __init__(self, cell_size:float=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.rects = np.zeros((0, 4), dtype=np.float64)
+        self._order = np.zeros(0, dtype=np.int64)
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._origin = (0.0, 0.0)
+        self._shape = (1, 1)
+        self._extent = (0.0, 0.0)
+        self._stale = False
+
+    def __len__(self)->int:
+        return len(self.rects)
+
+    def rebuild(self, rects:np.ndarray):
+        """
+        Args:
+            rects (np.ndarray): (num_nodes, 4) x0, y0, x1, y1 of each node.
+        """
+        self.rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4).copy()
+        self._stale = True
+
+    def update(self, rows:np.ndarray, rects:np.ndarray):
+        """
+        Replaces the rects of rows.
+        """
+        if len(rows) == 0:
+            return
+        self.rects[rows] = rects
+        self._stale = True
+
+    def _sort(self):
+        rects = self.rects
+        if len(rects) == 0:
+            self._order = np.zeros(0, dtype=np.int64)
+            self._keys = np.zeros(0, dtype=np.int64)
+            self._stale = False
+            return
+        x0, y0 = rects[:, 0].min(), rects[:, 1].min()
+        cx = ((rects[:, 0] - x0) // self.cell_size).astype(np.int64)
+        cy = ((rects[:, 1] - y0) // self.cell_size).astype(np.int64)
+        cols = int(cx.max()) + 1
+        keys = cy * cols + cx
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        self._origin = (x0, y0)
+        self._shape = (int(cy.max()) + 1, cols)
+        # a rect reaches at most this far past its cell.
+        self._extent = (float((rects[:, 2] - rects[:, 0]).max()), float((rects[:, 3] - rects[:, 1]).max()))
+        self._stale = False
+
+    def query(self, rect:Rect)->np.ndarray:
+        """
+        Returns:
+            np.ndarray: rows whose rect intersects rect (x0, y0, x1, y1).
+        """
+        if self._stale:
+            self._sort()
+        if len(self._keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        qx0, qy0, qx1, qy1 = rect
+        rows, cols = self._shape
+        ox, oy = self._origin
+        cx0 = max(int((qx0 - self._extent[0] - ox) // self.cell_size), 0)
+        cy0 = max(int((qy0 - self._extent[1] - oy) // self.cell_size), 0)
+        cx1 = min(int((qx1 - ox) // self.cell_size), cols - 1)
+        cy1 = min(int((qy1 - oy) // self.cell_size), rows - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.zeros(0, dtype=np.int64)
+        first = np.arange(cy0, cy1 + 1, dtype=np.int64) * cols
+        lo = np.searchsorted(self._keys, first + cx0, side="left")
+        hi = np.searchsorted(self._keys, first + cx1, side="right")
+        candidates = np.concatenate([self._order[l:h] for l, h in zip(lo.tolist(), hi.tolist())])
+        r = self.rects[candidates]
+        hit = (r[:, 0] <= qx1) & (r[:, 2] >= qx0) & (r[:, 1] <= qy1) & (r[:, 3] >= qy0)
+        return candidates[hit]
+
+    def bounds(self, rows:np.ndarray=None)->Optional[Rect]:
+        """
+        Returns:
+            Rect: (x0, y0, x1, y1) around rows or every rect, None if there is none.
+        """
+        rects = self.rects if rows is None else self.rects[rows]
+        if len(rects) == 0:
+            return None
+        return (float(rects[:, 0].min()), float(rects[:, 1].min()),
+                float(rects[:, 2].max()), float(rects[:, 3].max()))
+
+
+def node_rect(node:NodeObject)->Rect:
+    x, y = node.model.pos
+    return (x, y, x + node.model.width, y + node.model.height)
+
+
+class ViewportCuller:
+    """
+    Keeps only the node and pipe items near the visible area in the scene.
+
+    Every node keeps its NodeObject, model and QGraphicsItem; the items far
+    from the viewport are only taken out of the QGraphicsScene, so scene
+    indexing, hit-testing and painting scale with what is on screen. A pipe
+    stays in the scene while the box between its two nodes overlaps the
+    realised area, so long edges crossing the view are still drawn.
+
+    The realised area is the visible rect grown by margin on each side, and
+    nothing is done while the visible rect stays inside it and has not
+    shrunk to less than half its size by zooming in. Below overview_scale
+    no item is realised at all and paint_overview draws every node as a
+    rect and every pipe as a line instead, so the number of items in the
+    scene stays bounded by what fits on screen at overview_scale.
+
+    Node and pipe lists are rebuilt lazily after invalidate() or when nodes
+    are added or removed.
+    """
+
+    def __init__(self, graph, min_nodes:int=CULLING_MIN_NODES, margin:float=CULLING_MARGIN,
+                 overview_scale:float=CULLING_OVERVIEW_SCALE):
+        self.graph = graph
+        self.min_nodes = min_nodes
+        self.margin = margin
+        self.overview_scale = overview_scale
+        self.enabled = True
+        self.index = NodeSpatialIndex()
+        self.nodes: List[NodeObject] = []
+        self.pipes = []
+        # (num_pipes, 2) rows of the output and input node of each pipe.
+        self.pipe_ends = np.zeros((0, 2), dtype=np.int64)
+        self.node_in_scene = np.zeros(0, dtype=bool)
+        self.pipe_in_scene = np.zeros(0, dtype=bool)
+        self.realized_rect: Optional[QtCore.QRectF] = None
+        # no item is realised and paint_overview draws the graph.
+        self.overview = False
+        # (pipe lines by color, node rects by color) for paint_overview.
+        self._overview_shapes = None
+        self._version = None
+        self._dirty = True
+        # some items were taken out of the scene.
+        self._culled = False
+
+    def invalidate(self):
+        """
+        Rebuilds the node and pipe lists on the next update, after
+        connections changed or nodes moved.
+        """
+        self._dirty = True
+        self.realized_rect = None
+
+    def active(self)->bool:
+        return self.enabled and len(self.graph.model.nodes) >= self.min_nodes
+
+    def virtual_nodes(self)->List[NodeObject]:
+        """
+        Returns:
+            List[NodeObject]: nodes whose items are out of the scene.
+        """
+        if not self._culled:
+            return []
+        self._sync()
+        return [self.nodes[i] for i in np.nonzero(~self.node_in_scene)[0].tolist()]
+
+    def _sync(self)->bool:
+        nodes_dict = self.graph.model.nodes
+        version = getattr(nodes_dict, "version", None)
+        if not self._dirty and version == self._version:
+            return False
+        self._dirty = False
+        self._version = version
+        self.realized_rect = None
+        self._overview_shapes = None
+        self.nodes = list(nodes_dict.values())
+        rows = {n.id: i for i, n in enumerate(self.nodes)}
+        self.index.rebuild(np.array([node_rect(n) for n in self.nodes], dtype=np.float64).reshape(-1, 4))
+        pipes = []
+        ends = []
+        for i, node in enumerate(self.nodes):
+            for port in node.output_ports():
+                if len(port.view.connected_pipes) != sum([len(names) for names in port.model.connected_ports.values()]):
+                    self._restore_pipes(port)
+                for pipe in port.view.connected_pipes:
+                    j = rows.get(pipe.input_port.node.id)
+                    if j is not None:
+                        pipes.append(pipe)
+                        ends.append((i, j))
+        self.pipes = pipes
+        self.pipe_ends = np.array(ends, dtype=np.int64).reshape(-1, 2)
+        self.node_in_scene = np.array([n.view.scene() is not None for n in self.nodes], dtype=bool)
+        self.pipe_in_scene = np.array([p.scene() is not None for p in pipes], dtype=bool)
+        return True
+
+    def _restore_pipes(self, port):
+        # Port.connect_to (also on undo and redo) makes no pipe for a port out of the scene.
+        viewer = self.graph.viewer()
+        targets = set([id(pipe.input_port) for pipe in port.view.connected_pipes])
+        for node_id, port_names in port.model.connected_ports.items():
+            node = self.graph.model.nodes.get(node_id)
+            if node is None:
+                continue
+            for port_name in port_names:
+                target = node.get_input(port_name).view
+                if id(target) not in targets:
+                    viewer.establish_connection(port.view, target)
+
+    def _refresh_realized(self):
+        # realised nodes may have been dragged since the last update.
+        rows = np.nonzero(self.node_in_scene)[0]
+        rects = []
+        for i in rows.tolist():
+            view = self.nodes[i].view
+            x, y = view.xy_pos
+            rects.append((x, y, x + view.width, y + view.height))
+        rects = np.array(rects, dtype=np.float64).reshape(-1, 4)
+        changed = np.any(self.index.rects[rows] != rects, axis=1)
+        if np.any(changed):
+            self.index.update(rows[changed], rects[changed])
+            self._overview_shapes = None
+
+    def update(self, visible:QtCore.QRectF=None):
+        """
+        Realises the items near visible, the viewer's visible rect by
+        default, and takes the others out of the scene.
+        """
+        if not self.active():
+            if self._culled:
+                self.realize_all()
+            return
+        synced = self._sync()
+        viewer = self.graph.viewer()
+        if visible is None:
+            visible = viewer.visible_rect()
+        if viewer.transform().m11() < self.overview_scale:
+            # items created since, e.g. by a patch, are taken out too.
+            if not self.overview or synced or self.node_in_scene.any() or self.pipe_in_scene.any():
+                self._refresh_realized()
+                self._apply(np.zeros(len(self.nodes), dtype=bool), np.zeros(len(self.pipes), dtype=bool))
+                self.realized_rect = None
+                self.overview = True
+                self._culled = True
+                viewer.viewport().update()
+            return
+        realized = self.realized_rect
+        if not self.overview and realized is not None and realized.contains(visible) \
+                and visible.width() * (1 + 2 * self.margin) * 2 > realized.width():
+            # still inside, and not zoomed in far enough to drop many items.
+            return
+        mx = visible.width() * self.margin
+        my = visible.height() * self.margin
+        self.realize_rect(visible.adjusted(-mx, -my, mx, my))
+
+    def realize_rect(self, area:QtCore.QRectF):
+        """
+        Realises exactly the items in area, whatever the zoom, e.g. for
+        rendering part of the scene off screen. Does nothing while culling
+        is not active.
+        """
+        if not self.active():
+            return
+        self._sync()
+        self._refresh_realized()
+        rect = (area.left(), area.top(), area.right(), area.bottom())
+
+        want_nodes = np.zeros(len(self.nodes), dtype=bool)
+        want_nodes[self.index.query(rect)] = True
+        r = self.index.rects
+        src = r[self.pipe_ends[:, 0]]
+        dst = r[self.pipe_ends[:, 1]]
+        want_pipes = (np.minimum(src[:, 0], dst[:, 0]) <= rect[2]) & (np.maximum(src[:, 2], dst[:, 2]) >= rect[0]) \
+            & (np.minimum(src[:, 1], dst[:, 1]) <= rect[3]) & (np.maximum(src[:, 3], dst[:, 3]) >= rect[1])
+        self._apply(want_nodes, want_pipes)
+        self.realized_rect = area
+        self.overview = False
+        self._culled = True
+
+    def realize(self, nodes:List[NodeObject]):
+        """
+        Puts the items of nodes back in the scene, e.g. before connecting
+        their ports, which only makes pipes between items in a scene.
+        """
+        if not self._culled:
+            return
+        scene = self.graph.viewer().scene()
+        for node in nodes:
+            if node.view.scene() is None:
+                scene.addItem(node.view)
+        self.invalidate()
+
+    def realize_all(self):
+        """
+        Puts every item back in the scene, e.g. to turn culling off.
+        """
+        self._sync()
+        self._apply(np.ones(len(self.nodes), dtype=bool), np.ones(len(self.pipes), dtype=bool))
+        self.realized_rect = None
+        self.overview = False
+        self._culled = False
+
+    def _apply(self, want_nodes:np.ndarray, want_pipes:np.ndarray):
+        scene = self.graph.viewer().scene()
+        for i in np.nonzero(want_nodes != self.node_in_scene)[0].tolist():
+            view = self.nodes[i].view
+            if want_nodes[i]:
+                if view.scene() is None:
+                    scene.addItem(view)
+            elif view.scene() is scene:
+                scene.removeItem(view)
+        for i in np.nonzero(want_pipes != self.pipe_in_scene)[0].tolist():
+            pipe = self.pipes[i]
+            if want_pipes[i]:
+                if pipe.scene() is None:
+                    scene.addItem(pipe)
+            elif pipe.scene() is scene:
+                scene.removeItem(pipe)
+        self.node_in_scene = want_nodes
+        self.pipe_in_scene = want_pipes
+
+    def _build_overview_shapes(self):
+        r = self.index.rects
+        pipes = {}
+        if self.graph.layout_direction() == LayoutDirectionEnum.VERTICAL.value:
+            # bottom center of the output node to top center of the input node.
+            src = np.stack([(r[:, 0] + r[:, 2]) / 2, r[:, 3]], axis=1)[self.pipe_ends[:, 0]]
+            dst = np.stack([(r[:, 0] + r[:, 2]) / 2, r[:, 1]], axis=1)[self.pipe_ends[:, 1]]
+        else:
+            src = np.stack([r[:, 2], (r[:, 1] + r[:, 3]) / 2], axis=1)[self.pipe_ends[:, 0]]
+            dst = np.stack([r[:, 0], (r[:, 1] + r[:, 3]) / 2], axis=1)[self.pipe_ends[:, 1]]
+        for pipe, (x0, y0), (x1, y1) in zip(self.pipes, src.tolist(), dst.tolist()):
+            pipes.setdefault(tuple(pipe.color), []).append(QtCore.QLineF(x0, y0, x1, y1))
+        nodes = {}
+        for node, (x0, y0, x1, y1) in zip(self.nodes, r.tolist()):
+            nodes.setdefault(tuple(node.view.color), []).append(QtCore.QRectF(x0, y0, x1 - x0, y1 - y0))
+        self._overview_shapes = (pipes, nodes)
+
+    def paint_overview(self, painter:QtGui.QPainter, rect:QtCore.QRectF):
+        """
+        Draws the nodes and pipes while no item is realised, see CustomNodeViewer.set_foreground_painter.
+        """
+        if not self.overview:
+            return
+        if self._overview_shapes is None:
+            self._build_overview_shapes()
+        pipes, nodes = self._overview_shapes
+        painter.save()
+        for color, lines in pipes.items():
+            pen = QtGui.QPen(QtGui.QColor(*color), 1.0)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawLines(lines)
+        painter.setPen(QtCore.Qt.NoPen)
+        for color, rects in nodes.items():
+            painter.setBrush(QtGui.QColor(*color))
+            painter.drawRects(rects)
+        painter.restore()
+
+    def bounds(self, nodes:List[NodeObject]=None)->Optional[QtCore.QRectF]:
+        """
+        Returns:
+            QtCore.QRectF: scene rect around nodes or all nodes, None if there is none.
+        """
+        if nodes is None:
+            self._sync()
+            self._refresh_realized()
+            rect = self.index.bounds()
+        else:
+            rects = np.array([node_rect(n) for n in nodes], dtype=np.float64).reshape(-1, 4)
+            rect = None
+            if len(rects) > 0:
+                rect = (rects[:, 0].min(), rects[:, 1].min(), rects[:, 2].max(), rects[:, 3].max())
+        if rect is None:
+            return None
+        x0, y0, x1, y1 = rect
+        return QtCore.QRectF(x0, y0, x1 - x0, y1 - y0)
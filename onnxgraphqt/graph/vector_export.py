@@ -0,0 +1,264 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from PySide2 import QtCore, QtGui
+from NodeGraphQt.constants import PipeEnum
+
+from onnxgraphqt.utils.color import COLOR_BG, NODE_BG_COLOR
+from onnxgraphqt.utils.widgets import GRAPH_FONT_SIZE, PIPE_WIDTH
+
+# empty space around the graph.
+EXPORT_MARGIN = 50.0
+# largest page side PDF viewers accept, in points; larger graphs are scaled down.
+PDF_MAX_PAGE_POINTS = 14400.0
+# same look as CustomNodeItem.
+NODE_RADIUS = 4.0
+NODE_HEADER_HEIGHT = 20.0
+NODE_BORDER_WIDTH = 0.8
+# space between a node and its name.
+LABEL_OFFSET = 10.0
+
+RGBA = Tuple[int, int, int, int]
+
+
+@dataclass
+class NodeShape:
+    x: float
+    y: float
+    width: float
+    height: float
+    color: RGBA
+    border_color: RGBA
+    text_color: RGBA
+    label: str
+    # index of the row of the layout the node is in.
+    layer: int
+
+
+@dataclass
+class PipeShape:
+    # start (output port) and end (input port) points.
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    # distance of the bezier control points from the ends.
+    tangent: float
+    color: RGBA
+    # layer of the node the pipe goes into.
+    layer: int
+
+
+def _port_center(port_item)->Tuple[float, float]:
+    pos = port_item.scenePos()
+    rect = port_item.boundingRect()
+    return pos.x() + rect.width() / 2, pos.y() + rect.height() / 2
+
+
+def graph_shapes(graph)->Tuple[List[NodeShape], List[PipeShape]]:
+    """
+    Node and pipe outlines of graph as laid out, read from the node models
+    and port positions, so items taken out of the scene are included and
+    no viewer has to be shown.
+    Nodes in the same row (same y) share a layer, numbered from the top.
+    """
+    nodes = list(graph.model.nodes.values())
+    rows = sorted(set([round(n.model.pos[1], 1) for n in nodes]))
+    layer_of_row = {y: i for i, y in enumerate(rows)}
+    node_shapes = []
+    layers = {}
+    for n in nodes:
+        x, y = n.model.pos
+        layer = layer_of_row[round(y, 1)]
+        layers[n.id] = layer
+        node_shapes.append(NodeShape(
+            x, y, n.view.width, n.view.height,
+            tuple(n.model.color), tuple(n.model.border_color), tuple(n.model.text_color),
+            n.view.name, layer))
+
+    pipe_color = tuple(PipeEnum.COLOR.value)
+    pipe_shapes = []
+    for n in nodes:
+        height = n.view.height
+        for port in n.output_ports():
+            x0, y0 = _port_center(port.view)
+            for node_id, port_names in port.model.connected_ports.items():
+                target = graph.model.nodes.get(node_id)
+                if target is None:
+                    continue
+                for port_name in port_names:
+                    x1, y1 = _port_center(target.get_input(port_name).view)
+                    tangent = min(abs(y1 - y0), height)
+                    pipe_shapes.append(PipeShape(x0, y0, x1, y1, tangent, pipe_color, layers[node_id]))
+    return node_shapes, pipe_shapes
+
+
+def shapes_bounds(nodes:List[NodeShape], pipes:List[PipeShape], margin:float=EXPORT_MARGIN)->QtCore.QRectF:
+    """
+    Scene rect holding every shape and the node labels, grown by margin.
+    """
+    if not nodes:
+        return QtCore.QRectF()
+    font = QtGui.QFont()
+    font.setPixelSize(GRAPH_FONT_SIZE)
+    metrics = QtGui.QFontMetricsF(font)
+    x0 = min([n.x for n in nodes])
+    y0 = min([n.y for n in nodes])
+    x1 = max([n.x + n.width + LABEL_OFFSET + metrics.horizontalAdvance(n.label) for n in nodes])
+    y1 = max([n.y + n.height for n in nodes])
+    for p in pipes:
+        x0 = min(x0, p.x0, p.x1)
+        x1 = max(x1, p.x0, p.x1)
+    return QtCore.QRectF(x0 - margin, y0 - margin, x1 - x0 + 2 * margin, y1 - y0 + 2 * margin)
+
+
+def _hex(rgba:RGBA)->str:
+    return "#{:02x}{:02x}{:02x}".format(*rgba[:3])
+
+
+def _opacity(rgba:RGBA)->str:
+    # only written for translucent colors.
+    if len(rgba) < 4 or rgba[3] >= 255:
+        return ""
+    return f' opacity="{rgba[3] / 255:.2f}"'
+
+
+def _num(v:float)->str:
+    # one decimal is below what any viewer shows, and keeps the file small.
+    return f"{v:.1f}".rstrip("0").rstrip(".")
+
+
+def export_svg(graph, file_path:str, group_layers=True, progress:Callable[[int, int, str], None]=None):
+    """
+    Writes graph as SVG, one element at a time.
+
+    Shared styles go into CSS classes, so a node is three short elements and
+    a pipe one path. With group_layers each row of the layout is its own
+    <g id="layer-N">, which lets browsers skip whole rows outside the view.
+
+    Args:
+        graph (ONNXNodeGraph): graph to export.
+        file_path (str): output path.
+        group_layers (bool): group the elements by layout row.
+        progress (Callable[[int, int, str], None]): progress(done, total, text),
+            called with the number of layers written.
+    """
+    nodes, pipes = graph_shapes(graph)
+    rect = shapes_bounds(nodes, pipes)
+    by_layer: Dict[int, Tuple[List[NodeShape], List[PipeShape]]] = {}
+    for n in nodes:
+        by_layer.setdefault(n.layer if group_layers else 0, ([], []))[0].append(n)
+    for p in pipes:
+        by_layer.setdefault(p.layer if group_layers else 0, ([], []))[1].append(p)
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{_num(rect.width())}" height="{_num(rect.height())}" '
+                f'viewBox="{_num(rect.x())} {_num(rect.y())} {_num(rect.width())} {_num(rect.height())}">\n')
+        f.write("<style>"
+                f".p{{fill:none;stroke-width:{_num(PIPE_WIDTH)};stroke-linecap:round}}"
+                f".b{{fill:{_hex(NODE_BG_COLOR)};stroke-width:{_num(NODE_BORDER_WIDTH)}}}"
+                f".l{{font-family:sans-serif;font-size:{GRAPH_FONT_SIZE}px;dominant-baseline:middle}}"
+                "</style>\n")
+        f.write(f'<rect x="{_num(rect.x())}" y="{_num(rect.y())}" width="{_num(rect.width())}" '
+                f'height="{_num(rect.height())}" fill="{_hex(COLOR_BG)}"/>\n')
+        for i, layer in enumerate(sorted(by_layer.keys())):
+            layer_nodes, layer_pipes = by_layer[layer]
+            f.write(f'<g id="layer-{layer}">\n' if group_layers else "<g>\n")
+            # pipes under the nodes, as in the scene.
+            colors: Dict[RGBA, List[PipeShape]] = {}
+            for p in layer_pipes:
+                colors.setdefault(p.color, []).append(p)
+            for color, color_pipes in colors.items():
+                f.write(f'<g class="p" stroke="{_hex(color)}"{_opacity(color)}>')
+                for p in color_pipes:
+                    f.write(f'<path d="M{_num(p.x0)} {_num(p.y0)}C{_num(p.x0)} {_num(p.y0 + p.tangent)} '
+                            f'{_num(p.x1)} {_num(p.y1 - p.tangent)} {_num(p.x1)} {_num(p.y1)}"/>')
+                f.write("</g>\n")
+            for n in layer_nodes:
+                x, y, w, h = n.x + 1, n.y + 1, n.width - 2, n.height - 2
+                f.write(f'<rect class="b" x="{_num(x)}" y="{_num(y)}" width="{_num(w)}" height="{_num(h)}" '
+                        f'rx="{_num(NODE_RADIUS)}" stroke="{_hex(n.border_color)}"/>'
+                        f'<rect x="{_num(x + 1)}" y="{_num(y + 1)}" width="{_num(w - 2)}" height="{_num(NODE_HEADER_HEIGHT)}" '
+                        f'rx="{_num(NODE_RADIUS)}" fill="{_hex(n.color)}"/>')
+                if n.label:
+                    f.write(f'<text class="l" x="{_num(n.x + n.width + LABEL_OFFSET)}" y="{_num(n.y + n.height / 2)}" '
+                            f'fill="{_hex(n.text_color)}">{escape(n.label)}</text>')
+                f.write("\n")
+            f.write("</g>\n")
+            if progress is not None:
+                progress(i + 1, len(by_layer), "writing svg...")
+        f.write("</svg>\n")
+
+
+def export_pdf(graph, file_path:str, progress:Callable[[int, int, str], None]=None):
+    """
+    Writes graph as a single page PDF, drawing the shapes with a QPainter
+    on a QPdfWriter, which streams them to the file.
+
+    One scene unit is one point; graphs larger than PDF_MAX_PAGE_POINTS
+    are scaled down to fit.
+
+    Args:
+        graph (ONNXNodeGraph): graph to export.
+        file_path (str): output path.
+        progress (Callable[[int, int, str], None]): progress(done, total, text),
+            called with the number of shapes drawn.
+    """
+    nodes, pipes = graph_shapes(graph)
+    rect = shapes_bounds(nodes, pipes)
+    if rect.isEmpty():
+        return
+    scale = min(1.0, PDF_MAX_PAGE_POINTS / max(rect.width(), rect.height()))
+
+    writer = QtGui.QPdfWriter(file_path)
+    writer.setResolution(72)
+    page_size = QtGui.QPageSize(QtCore.QSizeF(rect.width() * scale, rect.height() * scale),
+                                QtGui.QPageSize.Point, "graph", QtGui.QPageSize.ExactMatch)
+    writer.setPageLayout(QtGui.QPageLayout(page_size, QtGui.QPageLayout.Portrait, QtCore.QMarginsF(0, 0, 0, 0)))
+    painter = QtGui.QPainter(writer)
+    try:
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        painter.scale(scale, scale)
+        painter.translate(-rect.x(), -rect.y())
+        painter.fillRect(rect, QtGui.QColor(*COLOR_BG))
+        total = len(pipes) + len(nodes)
+
+        painter.setBrush(QtCore.Qt.NoBrush)
+        pens = {}
+        for i, p in enumerate(pipes):
+            pen = pens.get(p.color)
+            if pen is None:
+                pen = pens[p.color] = QtGui.QPen(QtGui.QColor(*p.color), PIPE_WIDTH)
+                pen.setCapStyle(QtCore.Qt.RoundCap)
+            painter.setPen(pen)
+            path = QtGui.QPainterPath(QtCore.QPointF(p.x0, p.y0))
+            path.cubicTo(p.x0, p.y0 + p.tangent, p.x1, p.y1 - p.tangent, p.x1, p.y1)
+            painter.drawPath(path)
+            if progress is not None and i % 1000 == 0:
+                progress(i, total, "writing pdf...")
+
+        font = QtGui.QFont()
+        font.setPixelSize(GRAPH_FONT_SIZE)
+        painter.setFont(font)
+        bg = QtGui.QColor(*NODE_BG_COLOR)
+        for i, n in enumerate(nodes):
+            body = QtCore.QRectF(n.x + 1, n.y + 1, n.width - 2, n.height - 2)
+            painter.setPen(QtCore.Qt.NoPen)
+            painter.setBrush(bg)
+            painter.drawRoundedRect(body, NODE_RADIUS, NODE_RADIUS)
+            painter.setBrush(QtGui.QColor(*n.color))
+            painter.drawRoundedRect(QtCore.QRectF(body.x() + 1, body.y() + 1, body.width() - 2, NODE_HEADER_HEIGHT),
+                                    NODE_RADIUS, NODE_RADIUS)
+            painter.setBrush(QtCore.Qt.NoBrush)
+            painter.setPen(QtGui.QPen(QtGui.QColor(*n.border_color), NODE_BORDER_WIDTH))
+            painter.drawRoundedRect(body, NODE_RADIUS, NODE_RADIUS)
+            if n.label:
+                painter.setPen(QtGui.QColor(*n.text_color))
+                label_rect = QtCore.QRectF(n.x + n.width + LABEL_OFFSET, n.y, PDF_MAX_PAGE_POINTS, n.height)
+                painter.drawText(label_rect, QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, n.label)
+            if progress is not None and (len(pipes) + i) % 1000 == 0:
+                progress(len(pipes) + i, total, "writing pdf...")
+    finally:
+        painter.end()
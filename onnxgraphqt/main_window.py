@@ -1,30 +1,19 @@
-import sys, os, io
+import sys, os
 import time
+import concurrent.futures
 import signal
+import threading
+from typing import Callable
 
 from PySide2 import QtCore, QtWidgets, QtGui
 import onnx
 import onnx_graphsurgeon as gs
 
 from NodeGraphQt.widgets.node_graph import NodeGraphWidget
-from snc4onnx import combine as onnx_tools_combine
-from sne4onnx import extraction as onnx_tools_extraction
-from snd4onnx import remove as onnx_tools_deletion
-from scs4onnx import shrinking as onnx_tools_shrinking
-from sog4onnx import generate as onnx_tools_generate
-from sam4onnx import modify as onnx_tools_modify
-from soc4onnx import change as onnx_tools_op_change
-from scc4onnx import order_conversion as onnx_tools_order_conversion
-from sna4onnx import add as onnx_tools_add
-from sbi4onnx import initialize as onnx_tools_batchsize_initialize
-from sor4onnx import rename as onnx_tools_rename
-from onnx2json.onnx2json import convert as onnx_tools_onnx2json
-from json2onnx.json2onnx import convert as onnx_tools_json2onnx
-from ssc4onnx import structure_check
-from sio4onnx import io_change as onnx_tools_io_change
 
 from onnxgraphqt.widgets.widgets_menubar import MenuBarWidget, Menu, Separator, SubMenu
 from onnxgraphqt.widgets.widgets_message_box import MessageBox
+from onnxgraphqt.widgets.widgets_progress import ProgressDialog
 from onnxgraphqt.widgets.splash_screen import create_screen
 from onnxgraphqt.widgets.widgets_combine_network import CombineNetworkWidgets
 from onnxgraphqt.widgets.widgets_extract_network import ExtractNetworkWidgets
@@ -39,16 +28,27 @@ from onnxgraphqt.widgets.widgets_initialize_batchsize import InitializeBatchsize
 from onnxgraphqt.widgets.widgets_rename_op import RenameOpWidget
 from onnxgraphqt.widgets.widgets_node_search import NodeSearchWidget
 from onnxgraphqt.widgets.widgets_inference_test import InferenceTestWidgets
+from onnxgraphqt.widgets.widgets_subgraph import SubgraphWidgets
 from onnxgraphqt.widgets.widgets_change_input_ouput_shape import ChangeInputOutputShapeWidget
+from onnxgraphqt.widgets.widgets_profiler import ProfilerWidget
 
 from onnxgraphqt.widgets.custom_properties_bin import CustomPropertiesBinWidget
 
 from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph
+from onnxgraphqt.graph.onnx_lazy_loader import import_onnx_lazy
 from onnxgraphqt.utils.opset import DEFAULT_OPSET
-from onnxgraphqt.utils.color import remove_PrintColor
+from onnxgraphqt.utils.job_runner import Job, JobRunner, JobCancelled
+from onnxgraphqt.utils.tool_service import ToolService, ToolResult, get_tool, warm_up_tools
+from onnxgraphqt.utils.profiler import profiler
+from onnxgraphqt.utils.timing import startup_timer
 from onnxgraphqt.utils.widgets import BASE_FONT_SIZE, LARGE_FONT_SIZE, set_font, createIconButton
 
 
+# tools called in this process, imported in the background once the window is shown.
+# the other tools only run in the ToolService workers.
+WARM_UP_TOOLS = ["json2onnx", "onnx2json"]
+
+
 class MainWindow(QtWidgets.QMainWindow):
     _default_window_width = 1200
     _default_window_height = 800
@@ -58,21 +58,39 @@ class MainWindow(QtWidgets.QMainWindow):
         super(MainWindow, self).__init__(parent)
 
         self.graph: ONNXNodeGraph = None
+        self.job_runner = JobRunner(self)
+        # workers are started after the first paint.
+        self.tool_service = ToolService()
         self.load_graph()
         self.graph_widget: NodeGraphWidget = self.graph.widget
+        self.graph.subgraph_requested.connect(self.open_subgraph)
 
         self.properties_bin: CustomPropertiesBinWidget = None
         self.init_ui()
-
-        ext = os.path.splitext(onnx_model_path)[-1]
-
-        if ext == ".onnx":
-            self.load_graph(onnx_model_path=onnx_model_path, clear_undo_stack=True, push_undo=False)
-        elif ext == ".json":
-            onnx_graph = onnx_tools_json2onnx(input_json_path=onnx_model_path)
-            self.load_graph(onnx_model=onnx_graph, clear_undo_stack=True, push_undo=False)
-
-        self.update_graph()
+        startup_timer.mark("window created")
+
+        # the window is shown with an empty canvas, the model is loaded after the first paint.
+        self._startup_model_path = onnx_model_path
+        self._first_paint = False
+        self.graph.viewer().viewport().installEventFilter(self)
+
+    def eventFilter(self, obj:QtCore.QObject, event:QtCore.QEvent)->bool:
+        if event.type() == QtCore.QEvent.Paint and not self._first_paint:
+            self._first_paint = True
+            startup_timer.mark("first paint")
+            obj.removeEventFilter(self)
+            QtCore.QTimer.singleShot(0, self._finish_startup)
+        return super().eventFilter(obj, event)
+
+    def _finish_startup(self):
+        threading.Thread(target=self.tool_service.warm_up, name="tool_service_warm_up", daemon=True).start()
+        warm_up_tools(WARM_UP_TOOLS)
+        if self._startup_model_path:
+            self.open_onnx(self._startup_model_path)
+        else:
+            self.update_graph()
+        startup_timer.mark("ready")
+        print(startup_timer.report())
 
     def init_ui(self):
         # Window size
@@ -100,6 +118,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 [
                     SubMenu("&Search", self.btnSearch_clicked, None),
                     SubMenu("Auto &Layout", self.btnAutoLayout_clicked, None),
+                    SubMenu("&Profiler", self.btnProfiler_clicked, None),
                 ]
             ),
             Menu(
@@ -116,6 +135,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setMenuBar(self.menu_bar)
         # Search Widget
         self.search_widget = NodeSearchWidget(self.graph, parent=self)
+        # Profiler, docked on first use
+        self.profiler_widget: ProfilerWidget = None
 
         # Main Layout
         # Fixed side menu size.
@@ -223,13 +244,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self.layout_main_properties.addSpacerItem(QtWidgets.QSpacerItem(self._sidemenu_width, 10))
         self.layout_main_properties.addLayout(layout_operator_btn)
 
-    def update_graph(self, update_layout=True):
+    @profiler.profile("update_graph")
+    def update_graph(self, update_layout=True, relayout=True):
 
         t0 = time.time()
         self.set_cursor_busy()
 
         self.graph.update_pipe_paint()
-        self.graph.auto_layout(push_undo=False)
+        if relayout:
+            self.graph.auto_layout(push_undo=False)
+            startup_timer.mark("layout done")
 
         if update_layout:
             self.graph.reset_selection()
@@ -245,16 +269,101 @@ class MainWindow(QtWidgets.QMainWindow):
             self.properties_bin.hide()
             self.layout_node_properties.removeWidget(self.properties_bin)
             del self.properties_bin
-        self.properties_bin = self.create_properties_bin(self.graph)
-        self.layout_node_properties.addWidget(self.properties_bin)
+        with profiler.span("create_properties_bin"):
+            self.properties_bin = self.create_properties_bin(self.graph)
+            self.layout_node_properties.addWidget(self.properties_bin)
 
         self.set_sidemenu_buttons_enabled(True)
-        self.search_widget.update(self.graph)
+        with profiler.span("NodeSearchWidget.update"):
+            self.search_widget.update(self.graph)
 
         self.set_cursor_arrow()
         dt0 = time.time() - t0
         print(f"update graph: {dt0}s")
 
+    def run_job(self, title:str, func:Callable, *args, cancellable=True, **kwargs):
+        """
+        Runs func(job, *args, **kwargs) on the job runner and returns its result.
+
+        A progress dialog follows job.progress() and the GUI keeps processing
+        events while waiting. The graph, side menu, menu bar and search take
+        no input until func returns, so func may read the scene (e.g. to_onnx)
+        but must not change it.
+
+        Raises:
+            JobCancelled: the dialog was cancelled.
+        """
+        # the dialog is shown after a delay and does not block input before that.
+        blocked = [w for w in [self.menuBar(), self.centralWidget(), getattr(self, "search_widget", None)]
+                   if w is not None and w.isEnabled()]
+        for w in blocked:
+            w.setEnabled(False)
+        accept_drops = self.acceptDrops()
+        self.setAcceptDrops(False)
+        dialog = ProgressDialog(title, cancellable=cancellable, parent=self)
+        job = self.job_runner.submit(func, *args, **kwargs)
+        job.signals.progress.connect(dialog.set_progress)
+        dialog.canceled.connect(job.cancel)
+        try:
+            return self.job_runner.wait(job, dialog.canceled)
+        finally:
+            dialog.close()
+            dialog.deleteLater()
+            for w in blocked:
+                w.setEnabled(True)
+            self.setAcceptDrops(accept_drops)
+
+    def run_onnx_tool(self, msg_title:str, tool:str, convert_graph=True, **kwargs)->onnx.ModelProto:
+        """
+        Runs tool(**kwargs) on the tool service and shows its output.
+        With convert_graph, the current graph is converted on the job runner
+        and passed as onnx_graph.
+
+        Returns:
+            onnx.ModelProto: the tool output, None if the tool failed or was cancelled.
+        """
+        def run(job:Job)->ToolResult:
+            if convert_graph:
+                kwargs["onnx_graph"] = self.graph.to_onnx(non_verbose=True, progress=job.progress)
+            job.progress(0, 0, f"{msg_title}...")
+            with profiler.span(f"run {tool}", tool=tool):
+                future = self.tool_service.submit(tool, **kwargs)
+                try:
+                    while True:
+                        try:
+                            return future.result(timeout=0.1)
+                        except concurrent.futures.TimeoutError:
+                            job.progress(0, 0)
+                except JobCancelled:
+                    future.cancel()
+                    raise
+
+        try:
+            result = self.run_job(msg_title, run)
+        except JobCancelled:
+            return None
+        except BaseException as e:
+            result = ToolResult(error=str(e))
+
+        for record in result.logs:
+            print(record)
+        if not result.ok:
+            if result.error:
+                print(result.traceback or result.error)
+            MessageBox.error(
+                (result.text() or result.error or "no output model.")[:1000],
+                msg_title,
+                parent=self)
+            return None
+
+        warnings = result.text(min_level="WARNING")
+        if warnings:
+            MessageBox.warn(
+                warnings[:1000],
+                msg_title,
+                parent=self)
+        return result.model
+
     def set_cursor_busy(self):
         cursor = self.cursor()
         cursor.setShape(QtCore.Qt.BusyCursor)
@@ -322,7 +431,12 @@ class MainWindow(QtWidgets.QMainWindow):
         if current_button:
             current_button.setEnabled(True)
 
-    def load_graph(self, onnx_model:onnx.ModelProto=None, onnx_model_path:str=None, model_name:str=None, clear_undo_stack=False, push_undo=False):
+    @profiler.profile("load_graph")
+    def load_graph(self, onnx_model:onnx.ModelProto=None, onnx_model_path:str=None, model_name:str=None, clear_undo_stack=False, push_undo=False, patch=False)->bool:
+        """
+        Returns True when patch is set and the current nodes were patched
+        instead of rebuilt, in which case the layout does not need updating.
+        """
 
         t0 = time.time()
         self.set_cursor_busy()
@@ -337,14 +451,34 @@ class MainWindow(QtWidgets.QMainWindow):
                                            producer_version=0,
                                            ir_version=8,
                                            model_version=0)
-            return
+            return False
 
-        onnx_graph = None
-        if onnx_model:
-            onnx_graph = gs.import_onnx(onnx_model)
-        elif onnx_model_path:
-            onnx_model = onnx.load(onnx_model_path)
-            onnx_graph = gs.import_onnx(onnx_model)
+        def parse(job:Job, onnx_model:onnx.ModelProto):
+            job.progress(0, 0, "parsing model...")
+            if onnx_model:
+                with profiler.span("gs.import_onnx"):
+                    onnx_graph = gs.import_onnx(onnx_model)
+            else:
+                # large initializers and external data stay on disk (memory-mapped).
+                onnx_model, onnx_graph = import_onnx_lazy(onnx_model_path)
+            diff = None
+            if patch and self.graph is not None and self.graph.node_count() > 0:
+                job.progress(0, 0, "comparing graphs...")
+                diff = self.graph.diff_onnx_graph(onnx_graph)
+            return onnx_model, onnx_graph, diff
+
+        title = f"Loading {os.path.basename(onnx_model_path)}" if onnx_model_path else "Loading"
+        try:
+            # an in-memory model is the result of an edit, which is applied as a whole.
+            onnx_model, onnx_graph, diff = self.run_job(title, parse, onnx_model,
+                                                        cancellable=onnx_model is None)
+        except JobCancelled:
+            self.set_cursor_arrow()
+            print("load graph: cancelled")
+            if self.graph is None:
+                return self.load_graph()
+            return False
+        startup_timer.mark("model parsed")
 
         if model_name is None:
             if onnx_model_path:
@@ -376,17 +510,27 @@ class MainWindow(QtWidgets.QMainWindow):
         if clear_undo_stack:
             self.graph.clear_undo_stack()
 
-        self.graph.remove_all_nodes(push_undo=push_undo)
-        self.graph.load_onnx_graph(onnx_graph, push_undo=push_undo)
-
-        if onnx_model_path:
-            op_num, model_size = structure_check(onnx_graph=onnx_model)
-            print(op_num)
-            print(f"{model_size} bytes")
+        # apply only what the edit changed, rebuild when that is most of the graph.
+        patched = patch and self.graph.patch_onnx_graph(onnx_graph, push_undo=push_undo, diff=diff)
+        if not patched:
+            # the scene is built here on the GUI thread. the view is not
+            # repainted until it is complete, only the progress dialog is.
+            dialog = ProgressDialog(title, cancellable=False, parent=self)
+            viewer = self.graph.viewer()
+            viewer.setUpdatesEnabled(False)
+            try:
+                self.graph.remove_all_nodes(push_undo=push_undo)
+                self.graph.load_onnx_graph(onnx_graph, push_undo=push_undo, progress=dialog.step)
+            finally:
+                viewer.setUpdatesEnabled(True)
+                dialog.close()
+                dialog.deleteLater()
+        startup_timer.mark("graph built")
 
         self.set_cursor_arrow()
         dt0 = time.time() - t0
         print(f"load graph: {dt0}s")
+        return patched
 
     def create_properties_bin(self, graph: ONNXNodeGraph):
         properties_bin = CustomPropertiesBinWidget(node_graph=graph)
@@ -402,7 +546,11 @@ class MainWindow(QtWidgets.QMainWindow):
             self.load_graph(onnx_model_path=file_name, model_name=model_name, clear_undo_stack=True, push_undo=False)
             self.update_graph()
         elif ext == ".json":
-            onnx_graph = onnx_tools_json2onnx(input_json_path=file_name)
+            try:
+                onnx_graph = self.run_job(f"Loading {model_name}",
+                                          lambda job: get_tool("json2onnx")(input_json_path=file_name))
+            except JobCancelled:
+                return
             self.load_graph(onnx_model=onnx_graph, model_name=model_name, clear_undo_stack=True, push_undo=False)
             self.update_graph()
         else:
@@ -459,6 +607,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self.set_sidemenu_buttons_enabled(True)
             return
         ext = os.path.splitext(file_name)[-1]
+        export = None
         if filter == "*.onnx":
             if ext != ".onnx":
                 file_name += ".onnx"
@@ -467,13 +616,23 @@ class MainWindow(QtWidgets.QMainWindow):
                     if ret == MessageBox.No:
                         self.set_sidemenu_buttons_enabled(True)
                         return
-            self.graph.export(file_name)
+            export = lambda job: self.graph.export(file_name, progress=job.progress)
         elif filter == "*.json":
             if ext != ".json":
                 file_name += ".json"
-            onnx_tools_onnx2json(onnx_graph=self.graph.to_onnx(),
-                                 output_json_path=file_name,
-                                 json_indent=2)
+            export = lambda job: get_tool("onnx2json")(onnx_graph=self.graph.to_onnx(progress=job.progress),
+                                                       output_json_path=file_name,
+                                                       json_indent=2)
+        try:
+            if export is not None:
+                self.run_job("Export ONNX", export)
+        except JobCancelled:
+            self.set_sidemenu_buttons_enabled(True)
+            return
+        except BaseException as e:
+            MessageBox.error(str(e), "Export ONNX", parent=self)
+            self.set_sidemenu_buttons_enabled(True)
+            return
         print(f"Export: {file_name}.")
         MessageBox.info(
             ["Success.", f"Export to {file_name}."],
@@ -488,7 +647,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self,
             caption="Export Graph Image",
             directory=os.path.abspath(os.curdir),
-            filter="*.png")
+            filter="*.png;;*.svg;;*.pdf")
         dialog.setAcceptMode(QtWidgets.QFileDialog.AcceptMode.AcceptSave)
         dialog.selectFile(default_file_name)
         ret = dialog.exec_()
@@ -499,7 +658,19 @@ class MainWindow(QtWidgets.QMainWindow):
         if not file_name:
             self.set_sidemenu_buttons_enabled(True)
             return
-        self.graph.export_to_png(file_name)
+        # drawn on the GUI thread.
+        progress = ProgressDialog("Export Image", cancellable=False, parent=self)
+        self.set_cursor_busy()
+        ext = os.path.splitext(file_name)[1].lower()
+        if ext == ".svg":
+            self.graph.export_to_svg(file_name, progress=progress.step)
+        elif ext == ".pdf":
+            self.graph.export_to_pdf(file_name, progress=progress.step)
+        else:
+            self.graph.export_to_png(file_name, progress=progress.step)
+        self.set_cursor_arrow()
+        progress.close()
+        progress.deleteLater()
         MessageBox.info(
             ["Success.", f"Export to {file_name}."],
             "Export PNG",
@@ -518,6 +689,19 @@ class MainWindow(QtWidgets.QMainWindow):
     def btnSearch_clicked(self):
         self.search_widget.show()
 
+    def btnProfiler_clicked(self):
+        if self.profiler_widget is None:
+            self.profiler_widget = ProfilerWidget(parent=self)
+            self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.profiler_widget)
+        self.profiler_widget.show()
+        self.profiler_widget.raise_()
+
+    def open_subgraph(self, node, key:str):
+        self.set_cursor_busy()
+        w = SubgraphWidgets(self.graph, node, key, parent=self)
+        self.set_cursor_arrow()
+        w.show()
+
     def btnInferenceTest_clicked(self):
         w = InferenceTestWidgets(self.graph.to_onnx(), parent=self)
         w.show()
@@ -536,64 +720,20 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    onnx_graphs = []
-                    if props.combine_with_current_graph:
-                        onnx_graphs.append(onnx_graph)
-                    for onnx_file in props.input_onnx_file_paths:
-                        graph = onnx.load(onnx_file)
-                        onnx_graphs.append(graph)
-
-                    exception = None
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_combine(
-                            srcop_destop=props.srcop_destop,
-                            op_prefixes_after_merging=props.op_prefixes_after_merging,
-                            input_onnx_file_paths=[],
-                            onnx_graphs=onnx_graphs,
-                            output_of_onnx_file_in_the_process_of_fusion=props.output_of_onnx_file_in_the_process_of_fusion,
-                            non_verbose=False,
-                        )
-                    except BaseException as e:
-                        exception = e
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "combine",
+                    convert_graph=props.combine_with_current_graph,
+                    srcop_destop=props.srcop_destop,
+                    op_prefixes_after_merging=props.op_prefixes_after_merging,
+                    input_onnx_file_paths=props.input_onnx_file_paths,
+                    output_of_onnx_file_in_the_process_of_fusion=props.output_of_onnx_file_in_the_process_of_fusion,
+                    non_verbose=False,
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.load_graph(onnx_model=onnx_model, model_name=model_name)
                 self.update_graph(update_layout=True)
@@ -622,54 +762,16 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_extraction(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict(),
-                        )
-                    except BaseException as e:
-                        exception = e
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "extraction",
+                    non_verbose=False,
+                    **props._asdict(),
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.load_graph(onnx_model=onnx_model, model_name=model_name)
                 self.update_graph(update_layout=True)
@@ -699,58 +801,20 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_deletion(
-                            onnx_graph=onnx_graph,
-                            **props._asdict(),
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "deletion",
+                    **props._asdict(),
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -776,59 +840,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model, _ = onnx_tools_shrinking(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "shrinking",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -854,49 +880,17 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    f = io.StringIO()
-                    sys.stdout = f
-                    onnx_model:onnx.ModelProto = onnx_tools_generate(
-                        non_verbose=False,
-                        **props._asdict()
-                    )
-                except BaseException as e:
-                    onnx_tool_error = True
-                    exception = e
-                    pass
-                finally:
-                    sys.stdout = sys.__stdout__
-                    print_msg = f.getvalue()
-                    print(print_msg)
-                    print_msg = remove_PrintColor(print_msg)
-                    print_msg = print_msg[:1000]
-                    f.close()
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "generate",
+                    convert_graph=False,
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
                 self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
@@ -931,59 +925,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_modify(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "modify",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1010,68 +966,30 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    new_opset = int(props.opset)
-                    if old_opset == new_opset:
-                        MessageBox.warn(
-                            f"opset num is same. not change.",
-                            msg_title,
-                            parent=self)
-                        self.set_sidemenu_buttons_enabled(True)
-                        continue
-
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_op_change(
-                            opset=new_opset,
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
-                    continue
-
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
+                new_opset = int(props.opset)
+                if old_opset == new_opset:
                     MessageBox.warn(
-                        print_msg,
+                        f"opset num is same. not change.",
                         msg_title,
                         parent=self)
+                    self.set_sidemenu_buttons_enabled(True)
+                    continue
+
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "op_change",
+                    opset=new_opset,
+                    non_verbose=False,
+                )
+                if onnx_model is None:
+                    continue
 
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"Change opset {old_opset} to {new_opset}.",
                     msg_title,
@@ -1097,59 +1015,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = e
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_order_conversion(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "order_conversion",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1176,59 +1056,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    f = io.StringIO()
-                    sys.stdout = f
-                    try:
-                        onnx_model:onnx.ModelProto = onnx_tools_add(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict(),
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "add",
+                    non_verbose=False,
+                    **props._asdict(),
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1261,59 +1103,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_batchsize_initialize(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "batchsize_initialize",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1340,59 +1144,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props, _ = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_io_change(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "io_change",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1418,59 +1184,21 @@ class MainWindow(QtWidgets.QMainWindow):
         while True:
             self.current_widgets.show()
             if self.current_widgets.exec_():
-                onnx_tool_error = False
-                print_msg = ""
-
-                exception = None
                 props = self.current_widgets.get_properties()
-                try:
-                    onnx_graph=self.graph.to_onnx(non_verbose=True)
-                    try:
-                        f = io.StringIO()
-                        sys.stdout = f
-                        onnx_model:onnx.ModelProto = onnx_tools_rename(
-                            onnx_graph=onnx_graph,
-                            non_verbose=False,
-                            **props._asdict()
-                        )
-                    except BaseException as e:
-                        onnx_tool_error = True
-                        raise e
-                    finally:
-                        sys.stdout = sys.__stdout__
-                        print_msg = f.getvalue()
-                        print(print_msg)
-                        print_msg = remove_PrintColor(print_msg)
-                        print_msg = print_msg[:1000]
-                        f.close()
-                except BaseException as e:
-                    exception = e
-                    print(e)
-
-                if onnx_tool_error:
-                    if print_msg:
-                        MessageBox.error(
-                            print_msg,
-                            msg_title,
-                            parent=self)
-                    else:
-                        MessageBox.error(
-                            str(exception),
-                            msg_title,
-                            parent=self)
+                onnx_model = self.run_onnx_tool(
+                    msg_title,
+                    "rename",
+                    non_verbose=False,
+                    **props._asdict()
+                )
+                if onnx_model is None:
                     continue
 
-                if print_msg.strip() and print_msg != "INFO: Finish!\n":
-                    MessageBox.warn(
-                        print_msg,
-                        msg_title,
-                        parent=self)
-
                 model_name = self.windowTitle()
                 self.graph.begin_undo(msg_title)
-                self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True)
+                patched = self.load_graph(onnx_model=onnx_model, model_name=model_name, clear_undo_stack=False, push_undo=True, patch=True)
                 self.graph.end_undo()
-                self.update_graph(update_layout=False)
+                self.update_graph(update_layout=False, relayout=not patched)
                 MessageBox.info(
                     f"complete.",
                     msg_title,
@@ -1482,6 +1210,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self.set_sidemenu_buttons_enabled(True)
         self.set_font_bold(btn, False)
 
+    def closeEvent(self, event:QtGui.QCloseEvent):
+        self.job_runner.shutdown()
+        self.tool_service.shutdown(wait=False)
+        # profiles of the whole session, see main().
+        if os.environ.get("ONNXGRAPHQT_CPROFILE"):
+            profiler.stop_cprofile(os.environ["ONNXGRAPHQT_CPROFILE"])
+        if os.environ.get("ONNXGRAPHQT_TRACE"):
+            profiler.export_chrome_trace(os.environ["ONNXGRAPHQT_TRACE"])
+        super().closeEvent(event)
+
     def exit(self):
         self.close()
         sys.exit(0)
@@ -1489,39 +1227,21 @@ class MainWindow(QtWidgets.QMainWindow):
 
 def main():
     args = sys.argv
+    if len(args) > 1 and args[1] == "batch":
+        from onnxgraphqt.batch import main as batch_main
+        sys.exit(batch_main(args[2:]))
     onnx_model_path = args[1] if len(args)>1 else ""
+    startup_timer.mark("imports done")
+    if os.environ.get("ONNXGRAPHQT_CPROFILE"):
+        profiler.start_cprofile()
 
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling)
     app = QtWidgets.QApplication([])
+    startup_timer.mark("app created")
 
-    splash = create_screen()
-    splash.show()
-    time.sleep(0.05)
-    msg = ""
-    msg_align = QtCore.Qt.AlignBottom
-    msg_color = QtGui.QColor.fromRgb(255, 255, 255)
-    if onnx_model_path:
-        msg = f"loading [{os.path.basename(onnx_model_path)}]"
-    else:
-        msg = "loading..."
-    splash.showMessage(msg, alignment=msg_align, color=msg_color)
-    print(msg)
-    if not onnx_model_path:
-        time.sleep(1.0)
-
-    app.processEvents()
-
+    # shown right away, the model streams in behind a progress dialog.
     main_window = MainWindow(onnx_model_path=onnx_model_path)
-
-    msg = "load complete."
-    splash.showMessage(msg, alignment=msg_align, color=msg_color)
-    print(msg)
-    time.sleep(0.1)
-
-    app.processEvents()
-
-    splash.finish(main_window)
     main_window.show()
 
     app.exec_()
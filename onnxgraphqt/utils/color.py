@@ -15,6 +15,7 @@ COLOR_FONT = COLOR_BLACK
 COLOR_GRID = COLOR_GRAY
 INPUT_NODE_COLOR = COLOR_LIGHTGRAY
 OUTPUT_NODE_COLOR = COLOR_LIGHTGRAY
+GROUP_NODE_COLOR = COLOR_BROWN
 DEFAULT_COLOR = COLOR_GRAY
 
 NODE_BG_COLOR = COLOR_WHITE
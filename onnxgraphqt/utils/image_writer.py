@@ -0,0 +1,90 @@
+import struct
+import zlib
+
+import numpy as np
+
+
+# compressed bytes collected before an IDAT chunk is written.
+PNG_CHUNK_SIZE = 1024 * 1024
+
+
+class PNGStreamWriter:
+    """
+    Writes an 8 bit RGB or RGBA PNG row by row.
+
+    Rows go through one zlib stream and out in IDAT chunks as they are
+    compressed, so only the rows of one write_rows() call are in memory,
+    whatever the size of the image.
+
+    Example:
+        with PNGStreamWriter("graph.png", width, height) as writer:
+            for band in bands:
+                writer.write_rows(band)  # (rows, width, 3) uint8
+    """
+
+    def __init__(self, path:str, width:int, height:int, channels:int=3, compress_level:int=6):
+        if channels not in (3, 4):
+            raise ValueError(f"channels must be 3 or 4, got {channels}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        color_type = 2 if channels == 3 else 6
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def _write_chunk(self, tag:bytes, data:bytes):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+
+    def _add_compressed(self, data:bytes, flush=False):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= PNG_CHUNK_SIZE or (flush and self._pending_size > 0):
+            self._write_chunk(b"IDAT", b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_rows(self, rows:np.ndarray):
+        """
+        Args:
+            rows (np.ndarray): (num_rows, width, channels) uint8 pixels, top to bottom.
+        """
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.ndim != 3 or rows.shape[1:] != (self.width, self.channels):
+            raise ValueError(f"expected (rows, {self.width}, {self.channels}), got {rows.shape}")
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("more rows than the image height")
+        # filter type 0 (none) in front of each scanline.
+        lines = np.zeros((len(rows), 1 + self.width * self.channels), dtype=np.uint8)
+        lines[:, 1:] = rows.reshape(len(rows), -1)
+        self._add_compressed(self._compressor.compress(lines.tobytes()))
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"{self.rows_written} of {self.height} rows written")
+            self._add_compressed(self._compressor.flush(), flush=True)
+            self._write_chunk(b"IEND", b"")
+        finally:
+            self._file.close()
@@ -0,0 +1,143 @@
+import time
+import traceback
+from typing import Any, Callable, Set
+
+from PySide2 import QtCore
+
+
+# minimum interval between two progress signals of a job.
+PROGRESS_INTERVAL = 0.05
+
+
+class JobCancelled(Exception):
+    """
+    Raised when a job is cancelled, inside the job by Job.progress() and
+    by JobRunner.wait() to the caller.
+    """
+    pass
+
+
+class JobSignals(QtCore.QObject):
+    # done, total (0 when unknown), text
+    progress = QtCore.Signal(int, int, str)
+    finished = QtCore.Signal()
+
+
+class Job(QtCore.QRunnable):
+    """
+    Runs func(job, *args, **kwargs) on a worker thread.
+
+    func reports progress with job.progress(done, total, text), which also
+    raises JobCancelled once the job is cancelled. The signals are created
+    on the thread that creates the job, so their slots run there.
+    """
+
+    def __init__(self, func:Callable, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = JobSignals()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.ret = None
+        self.exception: BaseException = None
+        self.done = False
+        self._cancelled = False
+        self._last_progress = 0.0
+
+    def run(self):
+        try:
+            self.ret = self.func(self, *self.args, **self.kwargs)
+        except JobCancelled as e:
+            self.exception = e
+        except BaseException as e:
+            traceback.print_exc()
+            self.exception = e
+        finally:
+            self.done = True
+            self.signals.finished.emit()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self)->bool:
+        return self._cancelled
+
+    def progress(self, done:int, total:int=0, text:str=""):
+        """
+        Reports progress, rate limited to one signal per PROGRESS_INTERVAL
+        except for the last step.
+
+        Raises:
+            JobCancelled: the job was cancelled.
+        """
+        if self._cancelled:
+            raise JobCancelled()
+        t = time.perf_counter()
+        if t - self._last_progress < PROGRESS_INTERVAL and (total <= 0 or done < total):
+            return
+        self._last_progress = t
+        self.signals.progress.emit(done, total, text)
+
+    def result(self)->Any:
+        """
+        Returns the return value of func, or raises what func raised.
+        """
+        if self.exception is not None:
+            raise self.exception
+        return self.ret
+
+
+class JobRunner(QtCore.QObject):
+    """
+    Runs parsing, conversion and tool calls off the GUI thread.
+
+    Jobs run one at a time in submission order. wait() keeps the Qt event
+    loop running until a job is done, so anything touching the scene is
+    done by the caller on the GUI thread with the result.
+    """
+
+    def __init__(self, parent=None, max_threads=1):
+        super().__init__(parent)
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # keep the jobs alive until they finish, also those given up on by wait().
+        self._jobs: Set[Job] = set()
+
+    def submit(self, func:Callable, *args, **kwargs)->Job:
+        job = Job(func, *args, **kwargs)
+        self._jobs.add(job)
+        job.signals.finished.connect(lambda: self._jobs.discard(job))
+        self.pool.start(job)
+        return job
+
+    def wait(self, job:Job, *interrupts:QtCore.Signal)->Any:
+        """
+        Processes events until job finishes, or until one of interrupts
+        (e.g. a cancel button signal) is emitted.
+
+        Returns:
+            Any: the result of the job.
+        Raises:
+            JobCancelled: the job was cancelled. A job that cannot be stopped
+                keeps running and its result is dropped.
+        """
+        if not job.done:
+            loop = QtCore.QEventLoop()
+            job.signals.finished.connect(loop.quit)
+            for signal in interrupts:
+                signal.connect(loop.quit)
+            # finished may have been emitted before the connection.
+            if not job.done:
+                loop.exec_()
+        if job.is_cancelled():
+            raise JobCancelled()
+        if not job.done:
+            raise RuntimeError("job interrupted before it finished.")
+        return job.result()
+
+    def shutdown(self, cancel=True, timeout_ms=-1):
+        if cancel:
+            for job in list(self._jobs):
+                job.cancel()
+        self.pool.waitForDone(timeout_ms)
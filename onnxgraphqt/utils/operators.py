@@ -1,7 +1,13 @@
 import os
+import sys
 import math
-from dataclasses import dataclass
-from typing import List, Dict
+import bisect
+import hashlib
+import pickle
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 from json import JSONDecoder
 
 @dataclass
@@ -20,26 +26,48 @@ class OperatorVersion:
 @dataclass
 class Operator:
     name: str
+    # newest first.
     versions: List[OperatorVersion]
+    _since_opsets: List[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._since_opsets = [v.since_opset for v in reversed(self.versions)]
+
+    def version(self, opset:int)->Optional[OperatorVersion]:
+        """
+        The version in effect at opset, None if the op did not exist yet.
+        """
+        i = bisect.bisect_right(self._since_opsets, opset)
+        if i == 0:
+            return None
+        return self.versions[len(self.versions) - i]
 
 _DEFAULT_ONNX_OPSETS_JSON_PATH = os.path.join(os.path.dirname(__file__),
                                              '..',
                                             'data', 'onnx_opsets.json')
-def _load_json(json_path=_DEFAULT_ONNX_OPSETS_JSON_PATH)->List[Operator]:
-    json_str = ''
-    with open(json_path, mode='r') as f:
-        json_str = f.read()
+_DEFAULT_ONNX_OPSETS_INDEX_PATH = os.path.join(os.path.dirname(__file__),
+                                              '..',
+                                              'data', 'onnx_opsets.index')
+
+# index file: magic, header size, pickled header, then one pickled version table per op.
+_INDEX_MAGIC = b"OPSI"
+_INDEX_VERSION = 1
+_INDEX_PREFIX = struct.Struct(">4sI")
+
+# (since_opset, inputs, outputs, ((attr name, value type, default value), ...)), newest first.
+_VersionTable = List[Tuple[int, float, float, Tuple[Tuple[str, str, str], ...]]]
+
+def _parse_json(json_str:str)->Dict[str, _VersionTable]:
     dec = JSONDecoder()
     json_dict:Dict = dec.decode(json_str)
 
-    ret = []
+    ret = {}
     for op_name, v1 in json_dict.items():
         versions = []
         for since_opset, v2 in v1.items():
             since_opset = int(since_opset)
             inputs = v2["inputs"]
             outputs = v2["outputs"]
-            attrs = []
             if inputs == 'inf':
                 inputs = math.inf
             else:
@@ -48,42 +76,156 @@ def _load_json(json_path=_DEFAULT_ONNX_OPSETS_JSON_PATH)->List[Operator]:
                 outputs = math.inf
             else:
                 outputs = int(outputs)
+            attrs = tuple([(attr_name, attr_value_type, defalut_value)
+                           for attr_name, (attr_value_type, defalut_value) in v2["attrs"].items()])
+            versions.append((since_opset, inputs, outputs, attrs))
+        versions.sort(key=lambda v: -v[0])
+        ret[op_name] = versions
+    return ret
 
-            for attr_name, (attr_value_type, defalut_value) in v2["attrs"].items():
-                attrs.append(
-                    OperatorAttribute(name=attr_name,
-                                      value_type=attr_value_type,
-                                      default_value=defalut_value)
-                )
-            versions.append(
-                OperatorVersion(
-                    since_opset=since_opset,
-                    inputs=inputs, outputs=outputs, attrs=attrs)
-            )
-
-        ret.append(
-            Operator(
-                name=op_name,
-                versions=versions)
+def _to_operator(op_name:str, table:_VersionTable)->Operator:
+    versions = []
+    for since_opset, inputs, outputs, attrs in table:
+        versions.append(
+            OperatorVersion(
+                since_opset=since_opset,
+                inputs=inputs, outputs=outputs,
+                attrs=[OperatorAttribute(name=n, value_type=t, default_value=d) for n, t, d in attrs])
         )
-    return ret
+    return Operator(name=op_name, versions=versions)
 
-def _get_latest_opset_version(opsets:List[Operator])->int:
-    opset = 1
-    for op in opsets:
-        for v in op.versions:
-            if opset < v.since_opset:
-                opset = v.since_opset
-    return opset
+def compile_index(json_path=_DEFAULT_ONNX_OPSETS_JSON_PATH, index_path=_DEFAULT_ONNX_OPSETS_INDEX_PATH)->bytes:
+    """
+    Compiles onnx_opsets.json into the index read by OperatorIndex.
+    Returns the index, which is also written to index_path unless it is None.
+    """
+    with open(json_path, mode='rb') as f:
+        json_bytes = f.read()
+    tables = _parse_json(json_bytes.decode())
+    blobs = []
+    ops = []
+    offset = 0
+    for op_name, table in tables.items():
+        blob = pickle.dumps(table, protocol=4)
+        # (name, first since_opset, offset from the end of the header, size)
+        ops.append((op_name, table[-1][0], offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    header = pickle.dumps({
+        "version": _INDEX_VERSION,
+        "json_sha1": hashlib.sha1(json_bytes).hexdigest(),
+        "latest_opset": max([t[0][0] for t in tables.values()], default=1),
+        "ops": ops,
+    }, protocol=4)
+    data = _INDEX_PREFIX.pack(_INDEX_MAGIC, len(header)) + header + b"".join(blobs)
+    if index_path is not None:
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, index_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return data
+
+class OperatorIndex:
+    """
+    The opset catalogue, read from the compiled index.
+
+    Only the header (op names, the opset each op appeared in, offsets)
+    is read up front. The versions of an op are unpickled on first
+    access. An index that is missing or out of date with the json is
+    recompiled.
+    """
+    def __init__(self, json_path=_DEFAULT_ONNX_OPSETS_JSON_PATH, index_path=_DEFAULT_ONNX_OPSETS_INDEX_PATH):
+        data = self._read(json_path, index_path)
+        magic, header_size = _INDEX_PREFIX.unpack_from(data)
+        header = pickle.loads(data[_INDEX_PREFIX.size:_INDEX_PREFIX.size + header_size])
+        self._data = memoryview(data)[_INDEX_PREFIX.size + header_size:]
+        self.latest_opset: int = header["latest_opset"]
+        self.opnames: List[str] = [op[0] for op in header["ops"]]
+        self._first_opsets: Dict[str, int] = {op[0]: op[1] for op in header["ops"]}
+        self._offsets: Dict[str, Tuple[int, int]] = {op[0]: (op[2], op[3]) for op in header["ops"]}
+        self._operators: Dict[str, Operator] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(json_path:str, index_path:str)->bytes:
+        with open(json_path, mode='rb') as f:
+            json_sha1 = hashlib.sha1(f.read()).hexdigest()
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+            magic, header_size = _INDEX_PREFIX.unpack_from(data)
+            header = pickle.loads(data[_INDEX_PREFIX.size:_INDEX_PREFIX.size + header_size])
+            if magic == _INDEX_MAGIC and header["version"] == _INDEX_VERSION and header["json_sha1"] == json_sha1:
+                return data
+        except (OSError, struct.error, pickle.UnpicklingError, EOFError, KeyError, ValueError, TypeError):
+            pass
+        try:
+            return compile_index(json_path, index_path)
+        except OSError:
+            # e.g. a read-only install, keep the index in memory.
+            return compile_index(json_path, None)
+
+    def get(self, op_name:str)->Optional[Operator]:
+        op = self._operators.get(op_name)
+        if op is None and op_name in self._offsets:
+            with self._lock:
+                offset, size = self._offsets[op_name]
+                op = _to_operator(op_name, pickle.loads(self._data[offset:offset + size]))
+                self._operators[op_name] = op
+        return op
+
+    def version(self, op_name:str, opset:int)->Optional[OperatorVersion]:
+        op = self.get(op_name)
+        return op.version(opset) if op is not None else None
+
+    def opnames_at(self, opset:int)->List[str]:
+        """
+        Names of the ops available at opset, without loading their versions.
+        """
+        return [name for name in self.opnames if self._first_opsets[name] <= opset]
+
+    def operators(self)->List[Operator]:
+        return [self.get(name) for name in self.opnames]
+
+_index: OperatorIndex = None
+_index_lock = threading.Lock()
+
+def get_operator_index()->OperatorIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = OperatorIndex()
+    return _index
+
+def get_operator_version(op_name:str, opset:int)->Optional[OperatorVersion]:
+    """
+    The version of op_name in effect at opset, None for an unknown op or an op newer than opset.
+    """
+    return get_operator_index().version(op_name, opset)
 
-onnx_opsets = _load_json()
-opnames = [op.name for op in onnx_opsets]
-latest_opset = _get_latest_opset_version(onnx_opsets)
+def __getattr__(name:str):
+    # onnx_opsets, opnames and latest_opset are read from the index on first access.
+    if name == "onnx_opsets":
+        return get_operator_index().operators()
+    if name == "opnames":
+        return get_operator_index().opnames
+    if name == "latest_opset":
+        return get_operator_index().latest_opset
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
+    if "--compile" in sys.argv[1:]:
+        compile_index()
+        print(f"write {_DEFAULT_ONNX_OPSETS_INDEX_PATH}")
+        sys.exit(0)
     print(_DEFAULT_ONNX_OPSETS_JSON_PATH)
-    for op in onnx_opsets:
+    for op in get_operator_index().operators():
         print(op.name)
         for v in op.versions:
             print(v)
-        print()
\ No newline at end of file
+        print()
@@ -0,0 +1,303 @@
+import collections
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the rss high-water mark is then not recorded.
+    resource = None
+
+
+# spans kept by a Profiler, the oldest are dropped first.
+MAX_SPANS = 100000
+
+
+def max_rss()->int:
+    """
+    High-water mark of the resident set size of this process in bytes, 0 if unknown.
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@dataclass
+class Span:
+    name: str
+    # time.perf_counter() seconds. perf_counter is the monotonic clock of the
+    # system on linux and macOS, so spans of worker processes line up.
+    start: float
+    duration: float = 0.0
+    depth: int = 0
+    pid: int = 0
+    tid: int = 0
+    thread_name: str = ""
+    args: Dict[str, Any] = field(default_factory=dict)
+    # rss high-water mark at the end, and how much the span raised it.
+    max_rss: int = 0
+    max_rss_growth: int = 0
+    # peak of the memory traced by tracemalloc during the span, -1 when not tracing.
+    traced_peak: int = -1
+
+    @property
+    def end(self)->float:
+        return self.start + self.duration
+
+
+class _OpenSpan:
+    __slots__ = ("span", "max_rss", "traced_peak")
+
+    def __init__(self, span:Span, max_rss:int):
+        self.span = span
+        self.max_rss = max_rss
+        # peak of the children, a child resets the tracemalloc peak.
+        self.traced_peak = -1
+
+
+class Profiler:
+    """
+    Records named spans of work, e.g. model load, scene build and layout.
+
+    Spans nest per thread, so a span opened inside another is drawn below
+    it in a trace viewer. Each span records the rss high-water mark of the
+    process and, while memory tracing is on, the tracemalloc peak inside
+    it. Recording a span costs a few microseconds, so the spans stay in
+    the code and are always on.
+
+    The spans can be exported as Chrome trace JSON (chrome://tracing,
+    Perfetto, speedscope) or as folded stacks, the format of
+    ``py-spy record --format raw`` that flamegraph.pl and speedscope read.
+    A cProfile of the same run can be dumped with start_cprofile() and
+    stop_cprofile().
+    """
+
+    def __init__(self, max_spans:int=MAX_SPANS):
+        self.origin = time.perf_counter()
+        self.spans: Deque[Span] = collections.deque(maxlen=max_spans)
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # number of spans added so far, also those dropped since.
+        self.added = 0
+        self._cprofile: cProfile.Profile = None
+
+    def _stack(self)->List[_OpenSpan]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name:str, **args):
+        """
+        Records the time spent in the with block as a span called name.
+        args are shown with the span, e.g. the node count.
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        thread = threading.current_thread()
+        span = Span(name, time.perf_counter(), depth=len(stack), pid=os.getpid(),
+                    tid=thread.ident, thread_name=thread.name, args=args)
+        if tracemalloc.is_tracing():
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        opened = _OpenSpan(span, max_rss())
+        stack.append(opened)
+        try:
+            yield
+        finally:
+            span.duration = time.perf_counter() - span.start
+            stack.pop()
+            span.max_rss = max_rss()
+            span.max_rss_growth = span.max_rss - opened.max_rss
+            if tracemalloc.is_tracing():
+                span.traced_peak = max(tracemalloc.get_traced_memory()[1], opened.traced_peak)
+                if stack:
+                    stack[-1].traced_peak = max(stack[-1].traced_peak, span.traced_peak)
+            self.add(span)
+
+    def profile(self, name:str=None):
+        """
+        Decorator recording every call of a function as a span, named after the function by default.
+        """
+        def decorator(func:Callable)->Callable:
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instant(self, name:str, **args):
+        """
+        Records a point in time, e.g. the first paint.
+        """
+        if self.enabled:
+            thread = threading.current_thread()
+            self.add(Span(name, time.perf_counter(), depth=len(self._stack()), pid=os.getpid(),
+                          tid=thread.ident, thread_name=thread.name, args=args, max_rss=max_rss()))
+
+    def add(self, span:Span):
+        """
+        Adds a finished span, also one recorded by another process.
+        """
+        with self._lock:
+            self.spans.append(span)
+            self.added += 1
+
+    def snapshot(self, since:float=None)->List[Span]:
+        """
+        The recorded spans ordered by start, only those starting at or after since if given.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if since is not None:
+            spans = [s for s in spans if s.start >= since]
+        return sorted(spans, key=lambda s: (s.start, s.depth))
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self)->Dict[str, Dict[str, float]]:
+        """
+        Call count, total and max seconds and the highest rss per span name.
+        """
+        ret: Dict[str, Dict[str, float]] = {}
+        for s in self.snapshot():
+            item = ret.setdefault(s.name, {"count": 0, "total": 0.0, "max": 0.0, "max_rss": 0})
+            item["count"] += 1
+            item["total"] += s.duration
+            item["max"] = max(item["max"], s.duration)
+            item["max_rss"] = max(item["max_rss"], s.max_rss)
+        return ret
+
+    def start_memory_tracing(self, frames:int=1):
+        """
+        Starts tracemalloc, so spans record their python memory peak.
+        Allocations get noticeably slower while tracing.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_memory_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @property
+    def memory_tracing(self)->bool:
+        return tracemalloc.is_tracing()
+
+    def start_cprofile(self):
+        """
+        Starts a cProfile of the current thread, written by stop_cprofile().
+        """
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop_cprofile(self, file_path:str=None)->Optional[cProfile.Profile]:
+        """
+        Stops the cProfile and writes it to file_path, readable by pstats and snakeviz.
+        """
+        prof, self._cprofile = self._cprofile, None
+        if prof is None:
+            return None
+        prof.disable()
+        if file_path:
+            prof.dump_stats(file_path)
+        return prof
+
+    @property
+    def cprofile_running(self)->bool:
+        return self._cprofile is not None
+
+    def chrome_trace(self)->Dict[str, Any]:
+        """
+        The spans as a Chrome trace event document. Spans are complete
+        ("X") events, instants are "i" events, and the rss high-water
+        mark is a counter track.
+        """
+        events = []
+        threads = {}
+        for s in self.snapshot():
+            ts = (s.start - self.origin) * 1e6
+            args = dict(s.args)
+            if s.max_rss:
+                args["max_rss_mb"] = round(s.max_rss / 2**20, 2)
+            if s.traced_peak >= 0:
+                args["traced_peak_mb"] = round(s.traced_peak / 2**20, 2)
+            if s.duration > 0:
+                events.append({"name": s.name, "cat": "onnxgraphqt", "ph": "X", "ts": ts,
+                               "dur": s.duration * 1e6, "pid": s.pid, "tid": s.tid, "args": args})
+            else:
+                events.append({"name": s.name, "cat": "onnxgraphqt", "ph": "i", "s": "t", "ts": ts,
+                               "pid": s.pid, "tid": s.tid, "args": args})
+            if s.max_rss:
+                events.append({"name": "max_rss", "ph": "C", "ts": ts + s.duration * 1e6, "pid": s.pid,
+                               "args": {"MB": round(s.max_rss / 2**20, 2)}})
+            threads[(s.pid, s.tid)] = s.thread_name
+        for (pid, tid), thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, file_path:str):
+        with open(file_path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def folded_stacks(self)->List[str]:
+        """
+        One "outer;inner;name microseconds" line per stack, self time only,
+        as written by py-spy and read by flamegraph.pl and speedscope.
+        """
+        totals: Dict[str, float] = collections.OrderedDict()
+        per_thread: Dict[tuple, List[Span]] = collections.defaultdict(list)
+        for s in self.snapshot():
+            if s.duration > 0:
+                per_thread[(s.pid, s.tid)].append(s)
+        for spans in per_thread.values():
+            # spans are sorted by start, a span is inside the open one that ends after it.
+            stack: List[Span] = []
+            children: Dict[int, float] = collections.defaultdict(float)
+            paths: Dict[int, str] = {}
+            for s in spans:
+                while stack and stack[-1].end < s.end:
+                    stack.pop()
+                if stack:
+                    children[id(stack[-1])] += s.duration
+                paths[id(s)] = ";".join([p.name for p in stack] + [s.name])
+                stack.append(s)
+            for s in spans:
+                path = paths[id(s)]
+                totals[path] = totals.get(path, 0.0) + max(0.0, s.duration - children[id(s)])
+        return [f"{path} {int(seconds * 1e6)}" for path, seconds in totals.items() if seconds > 0]
+
+    def export_folded_stacks(self, file_path:str):
+        with open(file_path, "w") as f:
+            f.write("\n".join(self.folded_stacks()) + "\n")
+
+
+profiler = Profiler()
+span = profiler.span
+
+
+if os.environ.get("ONNXGRAPHQT_TRACE_MEMORY"):
+    profiler.start_memory_tracing()
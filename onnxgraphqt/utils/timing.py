@@ -0,0 +1,43 @@
+import time
+from typing import List, Tuple
+
+from onnxgraphqt.utils.profiler import profiler
+
+
+class StartupTimer:
+    """
+    Collects named points in time during startup and prints them once.
+
+    Times are measured from the creation of the timer, which is the
+    import of the onnxgraphqt package for startup_timer. Marks after
+    report() are ignored, so the same calls can stay in code that also
+    runs after startup. Each mark is also an instant event of the profiler.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+        self.finished = False
+
+    def mark(self, name:str):
+        if not self.finished:
+            self.marks.append((name, time.perf_counter() - self.t0))
+            profiler.instant(f"startup: {name}")
+
+    def elapsed(self, name:str)->float:
+        """
+        Seconds from the start to the first mark called name, -1 if there is none.
+        """
+        return next((t for n, t in self.marks if n == name), -1.0)
+
+    def report(self)->str:
+        self.finished = True
+        lines = ["startup timing:"]
+        prev = 0.0
+        for name, t in self.marks:
+            lines.append(f"  {name:<16} {t * 1000:>9.1f} ms  (+{(t - prev) * 1000:.1f} ms)")
+            prev = t
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
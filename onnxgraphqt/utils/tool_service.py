@@ -0,0 +1,392 @@
+import contextlib
+import importlib
+import io
+import logging
+import multiprocessing
+import threading
+import time
+import traceback
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+import onnx
+
+from onnxgraphqt.utils.color import remove_PrintColor
+from onnxgraphqt.utils.profiler import profiler
+
+
+# tool name -> "module:function". Nothing is imported until a tool is used,
+# get_tool() imports it in this process and the ToolService workers preload all of them.
+TOOLS = {
+    "combine": "onnxgraphqt.utils.tool_service:combine",
+    "extraction": "sne4onnx:extraction",
+    "deletion": "snd4onnx:remove",
+    "shrinking": "scs4onnx:shrinking",
+    "generate": "sog4onnx:generate",
+    "modify": "sam4onnx:modify",
+    "op_change": "soc4onnx:change",
+    "order_conversion": "scc4onnx:order_conversion",
+    "add": "sna4onnx:add",
+    "batchsize_initialize": "sbi4onnx:initialize",
+    "rename": "sor4onnx:rename",
+    "io_change": "sio4onnx:io_change",
+    "onnx2json": "onnx2json.onnx2json:convert",
+    "json2onnx": "json2onnx.json2onnx:convert",
+    "structure_check": "ssc4onnx:structure_check",
+}
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+@dataclass
+class ToolLogRecord:
+    level: str
+    message: str
+    # "stdout", "logging" or "warnings"
+    source: str = "stdout"
+
+    def __str__(self):
+        return f"{self.level}: {self.message}"
+
+
+@dataclass
+class ToolResult:
+    model: Optional[onnx.ModelProto] = None
+    logs: List[ToolLogRecord] = field(default_factory=list)
+    # exception message and traceback when the tool failed.
+    error: Optional[str] = None
+    traceback: str = ""
+
+    @property
+    def ok(self)->bool:
+        return self.error is None and self.model is not None
+
+    def records(self, min_level="DEBUG")->List[ToolLogRecord]:
+        min_index = LOG_LEVELS.index(min_level)
+        return [r for r in self.logs if LOG_LEVELS.index(r.level) >= min_index]
+
+    def text(self, min_level="DEBUG")->str:
+        return "\n".join([str(r) for r in self.records(min_level)])
+
+
+def check_model_size(model:onnx.ModelProto):
+    """
+    Raises ValueError when model is too large to be serialized, which a tool
+    call needs, e.g. a model over 2GB opened with its weights memory-mapped.
+    """
+    size = model.ByteSize()
+    if size >= onnx.checker.MAXIMUM_PROTOBUF:
+        raise ValueError(f"the model is {size / 2**30:.2f} GB, over the 2GB protobuf limit, "
+                         "and can not be passed to the tools. "
+                         "Export it as ONNX instead, its weights are saved as external data.")
+
+
+@dataclass
+class SharedModel:
+    """
+    A serialized ModelProto in a shared memory block, passed to and from the workers by name.
+    """
+    name: str
+    size: int
+
+    @classmethod
+    def create(cls, model:onnx.ModelProto)->"SharedModel":
+        check_model_size(model)
+        data = model.SerializeToString()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        shm.buf[:len(data)] = data
+        shm.close()
+        return SharedModel(shm.name, len(data))
+
+    def load(self, unlink=False)->onnx.ModelProto:
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            model = onnx.ModelProto()
+            model.ParseFromString(bytes(shm.buf[:self.size]))
+        finally:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        return model
+
+    def unlink(self):
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def combine(onnx_graph:onnx.ModelProto=None, onnx_graphs:List[onnx.ModelProto]=[],
+            input_onnx_file_paths:List[str]=[], **kwargs)->onnx.ModelProto:
+    """
+    snc4onnx.combine of onnx_graph, onnx_graphs and the models in
+    input_onnx_file_paths, in that order. The files are loaded in the worker.
+    """
+    from snc4onnx import combine as onnx_tools_combine
+    graphs = [onnx_graph] if onnx_graph is not None else []
+    graphs += list(onnx_graphs) + [onnx.load(path) for path in input_onnx_file_paths]
+    return onnx_tools_combine(onnx_graphs=graphs, input_onnx_file_paths=[], **kwargs)
+
+
+_tool_funcs: Dict[str, Callable] = {}
+
+
+def get_tool(tool:str)->Callable:
+    """
+    Returns the function of a tool in TOOLS, imported on first use.
+    """
+    func = _tool_funcs.get(tool)
+    if func is None:
+        module_name, func_name = TOOLS[tool].split(":")
+        func = getattr(importlib.import_module(module_name), func_name)
+        _tool_funcs[tool] = func
+    return func
+
+
+def _import_tools(tools:List[str]):
+    for tool in tools:
+        try:
+            get_tool(tool)
+        except ImportError:
+            pass
+
+
+def warm_up_tools(tools:List[str]=None)->threading.Thread:
+    """
+    Imports tools (all of TOOLS by default) in a background thread,
+    so their first use in this process does not wait for the import.
+    """
+    thread = threading.Thread(target=_import_tools, args=(list(tools or TOOLS.keys()),),
+                              name="warm_up_tools", daemon=True)
+    thread.start()
+    return thread
+
+
+def _init_worker():
+    # import every tool once, so the first call does not pay for it.
+    _import_tools(list(TOOLS.keys()))
+
+
+def _ping()->bool:
+    return True
+
+
+def _parse_output(output:str)->List[ToolLogRecord]:
+    """
+    Splits the tool output into records at "INFO:", "WARNING:", "ERROR:" prefixes.
+    Lines without a prefix continue the previous record.
+    """
+    records: List[ToolLogRecord] = []
+    for line in remove_PrintColor(output).splitlines():
+        if not line.strip():
+            continue
+        head, sep, rest = line.partition(":")
+        level = head.strip().upper()
+        if sep and level in LOG_LEVELS:
+            records.append(ToolLogRecord(level, rest.strip()))
+        elif records:
+            records[-1].message += "\n" + line
+        else:
+            records.append(ToolLogRecord("INFO", line))
+    return records
+
+
+class _RecordHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records: List[ToolLogRecord] = []
+
+    def emit(self, record:logging.LogRecord):
+        level = record.levelname if record.levelname in LOG_LEVELS else "INFO"
+        self.records.append(ToolLogRecord(level, record.getMessage(), source="logging"))
+
+
+def _unpack(value):
+    if isinstance(value, SharedModel):
+        return value.load()
+    if isinstance(value, list):
+        return [_unpack(v) for v in value]
+    return value
+
+
+def _pack(value):
+    if isinstance(value, onnx.ModelProto):
+        return SharedModel.create(value)
+    if isinstance(value, list):
+        return [_pack(v) for v in value]
+    return value
+
+
+def call_tool(tool:str, **kwargs)->ToolResult:
+    """
+    Runs tool(**kwargs) in this process and collects its output as log records.
+    Used by the workers of ToolService and by the batch command line.
+    """
+    out = io.StringIO()
+    handler = _RecordHandler()
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    result = ToolResult()
+    try:
+        with warnings.catch_warnings(record=True) as caught, \
+                contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            warnings.simplefilter("always")
+            try:
+                with profiler.span(f"tool {tool}", tool=tool):
+                    model = get_tool(tool)(**kwargs)
+                if isinstance(model, tuple):
+                    # e.g. shrinking returns (model, names)
+                    model = next((m for m in model if isinstance(m, onnx.ModelProto)), None)
+                result.model = model
+            except SystemExit as e:
+                # the tools print an ERROR line and call sys.exit(1).
+                result.error = f"{tool} exited with status {e.code}."
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                result.traceback = traceback.format_exc()
+    finally:
+        root_logger.removeHandler(handler)
+    result.logs = _parse_output(out.getvalue()) + handler.records
+    result.logs += [ToolLogRecord("WARNING", str(w.message), source="warnings") for w in caught]
+    return result
+
+
+def _run_tool(tool:str, kwargs:Dict[str, Any])->Dict[str, Any]:
+    """
+    Worker side of ToolService.submit. The output is captured per process,
+    so redirecting sys.stdout here does not affect anything else.
+    """
+    t0 = time.perf_counter()
+    with profiler.span(f"worker {tool}", tool=tool):
+        with profiler.span("unpack models"):
+            kwargs = {k: _unpack(v) for k, v in kwargs.items()}
+        result = call_tool(tool, **kwargs)
+        model = None
+        if result.model is not None:
+            with profiler.span("pack model"):
+                model = SharedModel.create(result.model)
+    # the spans of this call go back with the result, the worker keeps none.
+    spans = profiler.snapshot(since=t0)
+    profiler.clear()
+    return {"model": model, "logs": result.logs, "error": result.error, "traceback": result.traceback,
+            "spans": spans}
+
+
+class ToolService:
+    """
+    Runs the onnx tools in a pool of worker processes.
+
+    The workers are started from a fork server that has already imported
+    the tools, so a call only pays for passing the models. Models go
+    through shared memory as serialized bytes, and each call returns a
+    ToolResult with the model and the tool output as log records. Calls
+    are queued and run in order of submission on max_workers processes.
+    """
+
+    def __init__(self, max_workers:int=1, start_method:str=None):
+        self.max_workers = max_workers
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.start_method = start_method
+        self._executor: ProcessPoolExecutor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self)->ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                ctx = multiprocessing.get_context(self.start_method)
+                if self.start_method == "forkserver":
+                    ctx.set_forkserver_preload([__name__] + [v.split(":")[0] for v in TOOLS.values()])
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=ctx,
+                                                     initializer=_init_worker)
+            return self._executor
+
+    def warm_up(self)->List[Future]:
+        """
+        Starts the workers in the background.
+        """
+        executor = self._get_executor()
+        return [executor.submit(_ping) for _ in range(self.max_workers)]
+
+    def submit(self, tool:str, **kwargs)->"Future[ToolResult]":
+        """
+        Queues tool(**kwargs). ModelProto arguments, also inside lists, are passed through shared memory.
+        """
+        if tool not in TOOLS:
+            raise KeyError(f"unknown tool: {tool}")
+        # before anything is packed, so no shared memory is left behind.
+        for v in _flatten(kwargs.values()):
+            if isinstance(v, onnx.ModelProto):
+                check_model_size(v)
+        packed = {k: _pack(v) for k, v in kwargs.items()}
+        shared = [v for v in _flatten(packed.values()) if isinstance(v, SharedModel)]
+        result: Future = Future()
+        executor = self._get_executor()
+
+        def done(future:Future):
+            for shm in shared:
+                shm.unlink()
+            tool_result = None
+            if future.cancelled():
+                pass
+            elif isinstance(future.exception(), BrokenProcessPool):
+                # a worker died, e.g. crashed in native code. start a new pool next time.
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                tool_result = ToolResult(error=f"{tool}: worker process terminated. {future.exception()}")
+            elif future.exception() is not None:
+                e = future.exception()
+                tool_result = ToolResult(error=f"{type(e).__name__}: {e}")
+            else:
+                ret = future.result()
+                if result.cancelled():
+                    if ret["model"] is not None:
+                        ret["model"].unlink()
+                    return
+                model = None
+                if ret["model"] is not None:
+                    model = ret["model"].load(unlink=True)
+                tool_result = ToolResult(model=model, logs=ret["logs"],
+                                         error=ret["error"], traceback=ret["traceback"])
+                for span in ret["spans"]:
+                    profiler.add(span)
+            if tool_result is None:
+                result.cancel()
+            elif result.set_running_or_notify_cancel():
+                result.set_result(tool_result)
+
+        try:
+            future = executor.submit(_run_tool, tool, packed)
+        except BaseException:
+            for shm in shared:
+                shm.unlink()
+            raise
+        # cancelling a call that has not started yet takes it off the queue.
+        result.add_done_callback(lambda r: r.cancelled() and future.cancel())
+        future.add_done_callback(done)
+        return result
+
+    def run(self, tool:str, **kwargs)->ToolResult:
+        return self.submit(tool, **kwargs).result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _flatten(values):
+    for v in values:
+        if isinstance(v, list):
+            yield from _flatten(v)
+        else:
+            yield v
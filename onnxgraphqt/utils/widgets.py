@@ -1,4 +1,5 @@
-from typing import List
+from typing import List, Tuple
+import functools
 import math
 from PySide2 import QtCore, QtWidgets, QtGui
 from NodeGraphQt.constants import PipeEnum
@@ -10,6 +11,37 @@ LARGE_FONT_SIZE = 18
 GRAPH_FONT_SIZE = 32
 PIPE_WIDTH = 3.0
 
+# level of detail of nodes and pipes, by the scale of the view.
+LOD_LOW = 0     # nodes are filled rects, pipes straight lines.
+LOD_MEDIUM = 1  # no text, no arrows.
+LOD_HIGH = 2
+# views scaled below these draw at LOD_LOW and LOD_MEDIUM.
+LOD_THRESHOLDS = {LOD_LOW: 0.2, LOD_MEDIUM: 0.4}
+
+
+def set_lod_thresholds(low:float=None, medium:float=None):
+    """
+    Sets the view scales below which nodes and pipes are drawn with less detail.
+    0 always draws at full detail.
+    """
+    if low is not None:
+        LOD_THRESHOLDS[LOD_LOW] = low
+    if medium is not None:
+        LOD_THRESHOLDS[LOD_MEDIUM] = medium
+
+
+def painter_scale(painter:QtGui.QPainter)->float:
+    return QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+
+
+def level_of_detail(scale:float)->int:
+    if scale < LOD_THRESHOLDS[LOD_LOW]:
+        return LOD_LOW
+    if scale < LOD_THRESHOLDS[LOD_MEDIUM]:
+        return LOD_MEDIUM
+    return LOD_HIGH
+
+
 def set_font(widget: QtWidgets.QWidget, font_size:int=None, bold=False):
     f = widget.font()
     if font_size:
@@ -47,86 +79,149 @@ def createIconButton(text:str, icon_path: str, icon_size:List[int]=[25, 25], fon
     return button
 
 
-def pipe_paint(pipe, painter, option, widget, text=""):
-    """
-    Draws the connection line between nodes.
-
-    Args:
-        painter (QtGui.QPainter): painter used for drawing the item.
-        option (QtGui.QStyleOptionGraphicsItem):
-            used to describe the parameters needed to draw.
-        widget (QtWidgets.QWidget): not used.
-    """
-    color = QtGui.QColor(*pipe._color)
-    pen_style = PIPE_STYLES.get(pipe.style)
-    pen_width = PIPE_WIDTH #PipeEnum.WIDTH.value
-    if pipe._active:
-        color = QtGui.QColor(*PipeEnum.ACTIVE_COLOR.value)
-        if pen_style == QtCore.Qt.DashDotDotLine:
-            pen_width += 1
-        else:
-            pen_width += 0.35
-    elif pipe._highlight:
-        color = QtGui.QColor(*PipeEnum.HIGHLIGHT_COLOR.value)
-        pen_style = PIPE_STYLES.get(PipeEnum.DRAW_TYPE_DEFAULT.value)
-
-    if pipe.disabled():
-        if not pipe._active:
-            color = QtGui.QColor(*PipeEnum.DISABLED_COLOR.value)
-        pen_width += 0.2
-        pen_style = PIPE_STYLES.get(PipeEnum.DRAW_TYPE_DOTTED.value)
-
-    pen = QtGui.QPen(color, pen_width, pen_style)
+@functools.lru_cache(maxsize=256)
+def _pipe_pen(rgba:Tuple[int, ...], width:float, style:QtCore.Qt.PenStyle, cosmetic=False)->QtGui.QPen:
+    pen = QtGui.QPen(QtGui.QColor(*rgba), width, style)
     pen.setCapStyle(QtCore.Qt.RoundCap)
     pen.setJoinStyle(QtCore.Qt.MiterJoin)
+    pen.setCosmetic(cosmetic)
+    return pen
 
-    painter.save()
-    painter.setPen(pen)
-    painter.setRenderHint(painter.Antialiasing, True)
-    painter.drawPath(pipe.path())
-
-    # draw arrow
-    if pipe.input_port and pipe.output_port:
-        cen_x = pipe.path().pointAtPercent(0.5).x()
-        cen_y = pipe.path().pointAtPercent(0.5).y()
-        loc_pt = pipe.path().pointAtPercent(0.49)
-        tgt_pt = pipe.path().pointAtPercent(0.51)
-        dist = math.hypot(tgt_pt.x() - cen_x, tgt_pt.y() - cen_y)
-        if dist < 0.5:
-            painter.restore()
-            return
 
-        color.setAlpha(255)
-        if pipe._highlight:
-            painter.setBrush(QtGui.QBrush(color.lighter(150)))
-        elif pipe._active or pipe.disabled():
-            painter.setBrush(QtGui.QBrush(color.darker(200)))
-        else:
-            painter.setBrush(QtGui.QBrush(color.darker(130)))
+@functools.lru_cache(maxsize=256)
+def _arrow_brush(rgba:Tuple[int, ...], lighter:int=0, darker:int=0)->QtGui.QBrush:
+    color = QtGui.QColor(*rgba)
+    color.setAlpha(255)
+    if lighter:
+        color = color.lighter(lighter)
+    if darker:
+        color = color.darker(darker)
+    return QtGui.QBrush(color)
 
-        pen_width = 0.6
-        if dist < 1.0:
-            pen_width *= (1.0 + dist)
 
-        pen = QtGui.QPen(color, pen_width)
-        pen.setCapStyle(QtCore.Qt.RoundCap)
-        pen.setJoinStyle(QtCore.Qt.MiterJoin)
-        painter.setPen(pen)
+@functools.lru_cache(maxsize=8)
+def _label_font(font_size:int)->QtGui.QFont:
+    font = QtGui.QFont()
+    font.setPixelSize(font_size)
+    return font
+
 
+class PipePainter:
+    """
+    Draws the connection line between nodes, installed as pipe.paint.
+
+    The midpoint and the arrow polygon are computed when the pipe path
+    changes, not on every paint, and pens and brushes are shared by all
+    pipes drawn in the same state. Zoomed out, the arrow and text are left
+    out (LOD_MEDIUM) and the pipe is a straight thin line (LOD_LOW).
+    """
+    __slots__ = ("pipe", "text", "_path", "_center", "_arrow", "_dist")
+
+    def __init__(self, pipe, text=""):
+        self.pipe = pipe
+        self.text = text
+        self._path: QtGui.QPainterPath = None
+        self._center: QtCore.QPointF = None
+        self._arrow: QtGui.QPolygonF = None
+        self._dist = 0.0
+
+    def _update_geometry(self, path:QtGui.QPainterPath):
+        self._path = path
+        cen_pt = path.pointAtPercent(0.5)
+        loc_pt = path.pointAtPercent(0.49)
+        tgt_pt = path.pointAtPercent(0.51)
+        dist = math.hypot(tgt_pt.x() - cen_pt.x(), tgt_pt.y() - cen_pt.y())
         transform = QtGui.QTransform()
-        transform.translate(cen_x, cen_y)
+        transform.translate(cen_pt.x(), cen_pt.y())
         radians = math.atan2(tgt_pt.y() - loc_pt.y(),
-                                tgt_pt.x() - loc_pt.x())
-        degrees = math.degrees(radians) - 90
-        transform.rotate(degrees)
+                             tgt_pt.x() - loc_pt.x())
+        transform.rotate(math.degrees(radians) - 90)
         if dist < 1.0:
             transform.scale(dist, dist)
-        painter.drawPolygon(transform.map(pipe._arrow))
-        if text:
-            painter.setPen(QtCore.Qt.black)
-            set_font(painter, font_size=20)
-            painter.drawText(QtCore.QRectF(cen_x, cen_y, 200, 100), text)
+        self._center = cen_pt
+        self._arrow = transform.map(self.pipe._arrow)
+        self._dist = dist
+
+    def __call__(self, painter, option, widget):
+        """
+        Args:
+            painter (QtGui.QPainter): painter used for drawing the item.
+            option (QtGui.QStyleOptionGraphicsItem):
+                used to describe the parameters needed to draw.
+            widget (QtWidgets.QWidget): not used.
+        """
+        pipe = self.pipe
+        rgba = tuple(pipe._color)
+        pen_style = PIPE_STYLES.get(pipe.style)
+        pen_width = PIPE_WIDTH #PipeEnum.WIDTH.value
+        if pipe._active:
+            rgba = tuple(PipeEnum.ACTIVE_COLOR.value)
+            if pen_style == QtCore.Qt.DashDotDotLine:
+                pen_width += 1
+            else:
+                pen_width += 0.35
+        elif pipe._highlight:
+            rgba = tuple(PipeEnum.HIGHLIGHT_COLOR.value)
+            pen_style = PIPE_STYLES.get(PipeEnum.DRAW_TYPE_DEFAULT.value)
+
+        disabled = pipe.disabled()
+        if disabled:
+            if not pipe._active:
+                rgba = tuple(PipeEnum.DISABLED_COLOR.value)
+            pen_width += 0.2
+            pen_style = PIPE_STYLES.get(PipeEnum.DRAW_TYPE_DOTTED.value)
+
+        path = pipe.path()
+        lod = level_of_detail(painter_scale(painter))
+        if lod == LOD_LOW:
+            if path.elementCount() < 2:
+                return
+            painter.save()
+            painter.setPen(_pipe_pen(rgba, 0, QtCore.Qt.SolidLine, True))
+            painter.setRenderHint(painter.Antialiasing, False)
+            start = path.elementAt(0)
+            end = path.elementAt(path.elementCount() - 1)
+            painter.drawLine(QtCore.QPointF(start.x, start.y), QtCore.QPointF(end.x, end.y))
+            painter.restore()
+            return
+
+        painter.save()
+        painter.setPen(_pipe_pen(rgba, pen_width, pen_style))
+        painter.setRenderHint(painter.Antialiasing, True)
+        painter.drawPath(path)
+
+        # draw arrow
+        if lod == LOD_HIGH and pipe.input_port and pipe.output_port:
+            if self._path is None or self._path != path:
+                self._update_geometry(path)
+            dist = self._dist
+            if dist < 0.5:
+                painter.restore()
+                return
+
+            if pipe._highlight:
+                painter.setBrush(_arrow_brush(rgba, lighter=150))
+            elif pipe._active or disabled:
+                painter.setBrush(_arrow_brush(rgba, darker=200))
+            else:
+                painter.setBrush(_arrow_brush(rgba, darker=130))
+
+            pen_width = 0.6
+            if dist < 1.0:
+                pen_width *= (1.0 + dist)
+            painter.setPen(_pipe_pen(rgba[:3], pen_width, QtCore.Qt.SolidLine))
+            painter.drawPolygon(self._arrow)
+            if self.text:
+                painter.setPen(QtCore.Qt.black)
+                painter.setFont(_label_font(20))
+                painter.drawText(QtCore.QRectF(self._center.x(), self._center.y(), 200, 100), self.text)
+
+        # QPaintDevice: Cannot destroy paint device that is being painted.
+        painter.restore()
 
 
-    # QPaintDevice: Cannot destroy paint device that is being painted.
-    painter.restore()
+def pipe_paint(pipe, painter, option, widget, text=""):
+    """
+    Draws pipe once without caching, see PipePainter.
+    """
+    PipePainter(pipe, text)(painter, option, widget)
@@ -4,18 +4,68 @@ from NodeGraphQt.constants import NodeEnum
 from NodeGraphQt.qgraphics.node_base import NodeItem
 
 from onnxgraphqt.utils.color import NODE_BG_COLOR, NODE_SELECTED_BORDER_COLOR
-from onnxgraphqt.utils.widgets import set_font
+from onnxgraphqt.utils.widgets import (
+    LOD_LOW,
+    LOD_HIGH,
+    level_of_detail,
+    painter_scale,
+)
 
 
 class CustomNodeItem(NodeItem):
     def __init__(self, name='node', parent=None):
         super().__init__(name, parent)
         self._display_name = ""
+        # (regular, bold) header fonts, made from the painter font on the first paint.
+        self._fonts = None
+        self._lod = LOD_HIGH
 
     def set_display_name(self, name: str):
         self._display_name = name
 
+    def auto_switch_mode(self):
+        # the proxy mode follows the level of detail, see set_level_of_detail.
+        pass
+
+    def set_level_of_detail(self, lod:int):
+        """
+        Hides the port labels and node widgets below LOD_HIGH, and the ports at LOD_LOW.
+        """
+        if lod == self._lod:
+            return
+        self.set_proxy_mode(lod < LOD_HIGH)
+        if (lod == LOD_LOW) != (self._lod == LOD_LOW):
+            for port in list(self._input_items.keys()) + list(self._output_items.keys()):
+                port.setVisible(lod != LOD_LOW)
+        self._lod = lod
+
+    def _header_font(self, painter, bold=False)->QtGui.QFont:
+        if self._fonts is None:
+            regular = QtGui.QFont(painter.font())
+            regular.setBold(False)
+            bold_font = QtGui.QFont(regular)
+            bold_font.setBold(True)
+            self._fonts = (regular, bold_font)
+        return self._fonts[1 if bold else 0]
+
+    def _paint_low_detail(self, painter):
+        painter.save()
+        painter.setPen(QtCore.Qt.NoPen)
+        if self.selected:
+            painter.setBrush(QtGui.QColor(*list(NODE_SELECTED_BORDER_COLOR + [255])))
+        else:
+            painter.setBrush(QtGui.QColor(*self.color))
+        painter.drawRect(self.boundingRect())
+        painter.restore()
+
     def _paint_vertical(self, painter, option, widget):
+        scale = painter_scale(painter)
+        lod = level_of_detail(scale)
+        self.set_level_of_detail(lod)
+        if lod == LOD_LOW:
+            self._paint_low_detail(painter)
+            return
+
         painter.save()
         painter.setPen(QtCore.Qt.NoPen)
         painter.setBrush(QtCore.Qt.NoBrush)
@@ -40,15 +90,15 @@ class CustomNodeItem(NodeItem):
         painter.drawRoundedRect(header_rect, radius, radius)
 
         # header text
-        r, g, b = self.color[:3]
-        if 0.2126*r + 0.715*g + 0.0722*b > 128:
-            painter.setPen(QtCore.Qt.black)
-        else:
-            painter.setPen(QtCore.Qt.white)
-        if self.selected:
-            set_font(painter, bold=True)
-        painter.drawText(QtCore.QRectF(5, 5, rect.width(), rect.height()), self._display_name)
-        set_font(painter, bold=False)
+        if lod == LOD_HIGH:
+            r, g, b = self.color[:3]
+            if 0.2126*r + 0.715*g + 0.0722*b > 128:
+                painter.setPen(QtCore.Qt.black)
+            else:
+                painter.setPen(QtCore.Qt.white)
+            painter.setFont(self._header_font(painter, bold=self.selected))
+            painter.drawText(QtCore.QRectF(5, 5, rect.width(), rect.height()), self._display_name)
+            painter.setPen(QtCore.Qt.NoPen)
 
         # light overlay on background when selected.
         if self.selected:
@@ -81,7 +131,7 @@ class CustomNodeItem(NodeItem):
                                     rect.width(), rect.height())
 
         pen = QtGui.QPen(border_color, border_width)
-        pen.setCosmetic(self.viewer().get_zoom() < 0.0)
+        pen.setCosmetic(scale < 1.0)
         painter.setBrush(QtCore.Qt.NoBrush)
         painter.setPen(pen)
         painter.drawRoundedRect(border_rect, radius, radius)
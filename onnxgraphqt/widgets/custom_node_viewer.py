@@ -0,0 +1,60 @@
+from typing import Callable
+
+from PySide2 import QtCore, QtGui
+from NodeGraphQt.widgets.viewer import NodeViewer
+
+
+class CustomNodeViewer(NodeViewer):
+    """
+    NodeViewer that reports every change of the visible scene area and
+    can draw over the items, for the viewport culling of ONNXNodeGraph.
+    """
+
+    # visible rect in scene coordinates, after a pan, zoom or resize.
+    visible_rect_changed = QtCore.Signal(QtCore.QRectF)
+
+    def __init__(self, parent=None, undo_stack=None):
+        super().__init__(parent, undo_stack=undo_stack)
+        self._foreground_painter = None
+
+    def set_foreground_painter(self, func:Callable[[QtGui.QPainter, QtCore.QRectF], None]=None):
+        """
+        Args:
+            func: called with the painter and the exposed scene rect after the items are drawn.
+        """
+        self._foreground_painter = func
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        if self._foreground_painter is not None:
+            self._foreground_painter(painter, rect)
+
+    def _update_scene(self):
+        super()._update_scene()
+        self.visible_rect_changed.emit(self.visible_rect())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # NodeViewer zooms before the viewport has its new size.
+        self.visible_rect_changed.emit(self.visible_rect())
+
+    def visible_rect(self)->QtCore.QRectF:
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def _combined_rect(self, nodes):
+        # NodeViewer groups the items, which adds them to the scene. The node
+        # items have no transform, so their rects can be joined directly.
+        rect = QtCore.QRectF()
+        for node in nodes:
+            rect = rect.united(node.sceneBoundingRect())
+        return rect
+
+    def zoom_to_rect(self, rect:QtCore.QRectF):
+        """
+        Same as zoom_to_nodes, for a rect in scene coordinates.
+        """
+        self._scene_range = QtCore.QRectF(rect)
+        self._update_scene()
+
+        if self.get_zoom() > 0.1:
+            self.reset_zoom(self._scene_range.center())
@@ -4,7 +4,7 @@ from PySide2 import QtCore, QtWidgets, QtGui
 from ast import literal_eval
 
 from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE, LARGE_FONT_SIZE
-from onnxgraphqt.utils.operators import onnx_opsets, opnames, OperatorVersion
+from onnxgraphqt.utils.operators import OperatorVersion, get_operator_index, get_operator_version
 from onnxgraphqt.graph.onnx_node_graph import OnnxGraph
 from onnxgraphqt.widgets.widgets_message_box import MessageBox
 
@@ -90,11 +90,8 @@ class AddNodeWidgets(QtWidgets.QDialog):
         layout_op = QtWidgets.QFormLayout()
         layout_op.setLabelAlignment(QtCore.Qt.AlignRight)
         self.add_op_type = QtWidgets.QComboBox()
-        for op in onnx_opsets:
-            for version in op.versions:
-                if version.since_opset <= self.current_opset:
-                    self.add_op_type.addItem(op.name, op.versions[0])
-                    break
+        for op_name in get_operator_index().opnames_at(self.current_opset):
+            self.add_op_type.addItem(op_name)
         self.add_op_type.setEditable(True)
         self.add_op_type.currentIndexChanged.connect(self.add_op_type_currentIndexChanged)
         self.add_op_name = QtWidgets.QLineEdit()
@@ -318,7 +315,9 @@ class AddNodeWidgets(QtWidgets.QDialog):
         self.set_visible_add_op_attributes()
 
     def add_op_type_currentIndexChanged(self, selected_index:int):
-        selected_operator: OperatorVersion = self.add_op_type.currentData()
+        selected_operator: OperatorVersion = get_operator_version(self.add_op_type.currentText(), self.current_opset)
+        if selected_operator is None:
+            return
         self.visible_input_valiables_count = selected_operator.inputs
         self.visible_output_valiables_count = selected_operator.outputs
         self.visible_add_attributes_count = min(max(0, len(selected_operator.attrs)), self._MAX_ATTRIBUTES_COUNT)
@@ -431,7 +430,7 @@ class AddNodeWidgets(QtWidgets.QDialog):
         if not props.add_op_name:
             err_msgs.append("- [add_op_name] not set")
             invalid = True
-        if not props.add_op_type in opnames:
+        if not props.add_op_type in get_operator_index().opnames:
             err_msgs.append("- [add_op_type] not support")
             invalid = True
         if invalid:
@@ -6,7 +6,7 @@ from ast import literal_eval
 import numpy as np
 
 from onnxgraphqt.utils.opset import DEFAULT_OPSET
-from onnxgraphqt.utils.operators import onnx_opsets, opnames, OperatorVersion, latest_opset
+from onnxgraphqt.utils.operators import OperatorVersion, get_operator_index, get_operator_version
 from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE, LARGE_FONT_SIZE
 from onnxgraphqt.widgets.widgets_message_box import MessageBox
 
@@ -61,7 +61,7 @@ class GenerateOperatorWidgets(QtWidgets.QDialog):
 
         self.cmb_opset = QtWidgets.QComboBox()
         self.cmb_opset.setEditable(True)
-        for i in range(1,latest_opset + 1):
+        for i in range(1,get_operator_index().latest_opset + 1):
             self.cmb_opset.addItem(str(i), i)
         lbl_opset = QtWidgets.QLabel("opset")
         set_font(lbl_opset, font_size=LARGE_FONT_SIZE, bold=True)
@@ -264,7 +264,10 @@ class GenerateOperatorWidgets(QtWidgets.QDialog):
         self.set_visible_add_op_attributes()
 
     def cmb_optype_currentIndexChanged(self, selected_index:int):
-        selected_operator: OperatorVersion = self.cmb_optype.currentData()
+        opset = self.cmb_opset.currentData()
+        selected_operator: OperatorVersion = None
+        if opset is not None:
+            selected_operator = get_operator_version(self.cmb_optype.currentText(), opset)
         if selected_operator:
             self.visible_input_valiables_count = selected_operator.inputs
             self.visible_output_valiables_count = selected_operator.outputs
@@ -285,13 +288,10 @@ class GenerateOperatorWidgets(QtWidgets.QDialog):
         current_optype = self.cmb_optype.currentText()
         current_optype_index = 0
         self.cmb_optype.clear()
-        for i, op in enumerate(onnx_opsets):
-            for v in op.versions:
-                if v.since_opset <= current_opset:
-                    if op.name == current_optype:
-                        current_optype_index = self.cmb_optype.count()
-                    self.cmb_optype.addItem(op.name, v)
-                    break
+        for op_name in get_operator_index().opnames_at(current_opset):
+            if op_name == current_optype:
+                current_optype_index = self.cmb_optype.count()
+            self.cmb_optype.addItem(op_name)
         self.cmb_optype.setCurrentIndex(current_optype_index)
 
     def get_properties(self)->GenerateOperatorProperties:
@@ -348,7 +348,7 @@ class GenerateOperatorWidgets(QtWidgets.QDialog):
         props = self.get_properties()
         print(props)
         err_msgs = []
-        if not props.op_type in opnames:
+        if not props.op_type in get_operator_index().opnames:
             err_msgs.append("- op_type is invalid.")
             invalid = True
         if not isinstance(props.opset, int):
@@ -5,7 +5,6 @@ import signal
 from PySide2 import QtCore, QtWidgets, QtGui
 from ast import literal_eval
 import onnx
-import onnxruntime as ort
 
 import os
 from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE, LARGE_FONT_SIZE
@@ -122,6 +121,8 @@ class InferenceTestWidgets(QtWidgets.QDialog):
 
         self.cmb_onnx_execution_provider = QtWidgets.QComboBox()
         self.cmb_onnx_execution_provider.setEditable(False)
+        # onnxruntime is imported when the dialog is opened, not at startup.
+        import onnxruntime as ort
         for provider in ort.get_available_providers():
             if provider in ONNX_PROVIDER_TABLE.keys():
                 providers = ONNX_PROVIDER_TABLE[provider]
@@ -4,10 +4,6 @@ import signal
 from PySide2 import QtCore, QtWidgets, QtGui
 from ast import literal_eval
 import numpy as np
-from sam4onnx.onnx_attr_const_modify import (
-    ATTRIBUTE_DTYPES_TO_NUMPY_TYPES,
-    CONSTANT_DTYPES_TO_NUMPY_TYPES
-)
 
 from onnxgraphqt.graph.onnx_node_graph import OnnxGraph
 from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE, LARGE_FONT_SIZE
@@ -25,7 +21,7 @@ ModifyAttrsProperties = namedtuple("ModifyAttrsProperties",
 
 def get_dtype_str(list_or_scalar)->str:
     v0 = None
-    if isinstance(list_or_scalar, list):
+    if isinstance(list_or_scalar, (list, np.ndarray)):
         v0 = np.ravel(list_or_scalar)[0].tolist()
     else:
         v0 = list_or_scalar
@@ -60,6 +56,11 @@ class ModifyAttrsWidgets(QtWidgets.QDialog):
         self.updateUI(self.graph, selected_node)
 
     def initUI(self):
+        # sam4onnx is imported when the dialog is opened, not at startup.
+        from sam4onnx.onnx_attr_const_modify import (
+            ATTRIBUTE_DTYPES_TO_NUMPY_TYPES,
+            CONSTANT_DTYPES_TO_NUMPY_TYPES
+        )
         # self.setFixedWidth(self._DEFAULT_WINDOW_WIDTH)
         set_font(self, font_size=BASE_FONT_SIZE)
 
@@ -214,8 +215,11 @@ class ModifyAttrsWidgets(QtWidgets.QDialog):
                 input_name = self.edit_const[attr_index]["name"].currentText()
                 node_input = self.graph.node_inputs.get(input_name)
                 if node_input:
-                    self.edit_const[attr_index]["value"].setText(str(node_input.values))
-                    dtype = get_dtype_str(node_input.values)
+                    values = node_input.values
+                    if isinstance(values, np.ndarray):
+                        values = values.tolist()
+                    self.edit_const[attr_index]["value"].setText(str(values))
+                    dtype = get_dtype_str(values)
                     self.edit_const[attr_index]["dtype"].setCurrentText(dtype)
 
             def cmb_opname_currentIndexChanged(current_index):
@@ -2,7 +2,7 @@ import signal
 from PySide2 import QtCore, QtWidgets, QtGui
 
 from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph
-from onnxgraphqt.graph.onnx_node import ONNXInput, ONNXOutput, ONNXNode, OnnxNodeIO
+from onnxgraphqt.graph.onnx_node import ONNXInput, ONNXOutput, ONNXNode, ONNXGroup, OnnxNodeIO
 
 
 class NodeSearchWidget(QtWidgets.QDialog):
@@ -64,7 +64,8 @@ class NodeSearchWidget(QtWidgets.QDialog):
         inputs = self.graph.get_input_node_by_name(node_name)
         nodes = self.graph.get_node_by_name(node_name)
         outputs = self.graph.get_output_node_by_name(node_name)
-        nodes = inputs + nodes + outputs
+        groups = [n for n in self.graph.get_any_node_by_name(node_name) if isinstance(n, ONNXGroup)]
+        nodes = inputs + nodes + outputs + groups
         self.graph.fit_to_selection_node(nodes[0])
         parent = self.parent()
         if hasattr(parent, "properties_bin"):
@@ -103,6 +104,26 @@ class NodeSearchWidget(QtWidgets.QDialog):
                 self.model.setItem(i, 3, output_names_item)
                 self.all_row_items.append((name_item, type_item, input_names_item, output_names_item))
 
+            elif isinstance(n, ONNXGroup):
+                name = n.get_node_name()
+                type_name = "Group"
+                input_names = [io.name for io in n.onnx_inputs]
+                output_names = [io.name for io in n.onnx_outputs]
+
+                name_item = QtGui.QStandardItem(name)
+                type_item = QtGui.QStandardItem(type_name)
+                input_names_item = QtGui.QStandardItem(", ".join(input_names))
+                output_names_item = QtGui.QStandardItem(", ".join(output_names))
+                name_item.setEditable(False)
+                type_item.setEditable(False)
+                input_names_item.setEditable(False)
+                output_names_item.setEditable(False)
+                self.model.setItem(i, 0, name_item)
+                self.model.setItem(i, 1, type_item)
+                self.model.setItem(i, 2, input_names_item)
+                self.model.setItem(i, 3, output_names_item)
+                self.all_row_items.append((name_item, type_item, input_names_item, output_names_item))
+
             elif isinstance(n, ONNXInput):
                 name = n.get_node_name()
                 type_name = "Input"
@@ -0,0 +1,155 @@
+import os
+from typing import Dict, List
+
+from PySide2 import QtCore, QtWidgets
+
+from onnxgraphqt.utils.profiler import Profiler, Span, profiler as default_profiler
+from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE
+
+
+# interval at which a visible panel looks for new spans.
+REFRESH_INTERVAL_MS = 500
+
+
+def _mb(n:int)->str:
+    return f"{n / 2**20:.1f}" if n > 0 else ""
+
+
+class ProfilerWidget(QtWidgets.QDockWidget):
+    """
+    Dockable list of the profiler spans, nested as they were recorded.
+
+    The spans can be saved as Chrome trace JSON or folded stacks, and a
+    cProfile of the GUI thread can be recorded between two clicks.
+    """
+    _DEFAULT_WINDOW_WIDTH = 600
+
+    def __init__(self, profiler:Profiler=None, parent=None) -> None:
+        super().__init__("profiler", parent)
+        self.setObjectName("profiler")
+        self.profiler = profiler or default_profiler
+        self._shown_count = -1
+        self.initUI()
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def initUI(self):
+        set_font(self, font_size=BASE_FONT_SIZE)
+        widget = QtWidgets.QWidget()
+        base_layout = QtWidgets.QVBoxLayout(widget)
+
+        layout = QtWidgets.QHBoxLayout()
+        self.btn_clear = QtWidgets.QPushButton("clear")
+        self.btn_clear.clicked.connect(self.clear)
+        self.btn_trace = QtWidgets.QPushButton("export trace")
+        self.btn_trace.clicked.connect(self.export_trace)
+        self.btn_cprofile = QtWidgets.QPushButton("start cProfile")
+        self.btn_cprofile.clicked.connect(self.toggle_cprofile)
+        self.cb_memory = QtWidgets.QCheckBox("trace memory")
+        self.cb_memory.setChecked(self.profiler.memory_tracing)
+        self.cb_memory.toggled.connect(self.set_memory_tracing)
+        layout.addWidget(self.btn_clear)
+        layout.addWidget(self.btn_trace)
+        layout.addWidget(self.btn_cprofile)
+        layout.addWidget(self.cb_memory)
+        layout.addStretch()
+        base_layout.addLayout(layout)
+
+        self.tree = QtWidgets.QTreeWidget()
+        self.tree.setHeaderLabels(["name", "time [ms]", "max rss [MB]", "rss growth [MB]",
+                                   "traced peak [MB]", "thread", "args"])
+        self.tree.setColumnWidth(0, 220)
+        self.tree.setUniformRowHeights(True)
+        base_layout.addWidget(self.tree)
+
+        self.lbl_summary = QtWidgets.QLabel()
+        base_layout.addWidget(self.lbl_summary)
+
+        self.setWidget(widget)
+        self.resize(self._DEFAULT_WINDOW_WIDTH, self.height())
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        if self.profiler.added == self._shown_count:
+            return
+        self._shown_count = self.profiler.added
+        spans = self.profiler.snapshot()
+        self.tree.clear()
+        # per thread, a span is the child of the last open span that ends after it.
+        stacks: Dict[tuple, List[tuple]] = {}
+        for s in spans:
+            stack = stacks.setdefault((s.pid, s.tid), [])
+            while stack and stack[-1][0].end < s.end:
+                stack.pop()
+            item = self._create_item(s)
+            if stack:
+                stack[-1][1].addChild(item)
+            else:
+                self.tree.addTopLevelItem(item)
+            if s.duration > 0:
+                stack.append((s, item))
+        total = sum([s.duration for s in spans if s.depth == 0])
+        self.lbl_summary.setText(f"{len(spans)} spans, {total * 1000:.1f} ms at top level")
+
+    def _create_item(self, s:Span)->QtWidgets.QTreeWidgetItem:
+        args = ", ".join([f"{k}={v}" for k, v in s.args.items()])
+        item = QtWidgets.QTreeWidgetItem([
+            s.name,
+            f"{s.duration * 1000:.2f}" if s.duration > 0 else "-",
+            _mb(s.max_rss),
+            _mb(s.max_rss_growth),
+            _mb(s.traced_peak),
+            f"{s.thread_name} ({s.pid})",
+            args,
+        ])
+        for column in range(1, 5):
+            item.setTextAlignment(column, QtCore.Qt.AlignRight)
+        return item
+
+    def clear(self):
+        self.profiler.clear()
+        self.refresh()
+
+    def set_memory_tracing(self, enabled:bool):
+        if enabled:
+            self.profiler.start_memory_tracing()
+        else:
+            self.profiler.stop_memory_tracing()
+
+    def export_trace(self):
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            caption="Export Trace",
+            dir=os.path.join(os.path.abspath(os.curdir), "trace.json"),
+            filter="Chrome trace (*.json);;Folded stacks (*.folded *.txt)")
+        if not file_name:
+            return
+        if os.path.splitext(file_name)[1].lower() == ".json":
+            self.profiler.export_chrome_trace(file_name)
+        else:
+            self.profiler.export_folded_stacks(file_name)
+        print(f"trace written: {file_name}")
+
+    def toggle_cprofile(self):
+        if not self.profiler.cprofile_running:
+            self.profiler.start_cprofile()
+            self.btn_cprofile.setText("stop cProfile")
+            return
+        self.btn_cprofile.setText("start cProfile")
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            caption="Save cProfile",
+            dir=os.path.join(os.path.abspath(os.curdir), "onnxgraphqt.prof"),
+            filter="*.prof")
+        self.profiler.stop_cprofile(file_name or None)
+        if file_name:
+            print(f"cProfile written: {file_name}")
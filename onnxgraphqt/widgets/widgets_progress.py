@@ -0,0 +1,48 @@
+import time
+from PySide2 import QtCore, QtWidgets
+
+
+# the dialog only appears for work that takes longer than this.
+MINIMUM_DURATION_MS = 500
+# minimum interval between two updates from step().
+STEP_INTERVAL = 0.05
+
+
+class ProgressDialog(QtWidgets.QProgressDialog):
+    def __init__(self, title:str, cancellable=True, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setLabelText(title)
+        self.setWindowModality(QtCore.Qt.WindowModal)
+        self.setMinimumDuration(MINIMUM_DURATION_MS)
+        self.setMinimumWidth(400)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.setRange(0, 0)
+        if not cancellable:
+            self.setCancelButton(None)
+        self._last_step = 0.0
+
+    def set_progress(self, done:int, total:int, text:str=""):
+        if text:
+            self.setLabelText(text)
+        if total > 0:
+            if self.maximum() != total:
+                self.setRange(0, total)
+            self.setValue(min(done, total))
+        else:
+            # busy indicator
+            self.setRange(0, 0)
+            self.setValue(0)
+
+    def step(self, done:int, total:int=0, text:str=""):
+        """
+        Progress callback for work done on the GUI thread.
+        Updates the dialog and processes pending events at most every STEP_INTERVAL.
+        """
+        t = time.perf_counter()
+        if t - self._last_step < STEP_INTERVAL and (total <= 0 or done < total):
+            return
+        self._last_step = t
+        self.set_progress(done, total, text)
+        QtWidgets.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
@@ -0,0 +1,48 @@
+from PySide2 import QtCore, QtWidgets
+
+from onnxgraphqt.graph.onnx_node_graph import ONNXNodeGraph
+from onnxgraphqt.graph.onnx_node import ONNXNode
+from onnxgraphqt.utils.widgets import set_font, BASE_FONT_SIZE
+
+
+class SubgraphWidgets(QtWidgets.QDialog):
+    """
+    Shows the body of an If/Loop/Scan node as a graph of its own.
+    Bodies inside the body open another window on double click.
+    """
+    _DEFAULT_WINDOW_WIDTH = 800
+    _DEFAULT_WINDOW_HEIGHT = 600
+
+    def __init__(self, graph:ONNXNodeGraph, node:ONNXNode, key:str, parent=None) -> None:
+        super().__init__(parent)
+        self.setModal(False)
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        self.setWindowTitle(f"{node.get_node_name()} : {key}")
+        self.resize(self._DEFAULT_WINDOW_WIDTH, self._DEFAULT_WINDOW_HEIGHT)
+        # built on first use and kept by graph.
+        self.subgraph = graph.open_subgraph(node, key)
+        self.initUI()
+
+    def initUI(self):
+        set_font(self, font_size=BASE_FONT_SIZE)
+        self.base_layout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.base_layout)
+
+    def showEvent(self, event):
+        # the graph widget outlives this window, it is only borrowed while shown.
+        self.base_layout.addWidget(self.subgraph.widget)
+        self.subgraph.widget.show()
+        self.subgraph.subgraph_requested.connect(self.open_subgraph)
+        super().showEvent(event)
+        self.subgraph.fit_to_selection()
+
+    def hideEvent(self, event):
+        self.base_layout.removeWidget(self.subgraph.widget)
+        self.subgraph.widget.setParent(None)
+        self.subgraph.subgraph_requested.disconnect(self.open_subgraph)
+        super().hideEvent(event)
+
+    def open_subgraph(self, node:ONNXNode, key:str):
+        # owned by the main window, so closing this window leaves it open.
+        w = SubgraphWidgets(self.subgraph, node, key, parent=self.parentWidget())
+        w.show()